@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,11 +42,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'gym.middleware.QueryInspectorMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'gym.middleware.ArchivosEstaticosMiddleware',
+    'gym.db_router.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'gym.middleware.PerfilUsuarioMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -84,6 +89,55 @@ DATABASES = {
     }
 }
 
+# Réplicas de lectura (opcional), p. ej. GYMFLOW_DB_REPLICAS=10.0.0.2:3306,10.0.0.3:3306
+# Solo las vistas con @usa_replica leen de ellas (ver gym/db_router.py).
+DATABASE_REPLICAS = []
+for _i, _host in enumerate(filter(None, os.environ.get('GYMFLOW_DB_REPLICAS', '').split(',')), start=1):
+    _nombre, _, _puerto = _host.strip().partition(':')
+    DATABASES[f'replica{_i}'] = {
+        **DATABASES['default'],
+        'HOST': _nombre,
+        'PORT': _puerto or DATABASES['default']['PORT'],
+        # En los tests la réplica es la misma base que el primario
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{_i}')
+
+DATABASE_ROUTERS = ['gym.db_router.ReplicaRouter']
+REPLICA_STICKY = 15  # Segundos leyendo del primario después de escribir
+REPLICA_MAX_RETRASO = 5  # Segundos de atraso sobre los que una réplica no se usa
+
+
+# Caché compartida entre workers (catálogo de ejercicios, fragmentos de los
+# dashboards y analítica). Sin GYMFLOW_CACHE_URL se usa una caché en archivos,
+# compartida por todos los procesos del servidor y que sobrevive a reinicios;
+# con varios servidores usar Redis (requiere el paquete `redis`):
+#   GYMFLOW_CACHE_URL=redis://localhost:6379/1
+# Después de desplegar: python manage.py warm_cache
+
+CACHE_URL = os.environ.get('GYMFLOW_CACHE_URL', '')
+
+if CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+            'KEY_PREFIX': 'gymflow',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_URL or BASE_DIR / '.cache',
+            'KEY_PREFIX': 'gymflow',
+            'OPTIONS': {
+                # Fragmentos por usuario: el valor por defecto (300) desaloja demasiado
+                'MAX_ENTRIES': 20000,
+            },
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -109,6 +163,17 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# collectstatic: nombres con hash + variantes .gz/.br (ver gym/storage.py);
+# los sirve gym.middleware.ArchivosEstaticosMiddleware con caché inmutable
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'gym.storage.ManifestComprimidoStorage'},
+}
+
+# Carga User + PerfilUsuario en una sola consulta por request
+AUTHENTICATION_BACKENDS = ['gym.backends.PerfilModelBackend']
 
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
@@ -125,6 +190,24 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 # EMAIL_HOST_PASSWORD = 'tu_contraseña'
 DEFAULT_FROM_EMAIL = 'noreply@gymflow.com'
 
+# Inspector de consultas SQL (header Server-Timing + log 'gym.queries')
+# Activar con QUERY_INSPECTOR_ENABLED; en producción bajar el sample rate.
+QUERY_INSPECTOR_ENABLED = False
+QUERY_INSPECTOR_SAMPLE_RATE = 1.0  # Fracción de requests inspeccionados (0.0 - 1.0)
+QUERY_INSPECTOR_SLOWEST = 3  # Consultas más lentas/repetidas incluidas en el log
+QUERY_INSPECTOR_WARN_QUERIES = 50  # Sobre este número de consultas se loguea como WARNING
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'gym': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
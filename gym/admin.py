@@ -1,9 +1,20 @@
 from django.contrib import admin
-from .models import PerfilUsuario, Ejercicio, Rutina, DetalleRutina, RegistroEntrenamiento, ProgresoFisico, Favorito
+from django.utils.decorators import method_decorator
+
+from .db_router import usa_replica
+from .models import PerfilUsuario, Ejercicio, Rutina, DetalleRutina, AjusteDetalle, RegistroEntrenamiento, RegistroSerie, ProgresoFisico, Favorito, VolumenSemanal, Tarea, ClienteEntrenador
+
+
+class LecturaEnReplicaAdmin(admin.ModelAdmin):
+    """Los listados del admin (solo lectura) se leen de una réplica"""
+
+    @method_decorator(usa_replica)
+    def changelist_view(self, request, extra_context=None):
+        return super().changelist_view(request, extra_context)
 
 
 @admin.register(PerfilUsuario)
-class PerfilUsuarioAdmin(admin.ModelAdmin):
+class PerfilUsuarioAdmin(LecturaEnReplicaAdmin):
     list_display = ['user', 'tipo_usuario', 'nivel_experiencia', 'disponible', 'activo']
     list_filter = ['tipo_usuario', 'nivel_experiencia', 'activo', 'disponible']
     search_fields = ['user__username', 'user__email', 'especialidad']
@@ -26,37 +37,74 @@ class PerfilUsuarioAdmin(admin.ModelAdmin):
 
 
 @admin.register(Ejercicio)
-class EjercicioAdmin(admin.ModelAdmin):
+class EjercicioAdmin(LecturaEnReplicaAdmin):
     list_display = ['nombre', 'equipamiento', 'nivel_riesgo']
     list_filter = ['nivel_riesgo', 'equipamiento']
     search_fields = ['nombre', 'musculos_principales']
 
 
 @admin.register(Rutina)
-class RutinaAdmin(admin.ModelAdmin):
+class RutinaAdmin(LecturaEnReplicaAdmin):
     list_display = ['nombre', 'usuario', 'dificultad', 'duracion_min', 'activa']
     list_filter = ['dificultad', 'activa', 'es_publica']
+    raw_id_fields = ['plantilla']
     search_fields = ['nombre', 'usuario__username']
 
 
 @admin.register(DetalleRutina)
-class DetalleRutinaAdmin(admin.ModelAdmin):
+class DetalleRutinaAdmin(LecturaEnReplicaAdmin):
     list_display = ['rutina', 'ejercicio', 'orden', 'series', 'repeticiones']
 
 
+@admin.register(AjusteDetalle)
+class AjusteDetalleAdmin(LecturaEnReplicaAdmin):
+    list_display = ['rutina', 'detalle', 'peso', 'sin_peso']
+
+
 @admin.register(RegistroEntrenamiento)
-class RegistroEntrenamientoAdmin(admin.ModelAdmin):
+class RegistroEntrenamientoAdmin(LecturaEnReplicaAdmin):
     list_display = ['usuario', 'rutina', 'fecha', 'duracion_min', 'nivel_esfuerzo']
     list_filter = ['completado', 'fecha']
     date_hierarchy = 'fecha'
 
 
+@admin.register(RegistroSerie)
+class RegistroSerieAdmin(LecturaEnReplicaAdmin):
+    list_display = ['usuario', 'ejercicio', 'numero', 'repeticiones', 'peso', 'fecha']
+    list_filter = ['fecha']
+    raw_id_fields = ['usuario', 'entrenamiento', 'ejercicio']
+    date_hierarchy = 'fecha'
+
+
+@admin.register(VolumenSemanal)
+class VolumenSemanalAdmin(LecturaEnReplicaAdmin):
+    list_display = ['usuario', 'semana', 'grupo_muscular', 'series', 'tonelaje']
+    list_filter = ['grupo_muscular', 'semana']
+    raw_id_fields = ['usuario']
+    date_hierarchy = 'semana'
+
+
+@admin.register(ClienteEntrenador)
+class ClienteEntrenadorAdmin(LecturaEnReplicaAdmin):
+    list_display = ['entrenador', 'cliente', 'fecha_inicio', 'ultima_asignacion']
+    raw_id_fields = ['entrenador', 'cliente']
+    search_fields = ['entrenador__username', 'cliente__username']
+
+
 @admin.register(ProgresoFisico)
-class ProgresoFisicoAdmin(admin.ModelAdmin):
+class ProgresoFisicoAdmin(LecturaEnReplicaAdmin):
     list_display = ['usuario', 'fecha', 'peso', 'grasa_corporal']
     date_hierarchy = 'fecha'
 
 
 @admin.register(Favorito)
-class FavoritoAdmin(admin.ModelAdmin):
+class FavoritoAdmin(LecturaEnReplicaAdmin):
     list_display = ['usuario', 'ejercicio', 'rutina', 'fecha']
+
+
+@admin.register(Tarea)
+class TareaAdmin(LecturaEnReplicaAdmin):
+    list_display = ['tipo', 'estado', 'prioridad', 'intentos', 'ejecutar_desde', 'trabajador', 'fecha_fin']
+    list_filter = ['estado', 'tipo']
+    search_fields = ['clave', 'ultimo_error']
+    readonly_fields = ['fecha_creacion', 'fecha_fin', 'trabajador', 'ultimo_error']
@@ -6,4 +6,6 @@ class GymConfig(AppConfig):
     name = 'gym'
     
     def ready(self):
-        import gym.models  # Importa para activar signals
\ No newline at end of file
+        import gym.models  # Importa para activar signals
+        import gym.signals  # Invalidación de caché de dashboards
+        import gym.tareas  # Tipos de tarea de la cola (run_worker)
\ No newline at end of file
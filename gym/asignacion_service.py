@@ -0,0 +1,58 @@
+"""
+Asignación de rutinas de un entrenador a sus clientes.
+"""
+import time
+
+from django.db import transaction
+
+from .clientes_service import ClientesService
+from .models import Rutina
+from .signals import invalidar_dashboards_asignacion
+
+
+class AsignacionService:
+    """Asigna una rutina a muchos usuarios con pocas consultas"""
+    BATCH_SIZE = 500
+
+    @staticmethod
+    def asignar_rutina(rutina, entrenador, usuarios):
+        """
+        Asigna `rutina` a cada usuario de `usuarios` en una sola transacción.
+
+        Las rutinas asignadas no copian los ejercicios: apuntan a la rutina
+        del entrenador como plantilla (copy-on-write), así que asignar cuesta
+        un INSERT masivo de rutinas sin importar cuántos ejercicios tenga, y
+        los cambios del entrenador llegan a todos sus clientes. Cada rutina se
+        materializa recién cuando se edita (Rutina.materializar).
+        Retorna (rutinas_creadas, segundos).
+        """
+        inicio = time.perf_counter()
+        usuarios = list(usuarios)
+
+        with transaction.atomic():
+            copias = Rutina.objects.bulk_create(
+                [
+                    Rutina(
+                        nombre=f"{rutina.nombre} (de {entrenador.username})",
+                        descripcion=rutina.descripcion,
+                        usuario=usuario,
+                        entrenador=entrenador,
+                        plantilla_id=rutina.detalles_rutina_id,
+                        dificultad=rutina.dificultad,
+                        duracion_min=rutina.duracion_min,
+                        objetivo=rutina.objetivo,
+                        es_publica=False,
+                        activa=True,
+                    )
+                    for usuario in usuarios
+                ],
+                batch_size=AsignacionService.BATCH_SIZE,
+            )
+            ClientesService.vincular((entrenador.id, usuario.id) for usuario in usuarios)
+
+            # bulk_create no dispara post_save
+            transaction.on_commit(lambda: invalidar_dashboards_asignacion(
+                entrenador.id, [usuario.id for usuario in usuarios]
+            ))
+
+        return copias, time.perf_counter() - inicio
@@ -0,0 +1,66 @@
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth import get_user_model
+
+from . import near_cache
+from .models import PerfilUsuario
+
+
+class PerfilModelBackend(ModelBackend):
+    """
+    ModelBackend que carga el usuario junto a su perfil en una sola consulta.
+
+    Las columnas quedan en near_cache.usuarios, así la mayoría de los requests
+    no consultan la base; los signals de User y PerfilUsuario lo invalidan.
+    El hash de la contraseña no se cachea: el usuario se reconstruye con ese
+    campo diferido y se guarda aparte el hash de sesión que compara el login.
+    """
+
+    def get_user(self, user_id):
+        datos = near_cache.usuarios.get_or_set(str(user_id), lambda: self._cargar(user_id), grupo=str(user_id))
+        if datos is None:
+            return None
+        user = self._reconstruir(datos)
+        return user if self.user_can_authenticate(user) else None
+
+    def _cargar(self, user_id):
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.select_related('perfil').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        perfil = getattr(user, 'perfil', None)
+        return {
+            'db': user._state.db,
+            'usuario': _columnas(user, excluir=('password',)),
+            'perfil': _columnas(perfil) if perfil else None,
+            'hash_sesion': user.get_session_auth_hash(),
+        }
+
+    def _reconstruir(self, datos):
+        UserModel = get_user_model()
+        # Sin 'password': queda diferido y solo se consulta si algo lo usa
+        user = UserModel.from_db(datos['db'], list(datos['usuario']), list(datos['usuario'].values()))
+        user.get_session_auth_hash = _hash_sesion(user, datos['hash_sesion'])
+        if datos['perfil'] is not None:
+            user.perfil = PerfilUsuario.from_db(
+                datos['db'], list(datos['perfil']), list(datos['perfil'].values()),
+            )
+        return user
+
+
+def _columnas(instancia, excluir=()):
+    """{attname: valor} de las columnas concretas de `instancia`"""
+    return {
+        campo.attname: getattr(instancia, campo.attname)
+        for campo in instancia._meta.concrete_fields
+        if campo.attname not in excluir
+    }
+
+
+def _hash_sesion(user, cacheado):
+    """get_session_auth_hash que usa el hash cacheado mientras la contraseña no se cargue ni cambie"""
+    def hash_sesion():
+        if 'password' in user.__dict__:
+            return type(user).get_session_auth_hash(user)
+        return cacheado
+    return hash_sesion
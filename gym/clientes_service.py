@@ -0,0 +1,103 @@
+"""
+Clientes de cada entrenador.
+
+ClienteEntrenador guarda explícitamente quién es cliente de quién: se
+actualiza al asignar rutinas (AsignacionService, signals) y se borra cuando
+el cliente ya no tiene rutinas del entrenador. Así el roster y los
+dashboards no recorren el historial de asignaciones (Rutina) para saberlo.
+"""
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils import timezone
+
+from .models import ClienteEntrenador, Rutina, VolumenSemanal
+from .volumen_service import lunes
+
+
+class ClientesService:
+    """Relación entrenador-cliente y roster paginado"""
+    POR_PAGINA = 25
+    # Hasta dónde se mira hacia atrás para la racha (semanas)
+    RACHA_MAXIMA = 52
+
+    @staticmethod
+    def vincular(pares, fecha=None):
+        """
+        Crea o renueva la relación de cada (entrenador_id, cliente_id) en un
+        solo INSERT (ON CONFLICT / ON DUPLICATE KEY UPDATE).
+        """
+        fecha = fecha or timezone.now()
+        # MySQL no acepta indicar la restricción: usa cualquier clave única
+        unicos = ['entrenador', 'cliente'] if connection.features.supports_update_conflicts_with_target else None
+        ClienteEntrenador.objects.bulk_create(
+            [
+                ClienteEntrenador(entrenador_id=entrenador_id, cliente_id=cliente_id,
+                                  fecha_inicio=fecha, ultima_asignacion=fecha)
+                for entrenador_id, cliente_id in set(pares)
+                if entrenador_id != cliente_id
+            ],
+            update_conflicts=True,
+            unique_fields=unicos,
+            update_fields=['ultima_asignacion'],
+            batch_size=1000,
+        )
+
+    @staticmethod
+    def desvincular_si_no_quedan(entrenador_id, cliente_id):
+        """Borra la relación si el cliente ya no tiene rutinas del entrenador"""
+        if not Rutina.objects.filter(entrenador_id=entrenador_id, usuario_id=cliente_id).exists():
+            ClienteEntrenador.objects.filter(entrenador_id=entrenador_id, cliente_id=cliente_id).delete()
+
+    @staticmethod
+    def clientes_de(entrenador):
+        """Usuarios clientes del entrenador (sin DISTINCT: la relación es única)"""
+        return User.objects.filter(entrenadores_rel__entrenador=entrenador)
+
+    @staticmethod
+    def roster(entrenador, pagina):
+        """
+        Página del roster con rutinas_activas, ultimo_entrenamiento y racha de
+        cada cliente. Cuesta lo mismo con 10 que con 1000 clientes: el COUNT
+        del paginador, la página (con sus resúmenes como subconsultas) y una
+        consulta agrupada para las rachas de los clientes de la página.
+        """
+        relaciones = (
+            ClienteEntrenador.objects.filter(entrenador=entrenador)
+            .select_related('cliente').con_resumen()
+            .order_by('-ultima_asignacion', '-id')
+        )
+        pagina = Paginator(relaciones, ClientesService.POR_PAGINA).get_page(pagina)
+        rachas = ClientesService.rachas([relacion.cliente_id for relacion in pagina])
+        for relacion in pagina:
+            relacion.racha = rachas.get(relacion.cliente_id, 0)
+        return pagina
+
+    @staticmethod
+    def rachas(user_ids):
+        """
+        {user_id: semanas seguidas con entrenamiento}. La semana en curso
+        suma si ya entrenó, pero no corta la racha si aún no lo hace.
+        """
+        if not user_ids:
+            return {}
+        actual = lunes(timezone.localdate())
+        desde = actual - timedelta(weeks=ClientesService.RACHA_MAXIMA)
+        semanas = {}
+        for user_id, semana in (
+            VolumenSemanal.objects.filter(usuario_id__in=user_ids, semana__gte=desde)
+            .order_by().values_list('usuario_id', 'semana').distinct()
+        ):
+            semanas.setdefault(user_id, set()).add(semana)
+
+        rachas = {}
+        for user_id, entrenadas in semanas.items():
+            semana = actual if actual in entrenadas else actual - timedelta(weeks=1)
+            racha = 0
+            while semana in entrenadas:
+                racha += 1
+                semana -= timedelta(weeks=1)
+            rachas[user_id] = racha
+        return rachas
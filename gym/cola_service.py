@@ -0,0 +1,177 @@
+"""
+Cola de trabajos en segundo plano guardada en la propia base de datos.
+
+Las vistas encolan con ColaService.encolar() y responden de inmediato; el
+comando run_worker toma las tareas con SELECT ... FOR UPDATE SKIP LOCKED
+(varios workers no se pisan) y las ejecuta. Una tarea que falla se
+reintenta con espera exponencial hasta max_intentos.
+"""
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Case, F, PositiveSmallIntegerField, Q, When
+from django.utils import timezone
+
+from .models import Tarea
+
+logger = logging.getLogger('gym.cola')
+
+
+class ColaService:
+    """Encolar, tomar y ejecutar tareas (los tipos se registran con @ColaService.tarea)"""
+    TIPOS = {}
+
+    # Plazo para terminar una tarea tomada antes de que otro worker la retome
+    PLAZO = timedelta(minutes=5)
+
+    # Espera antes del reintento n: BASE_REINTENTO * 2^(n-1), como máximo MAX_REINTENTO
+    BASE_REINTENTO = timedelta(seconds=10)
+    MAX_REINTENTO = timedelta(hours=1)
+
+    @staticmethod
+    def tarea(nombre):
+        """Decorador: registra `func(**argumentos)` como el tipo de tarea `nombre`"""
+        def decorator(func):
+            ColaService.TIPOS[nombre] = func
+            return func
+        return decorator
+
+    @staticmethod
+    def encolar(tipo, argumentos=None, prioridad=0, ejecutar_desde=None, max_intentos=5, clave=''):
+        """
+        Crea la tarea (dentro de la transacción en curso, si la hay: el
+        worker solo la ve cuando se confirma). Con `clave`, no encola si ya
+        hay una tarea pendiente o en curso con la misma clave.
+        """
+        if tipo not in ColaService.TIPOS:
+            raise ValueError(f'Tipo de tarea desconocido: {tipo}')
+        if clave and Tarea.objects.filter(clave=clave, estado__in=('pendiente', 'en_curso')).exists():
+            return None
+        return Tarea.objects.create(
+            tipo=tipo,
+            argumentos=argumentos or {},
+            prioridad=prioridad,
+            ejecutar_desde=ejecutar_desde or timezone.now(),
+            max_intentos=max_intentos,
+            clave=clave,
+        )
+
+    @staticmethod
+    def tomar(trabajador, lote=1):
+        """
+        Reserva hasta `lote` tareas listas para este worker. El UPDATE vuelve
+        a comprobar que sigan libres (sin SKIP LOCKED otro worker pudo
+        tomarlas entre medio) y solo se devuelven las que quedaron a su nombre.
+        """
+        ahora = timezone.now()
+        hasta = ahora + ColaService.PLAZO
+        # Tomadas por un worker que no terminó a tiempo (p. ej. se cayó)
+        vencidas = Q(estado='en_curso', bloqueada_hasta__lt=ahora)
+        listas = Q(estado='pendiente', ejecutar_desde__lte=ahora) | vencidas
+        disponibles = Tarea.objects.filter(listas).order_by('-prioridad', 'ejecutar_desde', 'id')
+
+        with transaction.atomic():
+            if connection.features.has_select_for_update_skip_locked:
+                disponibles = disponibles.select_for_update(skip_locked=True)
+            ids = list(disponibles.values_list('id', flat=True)[:lote])
+            if not ids:
+                return []
+            seleccion = Tarea.objects.filter(listas, id__in=ids)
+            # Retomar una vencida gasta el intento del worker que no terminó
+            agotadas = seleccion.filter(vencidas, max_intentos__lte=F('intentos') + 1).update(
+                estado='fallida',
+                intentos=F('intentos') + 1,
+                bloqueada_hasta=None,
+                fecha_fin=ahora,
+                ultimo_error='Plazo vencido sin terminar en el último intento',
+            )
+            if agotadas:
+                logger.error('%s tareas fallidas: venció su plazo en el último intento', agotadas)
+            seleccion.update(
+                # Primero: MySQL evalúa el SET en orden y el CASE debe ver el estado anterior
+                intentos=Case(
+                    When(vencidas, then=F('intentos') + 1), default=F('intentos'),
+                    output_field=PositiveSmallIntegerField(),
+                ),
+                estado='en_curso',
+                bloqueada_hasta=hasta,
+                trabajador=trabajador,
+            )
+        return list(
+            Tarea.objects.filter(id__in=ids, estado='en_curso', trabajador=trabajador, bloqueada_hasta=hasta)
+            .order_by('-prioridad', 'ejecutar_desde', 'id')
+        )
+
+    @staticmethod
+    def ejecutar(tarea):
+        """Ejecuta una tarea tomada y registra el resultado (True si terminó bien)"""
+        error = ColaService.correr(tarea)
+        ColaService.registrar(tarea, error)
+        return error is None
+
+    @staticmethod
+    def correr(tarea):
+        """Ejecuta la función de la tarea sin tocar la cola: la excepción si falló, o None"""
+        func = ColaService.TIPOS.get(tarea.tipo)
+        try:
+            if func is None:
+                raise LookupError(f'Tipo de tarea desconocido: {tarea.tipo}')
+            func(**tarea.argumentos)
+        except Exception as e:
+            return e
+        return None
+
+    @staticmethod
+    def registrar(tarea, error=None):
+        """
+        Guarda el resultado de correr(). Puede lanzar DatabaseError: run_worker
+        lo vuelve a intentar al recuperar la conexión, para no repetir una
+        tarea que ya se ejecutó.
+        """
+        if error is not None:
+            ColaService._fallo(tarea, error)
+            return
+        # Si el plazo venció y otro worker la retomó, la tarea ya no es de este
+        Tarea.objects.filter(id=tarea.id, trabajador=tarea.trabajador, estado='en_curso').update(
+            estado='completada',
+            intentos=tarea.intentos + 1,
+            bloqueada_hasta=None,
+            fecha_fin=timezone.now(),
+        )
+
+    @staticmethod
+    def liberar(tareas):
+        """Devuelve a la cola tareas tomadas que no se ejecutaron"""
+        Tarea.objects.filter(id__in=[t.id for t in tareas], estado='en_curso').update(
+            estado='pendiente', bloqueada_hasta=None, trabajador=''
+        )
+
+    @staticmethod
+    def purgar(dias):
+        """Borra las tareas completadas hace más de `dias` días"""
+        limite = timezone.now() - timedelta(days=dias)
+        return Tarea.objects.filter(estado='completada', fecha_fin__lt=limite).delete()[0]
+
+    @staticmethod
+    def nombre_trabajador():
+        return f'{socket.gethostname()}:{os.getpid()}'
+
+    @staticmethod
+    def _fallo(tarea, error):
+        intentos = tarea.intentos + 1
+        detalle = ''.join(traceback.format_exception(error))[-4000:]
+        if intentos >= tarea.max_intentos:
+            logger.error('Tarea %s #%s fallida tras %s intentos: %s', tarea.tipo, tarea.id, intentos, error)
+            cambios = {'estado': 'fallida', 'fecha_fin': timezone.now()}
+        else:
+            espera = min(ColaService.BASE_REINTENTO * 2 ** (intentos - 1), ColaService.MAX_REINTENTO)
+            logger.warning('Tarea %s #%s falló (intento %s), reintento en %s: %s',
+                           tarea.tipo, tarea.id, intentos, espera, error)
+            cambios = {'estado': 'pendiente', 'ejecutar_desde': timezone.now() + espera}
+        Tarea.objects.filter(id=tarea.id, trabajador=tarea.trabajador, estado='en_curso').update(
+            intentos=intentos, bloqueada_hasta=None, ultimo_error=detalle, **cambios
+        )
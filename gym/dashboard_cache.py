@@ -0,0 +1,50 @@
+"""
+Versiones de caché para los fragmentos de los dashboards.
+
+Cada dashboard guarda sus secciones con {% cache %} usando como clave la
+versión del usuario (dashboard y dashboard_entrenador) o del rol
+administrador (dashboard_admin). Los signals de gym/signals.py cambian la
+versión cuando se escribe algo relevante, así los fragmentos viejos dejan
+de usarse sin tener que borrarlos uno por uno.
+"""
+import time
+
+from django.core.cache import cache
+
+# Tiempo máximo que vive un fragmento aunque nadie lo invalide
+DASHBOARD_CACHE_TIMEOUT = 60 * 60  # 1 hora
+
+SCOPE_ADMIN = 'admin'
+
+
+def _version_key(scope):
+    return f'dashboard:version:{scope}'
+
+
+def _nueva_version():
+    # Un valor único (y no un contador) evita reutilizar fragmentos antiguos
+    # si la clave de versión es desalojada de la caché y se vuelve a crear.
+    return time.time_ns()
+
+
+def get_version(scope):
+    """Versión actual de un scope ('usuario:<id>' o 'admin')"""
+    return cache.get_or_set(_version_key(scope), _nueva_version, None)
+
+
+def bump_version(*scopes):
+    """Invalida los fragmentos de los scopes indicados"""
+    version = _nueva_version()
+    cache.set_many({_version_key(scope): version for scope in scopes}, None)
+
+
+def scope_usuario(user_id):
+    return f'usuario:{user_id}'
+
+
+def version_usuario(user_id):
+    return get_version(scope_usuario(user_id))
+
+
+def version_admin():
+    return get_version(SCOPE_ADMIN)
@@ -0,0 +1,205 @@
+"""
+Lecturas en réplicas con lectura de lo propio escrito.
+
+Solo las vistas marcadas con @usa_replica (páginas de lectura pesadas y
+reportes) leen de las réplicas de settings.DATABASE_REPLICAS; todo lo demás,
+y toda escritura, va al primario ('default'). Un request que escribe deja
+al navegador la cookie COOKIE_PRIMARIO y durante REPLICA_STICKY segundos sus
+requests siguientes leen del primario, así el usuario ve lo que acaba de
+registrar aunque la réplica vaya atrasada. Una réplica con más de
+REPLICA_MAX_RETRASO segundos de atraso (o caída) deja de usarse hasta la
+siguiente revisión.
+"""
+import contextvars
+import logging
+import random
+import time
+from asyncio import iscoroutinefunction
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger('gym.db')
+
+COOKIE_PRIMARIO = 'gymflow_primario'
+
+# Cada cuánto se vuelve a medir el atraso de una réplica
+INTERVALO_REVISION = 5  # segundos
+
+# None: fuera de @usa_replica; si no, {'escribio': bool}
+_lectura = contextvars.ContextVar('gymflow_lectura_replica', default=None)
+
+# [escribió] del request en curso (lo consulta ReplicaMiddleware)
+_escrituras = contextvars.ContextVar('gymflow_escrituras', default=None)
+
+_revisiones = {}  # alias -> (sana, revisada)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+@contextmanager
+def en_replica():
+    """Las lecturas del bloque pueden ir a una réplica (hasta la primera escritura)"""
+    token = _lectura.set({'escribio': False})
+    try:
+        yield
+    finally:
+        _lectura.reset(token)
+
+
+def usa_replica(view_func=None, *, versiones=None):
+    """
+    Decorador para vistas de solo lectura: leen de una réplica sana.
+
+    Si la vista guarda fragmentos en caché, `versiones(request)` devuelve
+    sus versiones de dashboard_cache (time_ns del último cambio): cuando
+    alguna es más nueva que el atraso tolerado se lee del primario, para no
+    cachear con la versión nueva datos que la réplica aún no tiene.
+    """
+    def decorator(view_func):
+        def _en_primario(request):
+            return (
+                not replicas()
+                or request.method not in ('GET', 'HEAD')
+                or COOKIE_PRIMARIO in request.COOKIES
+                or (versiones and _alguna_reciente(versiones(request)))
+            )
+
+        def _preparar(response):
+            if response.streaming:
+                # El contenido se genera después de que la vista retorna
+                response.streaming_content = _en_replica_iter(response.streaming_content)
+            return response
+
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def _wrapped_view(request, *args, **kwargs):
+                if _en_primario(request):
+                    return await view_func(request, *args, **kwargs)
+                # sync_to_async copia el contexto: el ORM ve en_replica()
+                with en_replica():
+                    return _preparar(await view_func(request, *args, **kwargs))
+            return _wrapped_view
+
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if _en_primario(request):
+                return view_func(request, *args, **kwargs)
+            with en_replica():
+                response = view_func(request, *args, **kwargs)
+            return _preparar(response)
+        return _wrapped_view
+    return decorator(view_func) if view_func else decorator
+
+
+def _alguna_reciente(versiones_ns):
+    # El atraso medido puede tener hasta INTERVALO_REVISION segundos de antigüedad
+    ventana = (getattr(settings, 'REPLICA_MAX_RETRASO', 5) + INTERVALO_REVISION) * 10**9
+    ahora = time.time_ns()
+    return any(ahora - version < ventana for version in versiones_ns)
+
+
+def _en_replica_iter(contenido):
+    with en_replica():
+        yield from contenido
+
+
+class ReplicaRouter:
+    """Lecturas a una réplica solo dentro de en_replica(); escrituras al primario"""
+
+    def db_for_read(self, model, **hints):
+        estado = _lectura.get()
+        if estado is None or estado['escribio'] or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        sanas = [alias for alias in replicas() if _sana(alias)]
+        return random.choice(sanas) if sanas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        estado = _lectura.get()
+        if estado is not None:
+            # Lo que se lea después en este request debe ver la escritura
+            estado['escribio'] = True
+        _marcar_escritura()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Las réplicas tienen los mismos datos que el primario
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # El esquema llega a las réplicas por replicación
+        return db not in replicas()
+
+
+class ReplicaMiddleware:
+    """
+    Marca con COOKIE_PRIMARIO a quien escribió, para que sus próximos
+    requests lean del primario (REPLICA_STICKY segundos).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _escrituras.set([False])
+        try:
+            response = self.get_response(request)
+            escribio = _escrituras.get()[0]
+        finally:
+            _escrituras.reset(token)
+        if replicas() and (escribio or request.method not in ('GET', 'HEAD', 'OPTIONS')):
+            response.set_cookie(
+                COOKIE_PRIMARIO, '1',
+                max_age=getattr(settings, 'REPLICA_STICKY', 15),
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+def _marcar_escritura():
+    escrituras = _escrituras.get()
+    if escrituras is not None:
+        escrituras[0] = True
+
+
+def _sana(alias):
+    ahora = time.monotonic()
+    revision = _revisiones.get(alias)
+    if revision and ahora - revision[1] < INTERVALO_REVISION:
+        return revision[0]
+
+    try:
+        retraso = _retraso(alias)
+    except Exception as e:
+        logger.warning('Réplica %s no disponible: %s', alias, e)
+        retraso = None
+    sana = retraso is not None and retraso <= getattr(settings, 'REPLICA_MAX_RETRASO', 5)
+    if not sana and (not revision or revision[0]):
+        logger.warning('Réplica %s fuera de servicio (atraso: %s s)', alias, retraso)
+    _revisiones[alias] = (sana, ahora)
+    return sana
+
+
+def _retraso(alias):
+    """Segundos de atraso de la réplica (None si no está replicando)"""
+    conexion = connections[alias]
+    if conexion.vendor != 'mysql':
+        # Sin replicación que medir (p. ej. SQLite en desarrollo)
+        conexion.ensure_connection()
+        return 0
+    with conexion.cursor() as cursor:
+        try:
+            cursor.execute('SHOW REPLICA STATUS')
+        except Exception:
+            # MySQL < 8.0.22
+            cursor.execute('SHOW SLAVE STATUS')
+        columnas = [c[0] for c in cursor.description]
+        fila = cursor.fetchone()
+    if fila is None:
+        return None
+    estado = dict(zip(columnas, fila))
+    return estado.get('Seconds_Behind_Source', estado.get('Seconds_Behind_Master'))
@@ -0,0 +1,111 @@
+import hashlib
+from asyncio import iscoroutinefunction
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import redirect
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+
+def login_requerido(view_func):
+    """
+    login_required que también sirve para vistas async (el de Django 4.2
+    solo envuelve vistas síncronas: a una async le devolvería la corrutina
+    sin ejecutar).
+    """
+    if not iscoroutinefunction(view_func):
+        return login_required(view_func)
+
+    @wraps(view_func)
+    async def _wrapped_view(request, *args, **kwargs):
+        # request.user es perezoso: cargarlo puede consultar la base
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+    return _wrapped_view
+
+
+def rol_requerido(*tipos, mensaje, redirect_to='dashboard', redirect_kwargs=()):
+    """
+    Restringe una vista (síncrona o async) a los tipos de usuario indicados.
+
+    Usa request.tipo_usuario (PerfilUsuarioMiddleware). Si el rol no está
+    permitido muestra `mensaje` y redirige a `redirect_to`, pasándole los
+    argumentos de la vista nombrados en `redirect_kwargs`.
+    """
+    def decorator(view_func):
+        def _denegar(request, kwargs):
+            messages.error(request, mensaje)
+            return redirect(redirect_to, **{k: kwargs[k] for k in redirect_kwargs})
+
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def _wrapped_view(request, *args, **kwargs):
+                if request.tipo_usuario not in tipos:
+                    return _denegar(request, kwargs)
+                return await view_func(request, *args, **kwargs)
+            return _wrapped_view
+
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if request.tipo_usuario not in tipos:
+                return _denegar(request, kwargs)
+            return view_func(request, *args, **kwargs)
+        return _wrapped_view
+    return decorator
+
+
+def respuesta_condicional(datos_func):
+    """
+    ETag para vistas GET (síncronas o async): si el navegador ya tiene la
+    página responde 304 sin ejecutar la vista.
+
+    `datos_func(request, *args, **kwargs)` devuelve lo que determina el
+    contenido (versiones, fechas de modificación...) y debe ser mucho más
+    barato que la vista; None desactiva el 304 para ese request. Al ETag se
+    suman el usuario, su rol y el token CSRF, que también salen en la página.
+    """
+    def _etag(request, datos):
+        if datos is None or len(messages.get_messages(request)):
+            # Con mensajes pendientes hay que renderizar para mostrarlos
+            return None
+        firma = repr((
+            datos, request.user.pk, request.tipo_usuario,
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+        ))
+        return '"%s"' % hashlib.md5(firma.encode()).hexdigest()
+
+    def _completar(response, etag):
+        if etag and response.status_code == 200:
+            response['ETag'] = etag
+            # El navegador guarda la página pero la revalida en cada visita
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def _wrapped_view(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return await view_func(request, *args, **kwargs)
+                datos = await sync_to_async(datos_func)(request, *args, **kwargs)
+                etag = await sync_to_async(_etag)(request, datos)
+                if etag and (response := get_conditional_response(request, etag=etag)):
+                    return response
+                return _completar(await view_func(request, *args, **kwargs), etag)
+            return _wrapped_view
+
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+            etag = _etag(request, datos_func(request, *args, **kwargs))
+            if etag and (response := get_conditional_response(request, etag=etag)):
+                return response
+            return _completar(view_func(request, *args, **kwargs), etag)
+        return _wrapped_view
+    return decorator
@@ -3,8 +3,13 @@ Servicio para integrar con ExerciseDB API
 API: https://github.com/ExerciseDB/exercisedb-api
 Endpoint: https://exercisedb.dev/api/v2/
 """
+import asyncio
+
 import requests
-from django.core.cache import cache
+from asgiref.sync import sync_to_async
+
+from . import near_cache
+from .cola_service import ColaService
 
 # Diccionario de traducciones (ordenado por longitud para mejor matching)
 TRADUCCIONES = {
@@ -102,6 +107,12 @@ TRADUCCIONES = {
     'medicine ball': 'Balón Medicinal',
 }
 
+def _cliente_async(headers, timeout):
+    """Cliente HTTP async (httpx; solo se necesita cuando se consulta la API)"""
+    import httpx
+    return httpx.AsyncClient(headers=headers, timeout=timeout)
+
+
 def traducir_texto(texto):
     """Traduce texto de inglés a español usando diccionario"""
     if not texto or texto == 'N/A':
@@ -143,6 +154,16 @@ class ExerciseDBService:
     USE_FALLBACK_ONLY = True  # Usar SOLO ejercicios de respaldo (42 ejercicios)
     USE_V1 = True  # Usar V1 si se necesita API
     
+    # Zonas del filtro de ejercicios: términos (español e inglés) de bodyParts
+    ZONAS = {
+        'pecho': ['chest', 'pecho'],
+        'piernas': ['legs', 'upper legs', 'lower legs', 'piernas'],
+        'espalda': ['back', 'espalda'],
+        'hombros': ['shoulders', 'hombros'],
+        'brazos': ['arms', 'upper arms', 'lower arms', 'brazos'],
+        'core': ['waist', 'core', 'abs'],
+    }
+    
     @staticmethod
     def get_fallback_exercises():
         """Ejercicios de respaldo organizados por zona muscular"""
@@ -798,6 +819,147 @@ class ExerciseDBService:
         
         return ejercicio
     
+    # Detalles pedidos a la vez por el cliente async
+    MAX_CONCURRENCIA = 8
+    
+    @staticmethod
+    def _peticion_catalogo():
+        """URL base, endpoint, headers y máximo por página según la versión de la API"""
+        # Documentación: https://www.exercisedb.dev/docs
+        base_url = ExerciseDBService.BASE_URL_V1 if ExerciseDBService.USE_V1 else ExerciseDBService.BASE_URL_V2
+        
+        headers = {'User-Agent': 'GymFlow/1.0'}
+        
+        # Si usamos V2, agregar API key
+        if not ExerciseDBService.USE_V1 and ExerciseDBService.API_KEY:
+            headers['X-RapidAPI-Key'] = ExerciseDBService.API_KEY
+            headers['X-RapidAPI-Host'] = 'exercisedb-api1.p.rapidapi.com'
+        
+        # V2 requiere /api/v1/ en la ruta, V1 no
+        endpoint = f"{base_url}/api/v1/exercises" if not ExerciseDBService.USE_V1 else f"{base_url}/exercises"
+        
+        # V2 usa paginación, máximo 200 por request; V1 acepta límite directo
+        por_pagina = 500 if ExerciseDBService.USE_V1 else 200
+        return base_url, endpoint, headers, por_pagina
+    
+    @staticmethod
+    def _lista_api(response_data):
+        """Ejercicios de una respuesta de la API (V2 devuelve un objeto con 'data', V1 una lista)"""
+        if isinstance(response_data, dict) and 'data' in response_data:
+            exercises = response_data['data']  # API V2
+            print(f"✓ API V2: {len(exercises)} ejercicios, Total: {response_data.get('meta', {}).get('total', 'N/A')}")
+            return exercises
+        if isinstance(response_data, list):
+            return response_data  # API V1
+        print(f"⚠️ La API devolvió {type(response_data)} en lugar de lista")
+        print(f"⚠️ Respuesta: {str(response_data)[:200]}...")
+        raise ValueError("API response format not recognized")
+    
+    @staticmethod
+    def _desde_api(ex):
+        """Transforma un ejercicio de la API al formato de nuestra app"""
+        # API V1 y V2 pueden devolver URLs relativas o nombres de archivo
+        # Construir URLs completas según documentación ExerciseDB
+        # Referencia: https://github.com/ExerciseDB/exercisedb-api/tree/main/media
+        image_url = ex.get('imageUrl', '')
+        video_url = ex.get('videoUrl', '')
+        gif_url = ex.get('gifUrl', '')
+        exercise_id = ex.get('exerciseId', '')
+        
+        # Construir URLs completas para V1 (desde GitHub media)
+        if ExerciseDBService.USE_V1:
+            # V1 sirve medios desde GitHub
+            if image_url and not image_url.startswith('http'):
+                # Construir URL desde GitHub media
+                image_url = f'https://raw.githubusercontent.com/ExerciseDB/exercisedb-api/main/media/{image_url}'
+            
+            if gif_url and not gif_url.startswith('http'):
+                gif_url = f'https://raw.githubusercontent.com/ExerciseDB/exercisedb-api/main/media/{gif_url}'
+            elif not gif_url:
+                gif_url = image_url  # Usar imagen como fallback
+            
+            if video_url and not video_url.startswith('http'):
+                video_url = f'https://raw.githubusercontent.com/ExerciseDB/exercisedb-api/main/media/{video_url}'
+        else:
+            # V2 usa CDN propio
+            if image_url and not image_url.startswith('http') and exercise_id:
+                image_url = f'https://v2.exercisedb.io/image/{exercise_id}'
+            
+            if not gif_url:
+                gif_url = image_url
+            
+            if video_url and not video_url.startswith('http') and exercise_id:
+                video_url = f'https://v2.exercisedb.io/video/{exercise_id}'
+        
+        return {
+            'id': ex.get('exerciseId', ''),
+            'name': traducir_texto(ex.get('name', '')),  # Traducir nombre
+            'imageUrl': image_url,
+            'gifUrl': image_url,  # V2 usa la misma imagen (puede ser GIF o PNG)
+            'videoUrl': video_url,
+            'equipments': traducir_texto(', '.join(ex.get('equipments', [])) if ex.get('equipments') else 'N/A'),
+            'bodyParts': traducir_texto(', '.join(ex.get('bodyParts', [])) if ex.get('bodyParts') else 'N/A'),
+            'targetMuscles': traducir_texto(', '.join(ex.get('targetMuscles', [])) if ex.get('targetMuscles') else 'N/A'),
+            'secondaryMuscles': traducir_texto(', '.join(ex.get('secondaryMuscles', [])) if ex.get('secondaryMuscles') else ''),
+            'overview': ex.get('overview', ''),  # Mantener descripción en inglés (muy largo para traducir)
+            'instructions': ex.get('instructions', []),
+            'tips': ex.get('exerciseTips', []),
+            'variations': ex.get('variations', []),
+        }
+    
+    @staticmethod
+    def _catalogo_desde_api(exercises, limit):
+        """Ejercicios transformados, priorizando los de equipamiento típico de gym"""
+        result = []
+        for ex in exercises:
+            # Verificar que cada ejercicio sea un diccionario
+            if not isinstance(ex, dict):
+                print(f"⚠️ Ejercicio no es diccionario: {type(ex)}")
+                continue
+            result.append(ExerciseDBService._desde_api(ex))
+        
+        if result:
+            print(f"✓ Obtenidos {len(result)} ejercicios de ExerciseDB API")
+            
+            # Filtrar ejercicios comunes de gym (equipamiento típico)
+            ejercicios_gym = [
+                ex for ex in result 
+                if any(equipo in ex.get('equipments', '').lower() 
+                       for equipo in ['barra', 'mancuerna', 'peso corporal', 'máquina', 'polea', 
+                                    'barbell', 'dumbbell', 'body weight', 'machine', 'cable'])
+            ]
+            
+            # Si tenemos suficientes ejercicios de gym, usarlos
+            if len(ejercicios_gym) >= min(50, limit):
+                result = ejercicios_gym[:limit]
+                print(f"✓ Filtrados {len(result)} ejercicios comunes de gym")
+        return result
+    
+    @staticmethod
+    def _detalle_desde_api(ex):
+        """Ejercicio del endpoint de detalle (sin traducir, como lo entrega la API)"""
+        return {
+            'id': ex.get('exerciseId', ''),
+            'name': ex.get('name', ''),
+            'imageUrl': ex.get('imageUrl', ''),
+            'videoUrl': ex.get('videoUrl', ''),
+            'equipments': ', '.join(ex.get('equipments', [])),
+            'bodyParts': ', '.join(ex.get('bodyParts', [])),
+            'targetMuscles': ', '.join(ex.get('targetMuscles', [])),
+            'secondaryMuscles': ', '.join(ex.get('secondaryMuscles', [])),
+            'overview': ex.get('overview', ''),
+            'instructions': ex.get('instructions', []),
+            'tips': ex.get('exerciseTips', []),
+            'variations': ex.get('variations', []),
+        }
+    
+    @staticmethod
+    def _buscar_en_respaldo(exercise_id):
+        for ex in ExerciseDBService.get_fallback_exercises():
+            if ex['id'] == exercise_id:
+                return ex
+        return None
+    
     @staticmethod
     def get_all_exercises(limit=100):
         """Obtiene ejercicios de ExerciseDB o usa respaldo"""
@@ -808,38 +970,18 @@ class ExerciseDBService:
             return ExerciseDBService.get_fallback_exercises()[:limit]
         
         cache_key = f'exercisedb_all_{limit}'
-        cached = cache.get(cache_key)
+        cached = near_cache.catalogo.get(cache_key)
         
         if cached:
             return cached
         
         try:
             # Llamar a la API de ExerciseDB
-            # Documentación: https://www.exercisedb.dev/docs
-            base_url = ExerciseDBService.BASE_URL_V1 if ExerciseDBService.USE_V1 else ExerciseDBService.BASE_URL_V2
-            
-            headers = {'User-Agent': 'GymFlow/1.0'}
-            
-            # Si usamos V2, agregar API key
-            if not ExerciseDBService.USE_V1 and ExerciseDBService.API_KEY:
-                headers['X-RapidAPI-Key'] = ExerciseDBService.API_KEY
-                headers['X-RapidAPI-Host'] = 'exercisedb-api1.p.rapidapi.com'
-            
-            # V2 requiere /api/v1/ en la ruta, V1 no
-            endpoint = f"{base_url}/api/v1/exercises" if not ExerciseDBService.USE_V1 else f"{base_url}/exercises"
-            
-            # Para V2, usar parámetro 'limit' correcto (máximo 200 por página)
-            params = {}
-            if not ExerciseDBService.USE_V1:
-                # V2 usa paginación, máximo 200 por request
-                params['limit'] = min(limit, 200)
-            else:
-                # V1 acepta límite directo
-                params['limit'] = min(limit, 500)
+            base_url, endpoint, headers, por_pagina = ExerciseDBService._peticion_catalogo()
             
             response = requests.get(
                 endpoint,
-                params=params,
+                params={'limit': min(limit, por_pagina)},
                 timeout=15,
                 headers=headers
             )
@@ -847,93 +989,10 @@ class ExerciseDBService:
             print(f"✓ ExerciseDB API ({base_url}) - Status: {response.status_code}")
             
             if response.status_code == 200:
-                response_data = response.json()
-                
-                # V2 devuelve un objeto con 'data', V1 devuelve lista directa
-                if isinstance(response_data, dict) and 'data' in response_data:
-                    exercises = response_data['data']  # API V2
-                    print(f"✓ API V2: {len(exercises)} ejercicios, Total: {response_data.get('meta', {}).get('total', 'N/A')}")
-                elif isinstance(response_data, list):
-                    exercises = response_data  # API V1
-                else:
-                    print(f"⚠️ La API devolvió {type(response_data)} en lugar de lista")
-                    print(f"⚠️ Respuesta: {str(response_data)[:200]}...")
-                    raise ValueError("API response format not recognized")
-                
-                # Transformar al formato de nuestra app
-                result = []
-                for ex in exercises:
-                    # Verificar que cada ejercicio sea un diccionario
-                    if not isinstance(ex, dict):
-                        print(f"⚠️ Ejercicio no es diccionario: {type(ex)}")
-                        continue
-                    # API V1 y V2 pueden devolver URLs relativas o nombres de archivo
-                    # Construir URLs completas según documentación ExerciseDB
-                    # Referencia: https://github.com/ExerciseDB/exercisedb-api/tree/main/media
-                    image_url = ex.get('imageUrl', '')
-                    video_url = ex.get('videoUrl', '')
-                    gif_url = ex.get('gifUrl', '')
-                    exercise_id = ex.get('exerciseId', '')
-                    
-                    # Construir URLs completas para V1 (desde GitHub media)
-                    if ExerciseDBService.USE_V1:
-                        # V1 sirve medios desde GitHub
-                        if image_url and not image_url.startswith('http'):
-                            # Construir URL desde GitHub media
-                            image_url = f'https://raw.githubusercontent.com/ExerciseDB/exercisedb-api/main/media/{image_url}'
-                        
-                        if gif_url and not gif_url.startswith('http'):
-                            gif_url = f'https://raw.githubusercontent.com/ExerciseDB/exercisedb-api/main/media/{gif_url}'
-                        elif not gif_url:
-                            gif_url = image_url  # Usar imagen como fallback
-                        
-                        if video_url and not video_url.startswith('http'):
-                            video_url = f'https://raw.githubusercontent.com/ExerciseDB/exercisedb-api/main/media/{video_url}'
-                    else:
-                        # V2 usa CDN propio
-                        if image_url and not image_url.startswith('http') and exercise_id:
-                            image_url = f'https://v2.exercisedb.io/image/{exercise_id}'
-                        
-                        if not gif_url:
-                            gif_url = image_url
-                        
-                        if video_url and not video_url.startswith('http') and exercise_id:
-                            video_url = f'https://v2.exercisedb.io/video/{exercise_id}'
-                    
-                    exercise = {
-                        'id': ex.get('exerciseId', ''),
-                        'name': traducir_texto(ex.get('name', '')),  # Traducir nombre
-                        'imageUrl': image_url,
-                        'gifUrl': image_url,  # V2 usa la misma imagen (puede ser GIF o PNG)
-                        'videoUrl': video_url,
-                        'equipments': traducir_texto(', '.join(ex.get('equipments', [])) if ex.get('equipments') else 'N/A'),
-                        'bodyParts': traducir_texto(', '.join(ex.get('bodyParts', [])) if ex.get('bodyParts') else 'N/A'),
-                        'targetMuscles': traducir_texto(', '.join(ex.get('targetMuscles', [])) if ex.get('targetMuscles') else 'N/A'),
-                        'secondaryMuscles': traducir_texto(', '.join(ex.get('secondaryMuscles', [])) if ex.get('secondaryMuscles') else ''),
-                        'overview': ex.get('overview', ''),  # Mantener descripción en inglés (muy largo para traducir)
-                        'instructions': ex.get('instructions', []),
-                        'tips': ex.get('exerciseTips', []),
-                        'variations': ex.get('variations', []),
-                    }
-                    result.append(exercise)
-                
+                exercises = ExerciseDBService._lista_api(response.json())
+                result = ExerciseDBService._catalogo_desde_api(exercises, limit)
                 if result:
-                    print(f"✓ Obtenidos {len(result)} ejercicios de ExerciseDB API")
-                    
-                    # Filtrar ejercicios comunes de gym (equipamiento típico)
-                    ejercicios_gym = [
-                        ex for ex in result 
-                        if any(equipo in ex.get('equipments', '').lower() 
-                               for equipo in ['barra', 'mancuerna', 'peso corporal', 'máquina', 'polea', 
-                                            'barbell', 'dumbbell', 'body weight', 'machine', 'cable'])
-                    ]
-                    
-                    # Si tenemos suficientes ejercicios de gym, usarlos
-                    if len(ejercicios_gym) >= min(50, limit):
-                        result = ejercicios_gym[:limit]
-                        print(f"✓ Filtrados {len(result)} ejercicios comunes de gym")
-                    
-                    cache.set(cache_key, result, 86400)  # 24 horas
+                    near_cache.catalogo.set(cache_key, result, 86400)  # 24 horas
                     return result
                 
         except Exception as e:
@@ -948,47 +1007,31 @@ class ExerciseDBService:
     def get_exercise_by_id(exercise_id):
         """Obtiene un ejercicio específico"""
         # Primero buscar en ejercicios de respaldo
-        fallback = ExerciseDBService.get_fallback_exercises()
-        for ex in fallback:
-            if ex['id'] == exercise_id:
-                return ex
+        ejercicio = ExerciseDBService._buscar_en_respaldo(exercise_id)
+        if ejercicio:
+            return ejercicio
         
         # Si no está en respaldo y no usamos solo respaldo, intentar API
         if ExerciseDBService.USE_FALLBACK_ONLY:
             return None
         
         cache_key = f'exercisedb_{exercise_id}'
-        cached = cache.get(cache_key)
+        cached = near_cache.catalogo.get(cache_key)
         
         if cached:
             return cached
         
         try:
+            _, endpoint, headers, _ = ExerciseDBService._peticion_catalogo()
             response = requests.get(
-                f"{ExerciseDBService.BASE_URL}/exercises/{exercise_id}",
+                f"{endpoint}/{exercise_id}",
                 timeout=10,
-                headers={'User-Agent': 'GymFlow/1.0'}
+                headers=headers
             )
             
             if response.status_code == 200:
-                ex = response.json()
-                
-                exercise = {
-                    'id': ex.get('exerciseId', ''),
-                    'name': ex.get('name', ''),
-                    'imageUrl': ex.get('imageUrl', ''),
-                    'videoUrl': ex.get('videoUrl', ''),
-                    'equipments': ', '.join(ex.get('equipments', [])),
-                    'bodyParts': ', '.join(ex.get('bodyParts', [])),
-                    'targetMuscles': ', '.join(ex.get('targetMuscles', [])),
-                    'secondaryMuscles': ', '.join(ex.get('secondaryMuscles', [])),
-                    'overview': ex.get('overview', ''),
-                    'instructions': ex.get('instructions', []),
-                    'tips': ex.get('exerciseTips', []),
-                    'variations': ex.get('variations', []),
-                }
-                
-                cache.set(cache_key, exercise, 86400)
+                exercise = ExerciseDBService._detalle_desde_api(response.json())
+                near_cache.catalogo.set(cache_key, exercise, 86400)
                 return exercise
                 
         except Exception as e:
@@ -996,11 +1039,143 @@ class ExerciseDBService:
         
         return None
     
+    # ---------- Cliente async (vistas async bajo ASGI) ----------
+    # Misma lógica y misma caché que las versiones síncronas, pero las
+    # llamadas a la API no bloquean el worker mientras esperan respuesta.
+    
+    @staticmethod
+    async def aget_all_exercises(limit=100, esperar=True):
+        """
+        Versión async de get_all_exercises: las páginas de V2 se piden en
+        paralelo. Con esperar=False no llama a la API: si el catálogo no está
+        en caché encola su descarga (run_worker) y devuelve el respaldo.
+        """
+        if ExerciseDBService.USE_FALLBACK_ONLY:
+            return ExerciseDBService.get_fallback_exercises()[:limit]
+        
+        cache_key = f'exercisedb_all_{limit}'
+        cached = await sync_to_async(near_cache.catalogo.get)(cache_key)
+        if cached:
+            return cached
+        
+        if not esperar:
+            await sync_to_async(ExerciseDBService.encolar_refresco)(limit)
+            return ExerciseDBService.get_fallback_exercises()[:limit]
+        
+        try:
+            base_url, endpoint, headers, por_pagina = ExerciseDBService._peticion_catalogo()
+            paginas = [
+                {'limit': min(por_pagina, limit - offset), 'offset': offset}
+                for offset in range(0, limit, por_pagina)
+            ]
+            async with _cliente_async(headers, timeout=15) as cliente:
+                respuestas = await asyncio.gather(*[
+                    cliente.get(endpoint, params=params) for params in paginas
+                ])
+            
+            exercises = []
+            for response in respuestas:
+                print(f"✓ ExerciseDB API ({base_url}) - Status: {response.status_code}")
+                if response.status_code == 200:
+                    exercises.extend(ExerciseDBService._lista_api(response.json()))
+            
+            result = ExerciseDBService._catalogo_desde_api(exercises, limit)
+            if result:
+                await sync_to_async(near_cache.catalogo.set)(cache_key, result, 86400)
+                return result
+        
+        except Exception as e:
+            print(f"⚠️ Error ExerciseDB API: {e}")
+        
+        print("⚠️ Usando ejercicios de respaldo")
+        return ExerciseDBService.get_fallback_exercises()[:limit]
+    
+    @staticmethod
+    async def aget_exercise_by_id(exercise_id, cliente=None):
+        """Versión async de get_exercise_by_id (acepta un cliente ya abierto)"""
+        ejercicio = ExerciseDBService._buscar_en_respaldo(exercise_id)
+        if ejercicio or ExerciseDBService.USE_FALLBACK_ONLY:
+            return ejercicio
+        
+        cache_key = f'exercisedb_{exercise_id}'
+        cached = await sync_to_async(near_cache.catalogo.get)(cache_key)
+        if cached:
+            return cached
+        
+        try:
+            _, endpoint, headers, _ = ExerciseDBService._peticion_catalogo()
+            if cliente is None:
+                async with _cliente_async(headers, timeout=10) as cliente:
+                    response = await cliente.get(f"{endpoint}/{exercise_id}")
+            else:
+                response = await cliente.get(f"{endpoint}/{exercise_id}")
+            
+            if response.status_code == 200:
+                exercise = ExerciseDBService._detalle_desde_api(response.json())
+                await sync_to_async(near_cache.catalogo.set)(cache_key, exercise, 86400)
+                return exercise
+        
+        except Exception as e:
+            print(f"⚠️ Error al obtener ejercicio {exercise_id}: {e}")
+        
+        return None
+    
+    @staticmethod
+    async def aget_exercises_by_ids(exercise_ids):
+        """
+        Varios ejercicios pedidos en paralelo (como máximo MAX_CONCURRENCIA a
+        la vez). Solo lo usa warm_cache para precargar los detalles: las
+        vistas async piden un único ejercicio (aget_exercise_by_id) o el
+        catálogo, que ya trae lo que muestra la lista.
+        """
+        limite = asyncio.Semaphore(ExerciseDBService.MAX_CONCURRENCIA)
+        _, _, headers, _ = ExerciseDBService._peticion_catalogo()
+        
+        async with _cliente_async(headers, timeout=10) as cliente:
+            async def uno(exercise_id):
+                async with limite:
+                    return await ExerciseDBService.aget_exercise_by_id(exercise_id, cliente)
+            
+            ejercicios = await asyncio.gather(*[uno(exercise_id) for exercise_id in exercise_ids])
+        return {exercise_id: ex for exercise_id, ex in zip(exercise_ids, ejercicios) if ex}
+    
+    @staticmethod
+    async def asearch_exercises(query, esperar=True):
+        """Versión async de search_exercises"""
+        ejercicios = await ExerciseDBService.aget_all_exercises(limit=500, esperar=esperar)
+        return ExerciseDBService._coinciden(ejercicios, query)
+    
+    @staticmethod
+    async def aget_exercises_by_zone(zona, limit=100, esperar=True):
+        """Versión async de get_exercises_by_zone"""
+        if ExerciseDBService.USE_FALLBACK_ONLY:
+            return ExerciseDBService.filtrar_por_zona(ExerciseDBService.get_fallback_exercises()[:limit], zona)
+        
+        cache_key = f'exercisedb_zona_{zona.lower()}_{limit}'
+        cached = await sync_to_async(near_cache.catalogo.get)(cache_key)
+        if cached is not None:
+            return cached
+        
+        ejercicios = await ExerciseDBService.aget_all_exercises(limit=limit, esperar=esperar)
+        result = ExerciseDBService.filtrar_por_zona(ejercicios, zona)
+        # Solo si el catálogo vino de la API: el respaldo (sin catálogo todavía
+        # o tras un error) no se guarda 24 h como zona
+        if await sync_to_async(near_cache.catalogo.get)(f'exercisedb_all_{limit}') is not None:
+            await sync_to_async(near_cache.catalogo.set)(cache_key, result, 86400)
+        return result
+    
+    @staticmethod
+    def encolar_refresco(limit):
+        """Encola la descarga del catálogo (una sola tarea pendiente por límite)"""
+        ColaService.encolar('refrescar_catalogo', {'limit': limit}, prioridad=5, clave=f'catalogo:{limit}')
+    
     @staticmethod
     def search_exercises(query):
         """Busca ejercicios"""
-        all_exercises = ExerciseDBService.get_all_exercises(limit=500)
-        
+        return ExerciseDBService._coinciden(ExerciseDBService.get_all_exercises(limit=500), query)
+    
+    @staticmethod
+    def _coinciden(all_exercises, query):
         if not all_exercises:
             return []
         
@@ -1013,4 +1188,42 @@ class ExerciseDBService:
             or query in ex.get('targetMuscles', '').lower()
             or query in ex.get('equipments', '').lower()
         ]
+    
+    @staticmethod
+    def invalidar_catalogo():
+        """Descarta el catálogo cacheado en todos los workers (ver near_cache)"""
+        near_cache.catalogo.invalidar()
+    
+    @staticmethod
+    def version_catalogo():
+        """Cambia cada vez que se invalida el catálogo (validador para ETag)"""
+        return near_cache.catalogo.version()
+    
+    @staticmethod
+    def filtrar_por_zona(ejercicios, zona):
+        """Ejercicios cuyas partes del cuerpo corresponden a `zona` (ver ZONAS)"""
+        zona = zona.lower()
+        terminos = ExerciseDBService.ZONAS.get(zona, [zona])
+        return [
+            e for e in ejercicios
+            if any(termino in e.get('bodyParts', '').lower() for termino in terminos)
+        ]
+    
+    @staticmethod
+    def get_exercises_by_zone(zona, limit=100):
+        """Ejercicios del catálogo de una zona muscular, cacheados por zona"""
+        # El respaldo está en memoria: filtrarlo cuesta menos que ir a la caché
+        if ExerciseDBService.USE_FALLBACK_ONLY:
+            return ExerciseDBService.filtrar_por_zona(ExerciseDBService.get_all_exercises(limit=limit), zona)
+        
+        cache_key = f'exercisedb_zona_{zona.lower()}_{limit}'
+        cached = near_cache.catalogo.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        result = ExerciseDBService.filtrar_por_zona(ExerciseDBService.get_all_exercises(limit=limit), zona)
+        # Solo si el catálogo vino de la API: el respaldo tras un error no se guarda 24 h
+        if near_cache.catalogo.get(f'exercisedb_all_{limit}') is not None:
+            near_cache.catalogo.set(cache_key, result, 86400)
+        return result
 
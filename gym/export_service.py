@@ -0,0 +1,106 @@
+"""
+Exportación en streaming del historial de un usuario (CSV o NDJSON).
+"""
+import csv
+import json
+import zlib
+from datetime import date, datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Rutina, RegistroEntrenamiento, RegistroSerie, ProgresoFisico
+
+
+def por_lotes(queryset, campos, tamano=2000):
+    """
+    Filas de `queryset` (tuplas con `campos`) leídas en páginas por pk.
+
+    En MySQL QuerySet.iterator() no usa cursores del lado del servidor y el
+    driver trae el resultado completo; paginando por pk cada consulta es
+    corta, la memoria no depende del total y no se bloquea la tabla.
+    """
+    queryset = queryset.order_by('pk')
+    ultimo = None
+    while True:
+        pagina = queryset if ultimo is None else queryset.filter(pk__gt=ultimo)
+        filas = list(pagina.values_list('pk', *campos)[:tamano])
+        for fila in filas:
+            yield fila[1:]
+        if len(filas) < tamano:
+            return
+        ultimo = filas[-1][0]
+
+
+class _Eco:
+    """Archivo falso para csv.writer: devuelve la línea en vez de guardarla"""
+    def write(self, valor):
+        return valor
+
+
+class ExportService:
+    """Historial de un usuario como flujo de líneas CSV o NDJSON"""
+    FORMATOS = ('csv', 'ndjson')
+    TAMANO_LOTE = 2000
+
+    # tabla: (modelo, campos, nombres de columna)
+    TABLAS = {
+        'entrenamientos': (
+            RegistroEntrenamiento,
+            ('fecha', 'rutina__nombre', 'duracion_min', 'calorias', 'nivel_esfuerzo', 'completado', 'notas'),
+            ('fecha', 'rutina', 'duracion_min', 'calorias', 'nivel_esfuerzo', 'completado', 'notas'),
+        ),
+        'series': (
+            RegistroSerie,
+            ('fecha', 'entrenamiento_id', 'ejercicio__nombre', 'numero', 'repeticiones', 'peso'),
+            ('fecha', 'entrenamiento_id', 'ejercicio', 'numero', 'repeticiones', 'peso'),
+        ),
+        'progreso': (
+            ProgresoFisico,
+            ('fecha', 'peso', 'grasa_corporal', 'masa_muscular', 'cintura', 'pecho', 'brazos', 'piernas', 'notas'),
+            ('fecha', 'peso', 'grasa_corporal', 'masa_muscular', 'cintura', 'pecho', 'brazos', 'piernas', 'notas'),
+        ),
+        'rutinas': (
+            Rutina,
+            ('nombre', 'entrenador__username', 'dificultad', 'duracion_min', 'objetivo', 'activa', 'fecha_creacion'),
+            ('nombre', 'entrenador', 'dificultad', 'duracion_min', 'objetivo', 'activa', 'fecha_creacion'),
+        ),
+    }
+
+    @staticmethod
+    def lineas(usuario, tabla, formato):
+        """Genera el archivo línea por línea; la primera sale antes de consultar"""
+        modelo, campos, columnas = ExportService.TABLAS[tabla]
+        filas = por_lotes(modelo.objects.filter(usuario=usuario), campos, ExportService.TAMANO_LOTE)
+
+        if formato == 'csv':
+            escritor = csv.writer(_Eco())
+            yield escritor.writerow(columnas)
+            for fila in filas:
+                yield escritor.writerow([_valor(valor) for valor in fila])
+        else:
+            for fila in filas:
+                yield json.dumps(dict(zip(columnas, map(_valor, fila))), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+    @staticmethod
+    def comprimir(lineas):
+        """Gzip incremental: cada bloque se envía apenas está listo"""
+        compresor = zlib.compressobj(wbits=31)  # 31 = formato gzip
+        primera = True
+        for linea in lineas:
+            datos = compresor.compress(linea.encode())
+            if primera:
+                # Sin flush el compresor retendría los primeros bytes
+                datos += compresor.flush(zlib.Z_SYNC_FLUSH)
+                primera = False
+            if datos:
+                yield datos
+        yield compresor.flush()
+
+
+def _valor(valor):
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor).isoformat()
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return valor
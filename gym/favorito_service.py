@@ -0,0 +1,81 @@
+"""
+Favoritos de ejercicios.
+
+Los ids (de ExerciseDB) de los ejercicios favoritos de cada usuario se
+guardan como un frozenset en near_cache.favoritos: las listas y el detalle
+preguntan `ejercicio_id in ids` sin consultar la base. Los signals de
+Favorito invalidan el grupo del usuario.
+"""
+from django.db import IntegrityError, transaction
+
+from . import near_cache
+from .exercisedb_service import ExerciseDBService
+from .models import Ejercicio, Favorito
+
+
+class FavoritoService:
+    """Consultar y alternar favoritos (único por usuario y ejercicio)"""
+
+    @staticmethod
+    def ids(user_id):
+        """frozenset con los ejercicio_id favoritos del usuario"""
+        return near_cache.favoritos.get_or_set(
+            'ids',
+            lambda: frozenset(
+                Favorito.objects.filter(usuario_id=user_id, ejercicio__isnull=False)
+                .values_list('ejercicio__ejercicio_id', flat=True)
+            ),
+            grupo=str(user_id),
+        )
+
+    @staticmethod
+    def es_favorito(user_id, ejercicio_id):
+        return ejercicio_id in FavoritoService.ids(user_id)
+
+    @staticmethod
+    def invalidar(user_id):
+        """Invalida los ids del usuario cuando se confirme la transacción en curso"""
+        # Antes del COMMIT otro request podría volver a cachear los ids viejos
+        transaction.on_commit(lambda: near_cache.favoritos.invalidar(str(user_id)))
+
+    @staticmethod
+    def alternar(usuario, ejercicio_id):
+        """
+        Quita el favorito si existe y si no lo agrega. Retorna el estado
+        final (True = favorito) o None si el ejercicio no existe.
+
+        Todo en una transacción: un solo DELETE sobre el par (único) decide
+        si se quitó o hay que agregarlo. La restricción única hace seguro el
+        doble clic simultáneo: si dos requests intentan agregar a la vez, el
+        segundo INSERT falla y ambos responden que quedó como favorito. Los
+        ids cacheados se invalidan al confirmar (signal de Favorito).
+        """
+        ejercicio_pk = FavoritoService._ejercicio_pk(ejercicio_id)
+        if ejercicio_pk is None:
+            return None
+
+        with transaction.atomic():
+            borrados, _ = Favorito.objects.filter(usuario=usuario, ejercicio_id=ejercicio_pk).delete()
+            if borrados:
+                return False
+            try:
+                with transaction.atomic():
+                    Favorito.objects.create(usuario=usuario, ejercicio_id=ejercicio_pk)
+            except IntegrityError:
+                pass  # Otro request lo agregó entre el DELETE y el INSERT
+        return True
+
+    @staticmethod
+    def _ejercicio_pk(ejercicio_id):
+        """Id del Ejercicio en la base; se crea desde el catálogo si aún no está"""
+        pk = Ejercicio.objects.filter(ejercicio_id=ejercicio_id).values_list('id', flat=True).first()
+        if pk is not None:
+            return pk
+        ejercicio_data = ExerciseDBService.get_exercise_by_id(ejercicio_id)
+        if not ejercicio_data:
+            return None
+        ejercicio, _ = Ejercicio.objects.get_or_create(
+            ejercicio_id=ejercicio_id,
+            defaults={'nombre': ejercicio_data['name']},
+        )
+        return ejercicio.pk
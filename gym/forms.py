@@ -1,9 +1,27 @@
 from django import forms
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import PasswordResetForm, UserCreationForm
 from django.contrib.auth.models import User
+from .cola_service import ColaService
 from .models import Rutina, DetalleRutina, ProgresoFisico, PerfilUsuario
 
 
+class RecuperarPasswordForm(PasswordResetForm):
+    """Recuperación de contraseña: el correo se encola y lo envía run_worker"""
+    
+    def send_mail(self, subject_template_name, email_template_name, context,
+                  from_email, to_email, html_email_template_name=None):
+        # Solo los datos para armarlo: el enlace con el token no queda guardado en la cola
+        ColaService.encolar('correo_recuperacion', {
+            'user_id': context['user'].pk,
+            'email': to_email,
+            'dominio': context['domain'],
+            'sitio': context['site_name'],
+            'protocolo': context['protocol'],
+            'plantillas': [subject_template_name, email_template_name, html_email_template_name],
+            'remitente': from_email,
+        }, prioridad=10, max_intentos=8)
+
+
 class RegistroForm(UserCreationForm):
     """Formulario de registro sin restricciones"""
     email = forms.EmailField(required=False, widget=forms.EmailInput(attrs={'class': 'form-control', 'placeholder': 'Email (opcional)'}))
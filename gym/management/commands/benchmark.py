@@ -0,0 +1,310 @@
+import json
+import platform
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment,
+)
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from gym import urls as gym_urls
+from gym.models import PerfilUsuario, Rutina
+
+# Tamaños del dataset (argumentos de seed_gym)
+ESCALAS = {
+    'pequena': {'miembros': 500, 'entrenadores': 10, 'entrenamientos': 10000, 'progreso': 5000, 'favoritos': 2000},
+    'mediana': {'miembros': 5000, 'entrenadores': 50, 'entrenamientos': 100000, 'progreso': 50000, 'favoritos': 20000},
+    'grande': {'miembros': 50000, 'entrenadores': 200, 'entrenamientos': 1000000, 'progreso': 300000, 'favoritos': 100000},
+}
+
+# Rutas que no se miden, con el motivo
+EXCLUIDAS = {
+    'logout': 'cierra la sesión del cliente compartido',
+}
+
+ADMIN = 'bench_admin'
+
+
+class Command(BaseCommand):
+    help = (
+        'Carga un dataset sintético en una base de datos de prueba y mide cada URL de gym/urls.py '
+        'con clientes del rol que corresponde (latencia p50/p95/p99, throughput y consultas)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', choices=list(ESCALAS), default='pequena')
+        parser.add_argument('--repeticiones', type=int, default=50, help='Peticiones medidas por URL')
+        parser.add_argument('--concurrencia', type=int, default=4, help='Hilos por URL')
+        parser.add_argument('--calentamiento', type=int, default=2, help='Peticiones previas no medidas')
+        parser.add_argument('--solo', action='append', default=[], help='Medir solo estas URLs (nombre)')
+        parser.add_argument('--salida', default='benchmark.json', help='Archivo JSON de resultados')
+        parser.add_argument('--base', help='Resultados anteriores contra los que comparar')
+        parser.add_argument('--tolerancia', type=float, default=0.25, help='Aumento de p95 aceptado (0.25 = 25%%)')
+        parser.add_argument('--keepdb', action='store_true', help='Reutiliza la base de prueba (y su dataset)')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        # Caché propia: los ids de la base de prueba coinciden con los reales y
+        # la caché compartida devolvería fragmentos de producción
+        directorio_cache = tempfile.mkdtemp(prefix='gymflow-benchmark-')
+        cache_propia = override_settings(CACHES={'default': {
+            **settings.CACHES['default'],
+            'KEY_PREFIX': f'benchmark-{uuid.uuid4().hex}',
+            **({'LOCATION': directorio_cache} if 'filebased' in settings.CACHES['default']['BACKEND'] else {}),
+        }})
+        cache_propia.enable()
+        # Solo se crea la base de prueba de 'default': las réplicas reales
+        # (GYMFLOW_DB_REPLICAS) no se usan, todo se lee de la base de prueba
+        sin_replicas = override_settings(DATABASE_REPLICAS=[])
+        sin_replicas.enable()
+        nombre_bd = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        if connection.vendor == 'sqlite' and options['concurrencia'] > 1:
+            # La base de prueba de SQLite vive en memoria compartida y bloquea
+            # tablas enteras entre hilos: la concurrencia solo se mide en MySQL
+            self.stdout.write(self.style.WARNING('⚠️  SQLite: se mide con un solo hilo'))
+            options['concurrencia'] = 1
+        try:
+            if not User.objects.filter(username__startswith='seed_').exists():
+                self.stdout.write(f"Cargando dataset '{options['escala']}'...")
+                argumentos = [f'--{k}={v}' for k, v in ESCALAS[options['escala']].items()]
+                call_command('seed_gym', *argumentos, stdout=self.stdout)
+
+            contexto = self._contexto()
+            escenarios = self._escenarios(contexto)
+            self._avisar_sin_escenario(escenarios)
+            if options['solo']:
+                escenarios = [e for e in escenarios if e['url'] in options['solo']]
+
+            resultados = {}
+            for escenario in escenarios:
+                resultado = self._medir(escenario, contexto, options)
+                resultados[escenario['nombre']] = resultado
+                self.stdout.write(
+                    f"  {escenario['nombre']:<40} p50={resultado['p50_ms']:>7.1f}ms "
+                    f"p95={resultado['p95_ms']:>7.1f}ms p99={resultado['p99_ms']:>7.1f}ms "
+                    f"{resultado['rps']:>6.0f} req/s q={resultado['consultas']:>5.1f}"
+                    + (self.style.ERROR(f" errores={resultado['errores']}") if resultado['errores'] else '')
+                )
+        finally:
+            connections.close_all()
+            if not options['keepdb']:
+                connection.creation.destroy_test_db(nombre_bd, verbosity=0)
+            sin_replicas.disable()
+            cache_propia.disable()
+            shutil.rmtree(directorio_cache, ignore_errors=True)
+            teardown_test_environment()
+
+        salida = {
+            'fecha': timezone.now().isoformat(),
+            'motor': connection.vendor,
+            'python': platform.python_version(),
+            'escala': options['escala'],
+            'repeticiones': options['repeticiones'],
+            'concurrencia': options['concurrencia'],
+            'resultados': resultados,
+        }
+        with open(options['salida'], 'w') as archivo:
+            json.dump(salida, archivo, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"✓ Resultados en {options['salida']}"))
+
+        if options['base']:
+            self._comparar(resultados, options['base'], options['tolerancia'])
+
+    # ---------- escenarios ----------
+
+    def _contexto(self):
+        """Objetos reales del dataset para completar los parámetros de cada URL"""
+        admin, creado = User.objects.get_or_create(username=ADMIN, defaults={'email': 'bench@gymflow.local'})
+        if creado:
+            PerfilUsuario.objects.filter(user=admin).update(tipo_usuario='administrador')
+
+        # El miembro más activo y el entrenador con más clientes (peor caso)
+        miembro = User.objects.get(username='seed_m0')
+        entrenador_id = (
+            Rutina.objects.filter(entrenador__isnull=False).values('entrenador')
+            .annotate(n=Count('id')).order_by('-n').values_list('entrenador', flat=True).first()
+        )
+        entrenador = User.objects.get(id=entrenador_id)
+        plantilla = (
+            Rutina.objects.filter(usuario=entrenador).annotate(n=Count('asignaciones'))
+            .order_by('-n').first()
+        )
+        return {
+            'usuario': miembro,
+            'entrenador': entrenador,
+            'administrador': admin,
+            'rutina_miembro': Rutina.objects.filter(usuario=miembro).first(),
+            'plantilla': plantilla,
+            'asignada': Rutina.objects.filter(entrenador=entrenador, plantilla=plantilla).first(),
+            'perfil_entrenador': entrenador.perfil.id,
+            'uid': urlsafe_base64_encode(force_bytes(miembro.pk)),
+            'token': default_token_generator.make_token(miembro),
+            'ejercicio': 'bench-press',
+        }
+
+    def _escenarios(self, c):
+        def e(url, rol, kwargs=None, metodo='get', datos=None, query='', nombre=None, estado=200):
+            return {
+                'nombre': nombre or url,
+                'url': url,
+                'rol': rol,
+                'ruta': reverse(url, kwargs=kwargs) + query,
+                'metodo': metodo,
+                'datos': datos,
+                # Cualquier otra respuesta (también una redirección) cuenta como error
+                'estado': estado,
+            }
+
+        rutina = {'rutina_id': c['rutina_miembro'].id}
+        # Crear y editar rutinas es solo para entrenadores: con un miembro se
+        # mediría la redirección de rol_requerido
+        plantilla = {'rutina_id': c['plantilla'].id}
+        return [
+            e('login', None),
+            e('register', None),
+            e('password_reset', None),
+            e('password_reset_done', None),
+            # Django guarda el token en la sesión y redirige a .../set-password/
+            e('password_reset_confirm', None, {'uidb64': c['uid'], 'token': c['token']}, estado=302),
+            e('password_reset_complete', None),
+            e('dashboard', 'usuario'),
+            e('dashboard_entrenador', 'entrenador'),
+            e('dashboard_admin', 'administrador'),
+            e('api_cache_estadisticas', 'administrador'),
+            e('ejercicios_list', 'usuario'),
+            e('ejercicio_detail', 'usuario', {'ejercicio_id': c['ejercicio']}),
+            e('rutinas_list', 'usuario'),
+            e('rutinas_list', 'entrenador', nombre='rutinas_list (entrenador)'),
+            e('rutina_create', 'entrenador'),
+            e('rutina_detail', 'usuario', rutina),
+            e('rutina_edit', 'entrenador', plantilla),
+            e('rutina_delete', 'entrenador', plantilla),
+            e('agregar_ejercicio', 'entrenador', plantilla),
+            e('agregar_ejercicio_detalle', 'entrenador', {**plantilla, 'ejercicio_id': c['ejercicio']}),
+            e('registrar_entrenamiento', 'usuario', rutina),
+            e('api_registrar_lote', 'usuario', metodo='post', datos=lambda: json.dumps({
+                'series': [{'clave': uuid.uuid4().hex, 'ejercicio_id': c['ejercicio'], 'repeticiones': 10, 'peso': 60}],
+            })),
+            e('api_sync', 'usuario'),
+            e('progreso', 'usuario'),
+            e('registrar_progreso', 'usuario'),
+            e('api_progreso_analitica', 'usuario'),
+            e('volumen', 'usuario'),
+            e('volumen', 'entrenador', nombre='volumen (roster)'),
+            e('exportar_historial', 'usuario', query='?datos=entrenamientos'),
+            e('favoritos', 'usuario'),
+            e('toggle_favorito', 'usuario', {'ejercicio_id': c['ejercicio']}, estado=302),
+            e('api_favorito', 'usuario', {'ejercicio_id': c['ejercicio']}, metodo='post', datos=lambda: '{}'),
+            e('entrenadores_list', 'usuario'),
+            e('entrenador_detail', 'usuario', {'perfil_id': c['perfil_entrenador']}),
+            e('mi_perfil', 'usuario'),
+            e('asignar_rutina', 'entrenador', {'rutina_id': c['plantilla'].id}),
+            e('ajustar_rutina', 'entrenador', {'rutina_id': c['asignada'].id}),
+            e('mis_clientes', 'entrenador'),
+            e('cliente_detalle', 'entrenador', {'cliente_id': c['asignada'].usuario_id}),
+        ]
+
+    def _avisar_sin_escenario(self, escenarios):
+        cubiertas = {escenario['url'] for escenario in escenarios} | set(EXCLUIDAS)
+        faltan = sorted({p.name for p in gym_urls.urlpatterns if p.name} - cubiertas)
+        if faltan:
+            self.stdout.write(self.style.WARNING(f"⚠️  URLs sin escenario de benchmark: {', '.join(faltan)}"))
+
+    # ---------- medición ----------
+
+    def _medir(self, escenario, contexto, options):
+        locales = threading.local()
+
+        def cliente():
+            if not hasattr(locales, 'cliente'):
+                locales.cliente = Client()
+                if escenario['rol']:
+                    locales.cliente.force_login(contexto[escenario['rol']])
+            return locales.cliente
+
+        def peticion(_):
+            datos = escenario['datos']() if escenario['datos'] else None
+            with CaptureQueriesContext(connection) as consultas:
+                inicio = time.perf_counter()
+                try:
+                    if escenario['metodo'] == 'post':
+                        respuesta = cliente().post(escenario['ruta'], datos, content_type='application/json')
+                    else:
+                        respuesta = cliente().get(escenario['ruta'])
+                    if respuesta.streaming:
+                        b''.join(respuesta.streaming_content)
+                    estado = respuesta.status_code
+                except Exception:
+                    # El cliente de prueba propaga las excepciones de la vista
+                    estado = 500
+                segundos = time.perf_counter() - inicio
+            return segundos, len(consultas), estado
+
+        def ejecutar(cantidad):
+            try:
+                return [peticion(i) for i in range(cantidad)]
+            finally:
+                # Cada hilo abre su propia conexión
+                connection.close()
+
+        hilos = options['concurrencia']
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            list(pool.map(ejecutar, [options['calentamiento']] * hilos))
+            por_hilo = [options['repeticiones'] // hilos + (i < options['repeticiones'] % hilos) for i in range(hilos)]
+            inicio = time.perf_counter()
+            mediciones = [m for lote in pool.map(ejecutar, por_hilo) for m in lote]
+            total = time.perf_counter() - inicio
+
+        tiempos = np.array([m[0] for m in mediciones]) * 1000
+        p50, p95, p99 = np.percentile(tiempos, [50, 95, 99])
+        return {
+            'ruta': escenario['ruta'],
+            'rol': escenario['rol'] or 'anonimo',
+            'peticiones': len(mediciones),
+            'p50_ms': round(float(p50), 2),
+            'p95_ms': round(float(p95), 2),
+            'p99_ms': round(float(p99), 2),
+            'rps': round(len(mediciones) / total, 1),
+            'consultas': round(float(np.mean([m[1] for m in mediciones])), 1),
+            'consultas_max': max(m[1] for m in mediciones),
+            'errores': sum(1 for m in mediciones if m[2] != escenario['estado']),
+        }
+
+    def _comparar(self, resultados, archivo_base, tolerancia):
+        with open(archivo_base) as archivo:
+            base = json.load(archivo)['resultados']
+
+        regresiones = []
+        for nombre, actual in resultados.items():
+            anterior = base.get(nombre)
+            if not anterior:
+                continue
+            if actual['p95_ms'] > anterior['p95_ms'] * (1 + tolerancia):
+                regresiones.append(f"{nombre}: p95 {anterior['p95_ms']}ms → {actual['p95_ms']}ms")
+            if actual['consultas'] > anterior['consultas'] + 0.5:
+                regresiones.append(f"{nombre}: consultas {anterior['consultas']} → {actual['consultas']}")
+            if actual['errores'] > anterior['errores']:
+                regresiones.append(f"{nombre}: errores {anterior['errores']} → {actual['errores']}")
+
+        if regresiones:
+            for regresion in regresiones:
+                self.stderr.write(f'  ✗ {regresion}')
+            raise CommandError(f'{len(regresiones)} regresiones respecto de {archivo_base}')
+        self.stdout.write(self.style.SUCCESS(f'✓ Sin regresiones respecto de {archivo_base}'))
@@ -0,0 +1,207 @@
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from gym.export_service import por_lotes
+from gym.models import (
+    Ejercicio, Rutina, DetalleRutina, RegistroEntrenamiento, RegistroSerie,
+    ProgresoFisico, Eliminacion,
+)
+
+# tabla: (modelo, columnas, columna de partición, columna incremental)
+TABLAS = {
+    'entrenamientos': (
+        RegistroEntrenamiento,
+        ['id', 'usuario_id', 'rutina_id', 'fecha', 'duracion_min', 'calorias',
+         'nivel_esfuerzo', 'completado', 'fecha_modificacion'],
+        'fecha', 'fecha_modificacion',
+    ),
+    'series': (
+        RegistroSerie,
+        ['id', 'usuario_id', 'entrenamiento_id', 'ejercicio_id', 'numero', 'repeticiones', 'peso', 'fecha'],
+        'fecha', 'id',
+    ),
+    'progreso': (
+        ProgresoFisico,
+        ['id', 'usuario_id', 'fecha', 'peso', 'grasa_corporal', 'masa_muscular',
+         'cintura', 'pecho', 'brazos', 'piernas', 'fecha_modificacion'],
+        'fecha', 'fecha_modificacion',
+    ),
+    'rutinas': (
+        Rutina,
+        ['id', 'usuario_id', 'entrenador_id', 'plantilla_id', 'dificultad', 'duracion_min',
+         'es_publica', 'activa', 'fecha_creacion', 'fecha_modificacion'],
+        'fecha_creacion', 'fecha_modificacion',
+    ),
+    'detalles': (
+        DetalleRutina,
+        ['id', 'rutina_id', 'ejercicio_id', 'orden', 'series', 'repeticiones', 'peso',
+         'descanso_seg', 'fecha_modificacion'],
+        'fecha_modificacion', 'fecha_modificacion',
+    ),
+    'ejercicios': (
+        Ejercicio,
+        ['id', 'ejercicio_id', 'nombre', 'equipamiento', 'partes_cuerpo',
+         'musculos_principales', 'nivel_riesgo', 'fecha_creacion'],
+        'fecha_creacion', 'id',
+    ),
+    'eliminaciones': (
+        Eliminacion,
+        ['id', 'usuario_id', 'modelo', 'objeto_id', 'fecha'],
+        'fecha', 'id',
+    ),
+}
+
+ESTADO = '_estado.json'
+
+# Las filas que confirman tarde con una fecha anterior se vuelven a exportar
+# en la próxima corrida en vez de perderse (se deduplican por id)
+MARGEN = timedelta(minutes=5)
+
+
+class Command(BaseCommand):
+    help = (
+        'Exporta entrenamientos, progreso, rutinas y catálogo a archivos columnares '
+        'comprimidos (.npz de NumPy, un arreglo por columna) particionados por mes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('salida', help='Directorio destino')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Solo filas nuevas o modificadas desde la corrida anterior')
+        parser.add_argument('--tabla', action='append', choices=list(TABLAS), help='Tabla (repetible); por defecto todas')
+        parser.add_argument('--lote', type=int, default=5000, help='Filas por consulta')
+        parser.add_argument('--filas-por-archivo', type=int, default=200000,
+                            help='Filas en memoria antes de escribir los archivos')
+
+    def handle(self, *args, **options):
+        salida = options['salida']
+        os.makedirs(salida, exist_ok=True)
+        estado = _leer_estado(salida)
+        corrida = timezone.now()
+
+        for tabla in options['tabla'] or TABLAS:
+            inicio = time.perf_counter()
+            modelo, columnas, particion, incremental = TABLAS[tabla]
+            queryset = modelo.objects.all()
+
+            desde = estado.get(tabla) if options['incremental'] else None
+            if desde is not None:
+                queryset = queryset.filter(**{f'{incremental}__gt': _desde_estado(desde)})
+            else:
+                # Exportación completa: reemplaza los archivos anteriores de la tabla
+                shutil.rmtree(os.path.join(salida, tabla), ignore_errors=True)
+
+            escritor = _Escritor(salida, tabla, modelo, columnas, corrida, options['filas_por_archivo'])
+            i_particion = columnas.index(particion)
+            i_incremental = columnas.index(incremental)
+            maximo = None
+            for fila in por_lotes(queryset, columnas, options['lote']):
+                escritor.agregar(_mes(fila[i_particion]), fila)
+                if maximo is None or fila[i_incremental] > maximo:
+                    maximo = fila[i_incremental]
+            escritor.cerrar()
+
+            if incremental == 'id':
+                if maximo is not None:
+                    estado[tabla] = maximo
+            else:
+                estado[tabla] = (corrida - MARGEN).isoformat()
+            _guardar_estado(salida, estado)
+
+            segundos = time.perf_counter() - inicio
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ {tabla}: {escritor.filas} filas en {escritor.archivos} archivos '
+                f'({segundos:.1f}s, {escritor.filas / segundos if segundos else 0:.0f} filas/s)'
+            ))
+
+
+class _Escritor:
+    """Acumula filas por partición y las escribe como columnas comprimidas"""
+
+    def __init__(self, salida, tabla, modelo, columnas, corrida, limite):
+        self.directorio = os.path.join(salida, tabla)
+        self.columnas = columnas
+        self.tipos = [modelo._meta.get_field(columna).get_internal_type() for columna in columnas]
+        self.prefijo = f"part-{corrida:%Y%m%dT%H%M%S}"
+        self.limite = limite
+        self.buffers = {}
+        self.pendientes = 0
+        self.filas = 0
+        self.archivos = 0
+
+    def agregar(self, mes, fila):
+        self.buffers.setdefault(mes, []).append(fila)
+        self.pendientes += 1
+        self.filas += 1
+        if self.pendientes >= self.limite:
+            self.cerrar()
+
+    def cerrar(self):
+        for mes, filas in self.buffers.items():
+            directorio = os.path.join(self.directorio, f'mes={mes}')
+            os.makedirs(directorio, exist_ok=True)
+            destino = os.path.join(directorio, f'{self.prefijo}-{self.archivos:05d}.npz')
+            valores = list(zip(*filas))
+            temporal = destino + '.tmp'
+            with open(temporal, 'wb') as archivo:
+                np.savez_compressed(archivo, **{
+                    columna: _arreglo(valores[i], self.tipos[i])
+                    for i, columna in enumerate(self.columnas)
+                })
+            os.replace(temporal, destino)
+            self.archivos += 1
+        self.buffers = {}
+        self.pendientes = 0
+
+
+def _arreglo(valores, tipo):
+    """Columna tipada para NumPy (sin objetos Python, no requiere pickle al leer)"""
+    if tipo == 'DateTimeField':
+        # UTC sin zona; None queda como NaT
+        return np.array(
+            [v.astimezone(dt_timezone.utc).replace(tzinfo=None) if v else None for v in valores],
+            dtype='datetime64[us]',
+        )
+    if tipo == 'DateField':
+        return np.array(valores, dtype='datetime64[D]')
+    if tipo == 'BooleanField':
+        return np.array(valores, dtype=bool)
+    if tipo in ('CharField', 'TextField', 'URLField'):
+        return np.array(['' if v is None else v for v in valores], dtype=str)
+    if tipo == 'DecimalField' or None in valores:
+        # Los enteros con nulos también pasan a float (None queda como NaN)
+        return np.array(valores, dtype=float)
+    return np.array(valores, dtype=np.int64)
+
+
+def _mes(valor):
+    if isinstance(valor, datetime):
+        valor = timezone.localtime(valor)
+    return f'{valor:%Y-%m}'
+
+
+def _leer_estado(salida):
+    try:
+        with open(os.path.join(salida, ESTADO)) as archivo:
+            return json.load(archivo)
+    except FileNotFoundError:
+        return {}
+
+
+def _guardar_estado(salida, estado):
+    ruta = os.path.join(salida, ESTADO)
+    with open(ruta + '.tmp', 'w') as archivo:
+        json.dump(estado, archivo, indent=2)
+    os.replace(ruta + '.tmp', ruta)
+
+
+def _desde_estado(valor):
+    return parse_datetime(valor) if isinstance(valor, str) else valor
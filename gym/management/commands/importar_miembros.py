@@ -0,0 +1,215 @@
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.db import connection, transaction
+from django.db.models.functions import Lower
+
+from gym.dashboard_cache import bump_version, SCOPE_ADMIN
+from gym.models import PerfilUsuario
+
+COLUMNAS = ('username', 'email', 'password', 'first_name', 'last_name', 'telefono', 'nivel_experiencia', 'tipo_usuario')
+
+# Límite de parámetros por consulta (SQLite antiguo acepta 999)
+LOTE_CONSULTA = 900
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa miembros desde un CSV (columnas: ' + ', '.join(COLUMNAS) + '). '
+        'Las contraseñas se hashean en paralelo y usuarios y perfiles se crean con bulk_create'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='CSV con encabezado')
+        parser.add_argument('--procesos', type=int, default=os.cpu_count(), help='Procesos para hashear contraseñas')
+        parser.add_argument('--lote', type=int, default=1000, help='Filas por INSERT')
+        parser.add_argument('--validar', action='store_true', help='Solo validar, sin importar')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        filas = self._leer(options['archivo'])
+        errores = self._validar(filas)
+        if errores:
+            for error in errores[:50]:
+                self.stderr.write(f'  ✗ {error}')
+            raise CommandError(f'{len(errores)} errores: no se importó nada')
+        self.stdout.write(self.style.SUCCESS(f'✓ {len(filas)} filas válidas'))
+        if options['validar']:
+            return
+
+        hashes = self._hashear([fila['password'] for fila in filas], options['procesos'])
+        t_hash = time.perf_counter() - inicio
+
+        with transaction.atomic():
+            # bulk_create no envía post_save: el perfil de cada usuario se crea
+            # aquí en lote en vez de un INSERT por usuario (crear_perfil)
+            usuarios = User.objects.bulk_create(
+                [
+                    User(
+                        username=fila['username'],
+                        email=fila['email'],
+                        password=password,
+                        first_name=fila['first_name'],
+                        last_name=fila['last_name'],
+                    )
+                    for fila, password in zip(filas, hashes)
+                ],
+                batch_size=options['lote'],
+            )
+            if connection.features.can_return_rows_from_bulk_insert:
+                ids = {usuario.username: usuario.id for usuario in usuarios}
+            else:
+                # MySQL no devuelve los ids de un INSERT masivo
+                ids = self._ids_por_username([fila['username'] for fila in filas])
+
+            PerfilUsuario.objects.bulk_create(
+                [
+                    PerfilUsuario(
+                        user_id=ids[fila['username']],
+                        tipo_usuario=fila['tipo_usuario'] or 'usuario',
+                        telefono=fila['telefono'],
+                        nivel_experiencia=fila['nivel_experiencia'] or 'principiante',
+                    )
+                    for fila in filas
+                ],
+                batch_size=options['lote'],
+            )
+            transaction.on_commit(lambda: bump_version(SCOPE_ADMIN))
+
+        total = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {len(filas)} miembros importados en {total:.1f}s '
+            f'({len(filas) / total:.0f} miembros/s; hash {t_hash:.1f}s, inserción {total - t_hash:.1f}s)'
+        ))
+
+    def _leer(self, archivo):
+        try:
+            with open(archivo, newline='', encoding='utf-8-sig') as f:
+                lector = csv.DictReader(f)
+                if 'username' not in (lector.fieldnames or []):
+                    raise CommandError("El CSV debe tener al menos la columna 'username'")
+                return [
+                    {columna: (fila.get(columna) or '').strip() for columna in COLUMNAS}
+                    for fila in lector
+                ]
+        except OSError as e:
+            raise CommandError(str(e))
+
+    def _validar(self, filas):
+        """Todos los errores de una vez: formato, duplicados en el archivo y en la BD"""
+        errores = []
+        campo_username = User._meta.get_field('username')
+        tipos = dict(PerfilUsuario.TIPO_CHOICES)
+        niveles = dict(PerfilUsuario.NIVEL_CHOICES)
+        usernames, emails = {}, {}
+
+        for linea, fila in enumerate(filas, start=2):
+            try:
+                campo_username.run_validators(fila['username'])
+                if not fila['username']:
+                    raise ValidationError('username vacío')
+                if fila['email']:
+                    validate_email(fila['email'])
+            except ValidationError as e:
+                errores.append(f"línea {linea}: {'; '.join(e.messages)}")
+            if fila['tipo_usuario'] and fila['tipo_usuario'] not in tipos:
+                errores.append(f"línea {linea}: tipo_usuario '{fila['tipo_usuario']}' inválido")
+            if fila['nivel_experiencia'] and fila['nivel_experiencia'] not in niveles:
+                errores.append(f"línea {linea}: nivel_experiencia '{fila['nivel_experiencia']}' inválido")
+
+            if fila['username'] in usernames:
+                errores.append(f"línea {linea}: username '{fila['username']}' repetido (línea {usernames[fila['username']]})")
+            usernames.setdefault(fila['username'], linea)
+            email = fila['email'].lower()
+            if email and email in emails:
+                errores.append(f"línea {linea}: email '{fila['email']}' repetido (línea {emails[email]})")
+            if email:
+                emails.setdefault(email, linea)
+
+        for username in self._existentes('username', list(usernames)):
+            errores.append(f"username '{username}' ya existe (línea {usernames[username]})")
+        for email in self._existentes('email', list(emails)):
+            errores.append(f"email '{email}' ya existe (línea {emails[email.lower()]})")
+        return errores
+
+    def _existentes(self, campo, valores):
+        consulta = User.objects.all()
+        if campo == 'email':
+            # Los emails del archivo ya vienen en minúsculas: se compara sin distinguir mayúsculas
+            consulta = consulta.annotate(email_min=Lower('email'))
+            filtro = 'email_min__in'
+        else:
+            filtro = 'username__in'
+        existentes = []
+        for i in range(0, len(valores), LOTE_CONSULTA):
+            existentes.extend(
+                consulta.filter(**{filtro: valores[i:i + LOTE_CONSULTA]}).values_list(campo, flat=True)
+            )
+        return existentes
+
+    def _ids_por_username(self, usernames):
+        ids = {}
+        for i in range(0, len(usernames), LOTE_CONSULTA):
+            ids.update(User.objects.filter(username__in=usernames[i:i + LOTE_CONSULTA]).values_list('username', 'id'))
+        return ids
+
+    def _hashear(self, passwords, procesos):
+        """
+        Hashea las contraseñas en un pool de procesos (PBKDF2 usa solo CPU).
+        Las filas sin contraseña quedan con una inutilizable (entran con
+        "olvidé mi contraseña") y las que ya vienen hasheadas se respetan.
+        """
+        hashes = [None] * len(passwords)
+        pendientes = []
+        for i, password in enumerate(passwords):
+            if not password:
+                hashes[i] = make_password(None)
+            elif _es_hash(password):
+                hashes[i] = password
+            else:
+                pendientes.append(i)
+
+        if pendientes:
+            inicio = time.perf_counter()
+            textos = [passwords[i] for i in pendientes]
+            if procesos > 1:
+                with ProcessPoolExecutor(
+                    max_workers=procesos,
+                    initializer=_inicializar_proceso,
+                    initargs=(os.environ.get('DJANGO_SETTINGS_MODULE'),),
+                ) as pool:
+                    resultados = list(pool.map(make_password, textos, chunksize=max(1, len(textos) // (procesos * 4))))
+            else:
+                resultados = [make_password(texto) for texto in textos]
+            for i, resultado in zip(pendientes, resultados):
+                hashes[i] = resultado
+            segundos = time.perf_counter() - inicio
+            self.stdout.write(
+                f'  {len(textos)} contraseñas hasheadas con {procesos} procesos en {segundos:.1f}s '
+                f'({len(textos) / segundos:.0f}/s)'
+            )
+        return hashes
+
+
+def _inicializar_proceso(settings_module):
+    # Con el método "spawn" el proceso nuevo no hereda Django configurado
+    if settings_module:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+
+
+def _es_hash(valor):
+    try:
+        identify_hasher(valor)
+        return True
+    except ValueError:
+        return False
+
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+
+from gym.volumen_service import VolumenService
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el volumen semanal precalculado (series y tonelaje por grupo muscular)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', action='append', default=[], help='Username (repetible); por defecto todos')
+        parser.add_argument('--lote', type=int, default=200, help='Usuarios por lote')
+
+    def handle(self, *args, **options):
+        usuarios = User.objects.order_by('id')
+        if options['usuario']:
+            usuarios = usuarios.filter(username__in=options['usuario'])
+        ids = list(usuarios.values_list('id', flat=True))
+
+        filas = 0
+        for inicio in range(0, len(ids), options['lote']):
+            filas += VolumenService.recalcular(ids[inicio:inicio + options['lote']])
+
+        self.stdout.write(self.style.SUCCESS(f'✓ {filas} semanas/grupo recalculadas para {len(ids)} usuarios'))
@@ -0,0 +1,103 @@
+import logging
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections
+
+from gym.cola_service import ColaService
+
+logger = logging.getLogger('gym.cola')
+
+# Cada cuánto se borran las tareas completadas viejas
+INTERVALO_PURGA = 3600  # segundos
+
+# Espera máxima entre reintentos cuando la base no responde
+MAX_ESPERA_ERROR = 60  # segundos
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta las tareas en segundo plano de la cola (correos, descarga del catálogo, ...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=10, help='Tareas que se toman por consulta')
+        parser.add_argument('--espera', type=float, default=2.0,
+                            help='Segundos de espera cuando la cola está vacía')
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Procesa lo pendiente y termina (cron, despliegues)')
+        parser.add_argument('--conservar-dias', type=int, default=7,
+                            help='Días que se guardan las tareas completadas')
+
+    def handle(self, *args, **options):
+        trabajador = ColaService.nombre_trabajador()
+        self._detener = False
+        # SIGTERM (systemd, docker stop): termina la tarea en curso y sale
+        signal.signal(signal.SIGTERM, self._senal)
+        signal.signal(signal.SIGINT, self._senal)
+        self.stdout.write(f'Worker {trabajador} esperando tareas...')
+
+        self.completadas = self.fallidas = 0
+        ultima_purga = 0
+        errores_seguidos = 0
+        # Lo que quedó a medias cuando se cayó la base: se retoma al reconectar
+        sin_registrar = None  # (tarea, error) ya ejecutada
+        sin_correr = []  # tomadas que no alcanzaron a ejecutarse
+        while not self._detener:
+            # El worker vive mucho: descarta conexiones caídas o vencidas (CONN_MAX_AGE)
+            close_old_connections()
+            try:
+                if sin_registrar:
+                    # Sin esto la tarea quedaría en_curso y se repetiría al vencer el plazo
+                    self._registrar(*sin_registrar)
+                    sin_registrar = None
+                if sin_correr:
+                    ColaService.liberar(sin_correr)
+                    sin_correr = []
+                if time.monotonic() - ultima_purga > INTERVALO_PURGA:
+                    ColaService.purgar(options['conservar_dias'])
+                    ultima_purga = time.monotonic()
+                tareas = ColaService.tomar(trabajador, options['lote'])
+                errores_seguidos = 0
+                if not tareas:
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['espera'])
+                    continue
+
+                for i, tarea in enumerate(tareas):
+                    sin_correr = tareas[i:]
+                    if self._detener:
+                        # Las tomadas que no alcanzaron a correr vuelven a la cola
+                        ColaService.liberar(sin_correr)
+                        break
+                    sin_registrar = (tarea, ColaService.correr(tarea))
+                    sin_correr = tareas[i + 1:]
+                    self._registrar(*sin_registrar)
+                    sin_registrar = None
+                sin_correr = []
+            except DatabaseError as e:
+                # Base caída o reiniciándose: se reintenta con espera creciente en vez de salir
+                errores_seguidos += 1
+                espera = min(options['espera'] * 2 ** errores_seguidos, MAX_ESPERA_ERROR)
+                logger.error('Worker %s sin acceso a la cola, reintento en %.0f s: %s', trabajador, espera, e)
+                close_old_connections()
+                time.sleep(espera)
+
+        if sin_registrar or sin_correr:
+            logger.error('Worker %s terminó sin registrar %s tareas: se retomarán al vencer su plazo',
+                         trabajador, len(sin_correr) + bool(sin_registrar))
+        close_old_connections()
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {self.completadas} tareas completadas, {self.fallidas} con error'
+        ))
+
+    def _registrar(self, tarea, error):
+        ColaService.registrar(tarea, error)
+        if error is None:
+            self.completadas += 1
+        else:
+            self.fallidas += 1
+            self.stderr.write(f'  ⚠️ {tarea} falló (intento {tarea.intentos + 1}): {error}')
+
+    def _senal(self, signum, frame):
+        self._detener = True
@@ -0,0 +1,307 @@
+import time
+from contextlib import contextmanager
+from datetime import datetime, time as dt_time, timedelta
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from gym.clientes_service import ClientesService
+from gym.dashboard_cache import bump_version, SCOPE_ADMIN
+from gym.exercisedb_service import ExerciseDBService
+from gym.models import (
+    PerfilUsuario, Ejercicio, Rutina, DetalleRutina, RegistroEntrenamiento,
+    ProgresoFisico, Favorito,
+)
+from gym.volumen_service import VolumenService
+
+PREFIJO = 'seed_'
+CONTRASENA = 'gymflow123'
+NOMBRES = ['Ana', 'Benjamín', 'Camila', 'Diego', 'Fernanda', 'Gabriel', 'Isidora', 'Joaquín', 'Martina', 'Tomás']
+APELLIDOS = ['González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva', 'Martínez', 'Sepúlveda']
+OBJETIVOS = ['Fuerza', 'Hipertrofia', 'Resistencia', 'Pérdida de grasa', 'Movilidad']
+DIFICULTADES = [codigo for codigo, _ in Rutina.DIFICULTAD]
+NIVELES = [codigo for codigo, _ in PerfilUsuario.NIVEL_CHOICES]
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera datos sintéticos (miembros, entrenadores, rutinas, entrenamientos, '
+        'progreso y favoritos) con distribución sesgada, determinista para una semilla'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--miembros', type=int, default=1000)
+        parser.add_argument('--entrenadores', type=int, default=20)
+        parser.add_argument('--rutinas', type=int, default=5, help='Rutinas plantilla por entrenador')
+        parser.add_argument('--detalles', type=int, default=8, help='Ejercicios por rutina')
+        parser.add_argument('--entrenamientos', type=int, default=50000)
+        parser.add_argument('--progreso', type=int, default=20000)
+        parser.add_argument('--favoritos', type=int, default=5000)
+        parser.add_argument('--dias', type=int, default=365, help='Días de historia hacia atrás')
+        parser.add_argument('--hasta', help='Último día de historia (AAAA-MM-DD); por defecto hoy')
+        parser.add_argument('--sesgo', type=float, default=1.1, help='Exponente Zipf (más alto = más concentrado)')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--lote', type=int, default=1000, help='Filas por INSERT')
+        parser.add_argument('--limpiar', action='store_true', help=f'Borra antes los usuarios {PREFIJO}*')
+
+    def handle(self, *args, **options):
+        for opcion in ('miembros', 'entrenadores', 'rutinas', 'detalles', 'dias'):
+            if options[opcion] < 1:
+                raise CommandError(f'--{opcion} debe ser al menos 1')
+        self.opciones = options
+        self.rng = np.random.default_rng(options['semilla'])
+        self.total_filas = 0
+        inicio = time.perf_counter()
+
+        hasta = datetime.strptime(options['hasta'], '%Y-%m-%d').date() if options['hasta'] else timezone.localdate()
+        self.fin = timezone.make_aware(datetime.combine(hasta, dt_time(21)))
+
+        existentes = User.objects.filter(username__startswith=PREFIJO)
+        if existentes.exists():
+            if not options['limpiar']:
+                raise CommandError(f'Ya hay usuarios {PREFIJO}*: usa --limpiar para regenerarlos')
+            self._paso('Limpieza', lambda: existentes.delete()[0])
+
+        with transaction.atomic():
+            ejercicios = self._paso('Ejercicios', self._ejercicios)
+            entrenadores = self._paso('Entrenadores', lambda: self._usuarios('t', options['entrenadores'], 'entrenador'))
+            miembros = self._paso('Miembros', lambda: self._usuarios('m', options['miembros'], 'usuario'))
+            plantillas = self._paso('Rutinas plantilla', lambda: self._plantillas(entrenadores, ejercicios))
+            self._paso('Detalles de rutina', lambda: self._detalles(plantillas, ejercicios))
+            asignadas = self._paso('Rutinas asignadas', lambda: self._asignaciones(miembros, plantillas))
+            self._paso('Entrenamientos', lambda: self._entrenamientos(miembros, asignadas))
+            self._paso('Progreso', lambda: self._progreso(miembros))
+            self._paso('Favoritos', lambda: self._favoritos(miembros, ejercicios))
+            transaction.on_commit(lambda: bump_version(SCOPE_ADMIN))
+
+        # bulk_create no pasa por los signals: el volumen semanal se calcula al final
+        self._paso('Volumen semanal', lambda: sum(
+            VolumenService.recalcular(miembros[i:i + 500]) for i in range(0, len(miembros), 500)
+        ))
+
+        total = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {self.total_filas} filas en {total:.1f}s ({self.total_filas / total:.0f} filas/s). '
+            f'Contraseña de los usuarios {PREFIJO}*: {CONTRASENA}'
+        ))
+
+    # ---------- pasos ----------
+
+    def _ejercicios(self):
+        """Catálogo de respaldo de ExerciseDB (los mismos ids que usan las vistas)"""
+        catalogo = ExerciseDBService.get_fallback_exercises()
+        Ejercicio.objects.bulk_create(
+            [
+                Ejercicio(
+                    ejercicio_id=e['id'],
+                    nombre=e['name'],
+                    imagen_url=e.get('imageUrl', ''),
+                    gif_url=e.get('gifUrl', ''),
+                    equipamiento=e.get('equipments', ''),
+                    partes_cuerpo=e.get('bodyParts', ''),
+                    musculos_principales=e.get('targetMuscles', ''),
+                    musculos_secundarios=e.get('secondaryMuscles', ''),
+                    descripcion=e.get('overview', ''),
+                )
+                for e in catalogo
+            ],
+            ignore_conflicts=True,
+        )
+        ids = dict(Ejercicio.objects.filter(
+            ejercicio_id__in=[e['id'] for e in catalogo]
+        ).values_list('ejercicio_id', 'id'))
+        # Orden fijo para que la popularidad (Zipf) sea determinista
+        return [ids[e['id']] for e in catalogo]
+
+    def _usuarios(self, tipo, cantidad, tipo_usuario):
+        password = make_password(CONTRASENA)  # un solo hash para todos
+        nombres = self.rng.integers(0, len(NOMBRES), cantidad)
+        apellidos = self.rng.integers(0, len(APELLIDOS), cantidad)
+        usuarios = self._crear(User, [
+            User(
+                username=f'{PREFIJO}{tipo}{i}',
+                email=f'{PREFIJO}{tipo}{i}@gymflow.local',
+                password=password,
+                first_name=NOMBRES[nombres[i]],
+                last_name=APELLIDOS[apellidos[i]],
+            )
+            for i in range(cantidad)
+        ])
+        niveles = self.rng.choice(len(NIVELES), cantidad, p=[0.5, 0.35, 0.15])
+        self._crear(PerfilUsuario, [
+            PerfilUsuario(
+                user_id=usuario.id,
+                tipo_usuario=tipo_usuario,
+                nivel_experiencia=NIVELES[niveles[i]],
+                especialidad=OBJETIVOS[i % len(OBJETIVOS)] if tipo_usuario == 'entrenador' else '',
+                capacidad_clientes=100 if tipo_usuario == 'entrenador' else 20,
+            )
+            for i, usuario in enumerate(usuarios)
+        ])
+        return [usuario.id for usuario in usuarios]
+
+    def _plantillas(self, entrenadores, ejercicios):
+        rutinas = self._crear(Rutina, [
+            Rutina(
+                nombre=f'{OBJETIVOS[(i + k) % len(OBJETIVOS)]} {k + 1}',
+                descripcion='Rutina generada por seed_gym',
+                usuario_id=entrenador_id,
+                dificultad=DIFICULTADES[(i + k) % len(DIFICULTADES)],
+                duracion_min=int(self.rng.choice([30, 45, 60, 75, 90])),
+                objetivo=OBJETIVOS[(i + k) % len(OBJETIVOS)],
+                es_publica=True,
+            )
+            for i, entrenador_id in enumerate(entrenadores)
+            for k in range(self.opciones['rutinas'])
+        ])
+        return [rutina.id for rutina in rutinas]
+
+    def _detalles(self, plantillas, ejercicios):
+        cantidad = min(self.opciones['detalles'], len(ejercicios))
+        pesos_ejercicio = _zipf(len(ejercicios), self.opciones['sesgo'])
+        detalles = []
+        for rutina_id in plantillas:
+            elegidos = self.rng.choice(len(ejercicios), cantidad, replace=False, p=pesos_ejercicio)
+            series = self.rng.integers(3, 6, cantidad)
+            repeticiones = self.rng.choice([5, 8, 10, 12, 15], cantidad)
+            pesos = self.rng.integers(0, 41, cantidad) * 2.5
+            for orden, j in enumerate(elegidos, start=1):
+                i = orden - 1
+                detalles.append(DetalleRutina(
+                    rutina_id=rutina_id,
+                    ejercicio_id=ejercicios[j],
+                    orden=orden,
+                    series=int(series[i]),
+                    repeticiones=int(repeticiones[i]),
+                    peso=float(pesos[i]) or None,
+                    descanso_seg=60,
+                ))
+        self._crear(DetalleRutina, detalles)
+        return len(detalles)
+
+    def _asignaciones(self, miembros, plantillas):
+        """Cada miembro recibe 1-3 rutinas; unas pocas plantillas se llevan casi todo"""
+        popularidad = _zipf(len(plantillas), self.opciones['sesgo'])
+        entrenador_de = dict(Rutina.objects.filter(id__in=plantillas).values_list('id', 'usuario_id'))
+        nombres = dict(Rutina.objects.filter(id__in=plantillas).values_list('id', 'nombre'))
+        cuantas = self.rng.choice([1, 2, 3], len(miembros), p=[0.6, 0.3, 0.1])
+        filas = []
+        for miembro_id, n in zip(miembros, cuantas):
+            for j in self.rng.choice(len(plantillas), min(n, len(plantillas)), replace=False, p=popularidad):
+                plantilla_id = plantillas[j]
+                filas.append((miembro_id, plantilla_id))
+        rutinas = self._crear(Rutina, [
+            Rutina(
+                nombre=nombres[plantilla_id],
+                usuario_id=miembro_id,
+                entrenador_id=entrenador_de[plantilla_id],
+                plantilla_id=plantilla_id,
+            )
+            for miembro_id, plantilla_id in filas
+        ])
+        # bulk_create no pasa por los signals que vinculan al cliente
+        ClientesService.vincular((entrenador_de[plantilla_id], miembro_id) for miembro_id, plantilla_id in filas)
+        asignadas = {}
+        for rutina, (miembro_id, _) in zip(rutinas, filas):
+            asignadas.setdefault(miembro_id, []).append(rutina.id)
+        return asignadas
+
+    def _entrenamientos(self, miembros, asignadas):
+        """Los miembros más activos (Zipf) concentran la mayoría de las sesiones"""
+        cantidad = self.opciones['entrenamientos']
+        quienes = self.rng.choice(len(miembros), cantidad, p=_zipf(len(miembros), self.opciones['sesgo']))
+        segundos = self.rng.integers(0, self.opciones['dias'] * 86400, cantidad)
+        cual = self.rng.integers(0, 3, cantidad)
+        duraciones = self.rng.integers(30, 91, cantidad)
+        esfuerzos = self.rng.integers(3, 11, cantidad)
+        sesiones = []
+        for i in range(cantidad):
+            miembro_id = miembros[quienes[i]]
+            rutinas = asignadas[miembro_id]
+            sesiones.append(RegistroEntrenamiento(
+                usuario_id=miembro_id,
+                rutina_id=rutinas[cual[i] % len(rutinas)],
+                fecha=self.fin - timedelta(seconds=int(segundos[i])),
+                duracion_min=int(duraciones[i]),
+                calorias=int(duraciones[i]) * 8,
+                nivel_esfuerzo=int(esfuerzos[i]),
+            ))
+        self._crear(RegistroEntrenamiento, sesiones, devolver_ids=False)
+        return cantidad
+
+    def _progreso(self, miembros):
+        cantidad = self.opciones['progreso']
+        quienes = self.rng.choice(len(miembros), cantidad, p=_zipf(len(miembros), self.opciones['sesgo']))
+        dias = self.rng.integers(0, self.opciones['dias'], cantidad)
+        base = self.rng.normal(78, 12, len(miembros))
+        ruido = self.rng.normal(0, 0.8, cantidad)
+        registros = [
+            ProgresoFisico(
+                usuario_id=miembros[quienes[i]],
+                fecha=self.fin.date() - timedelta(days=int(dias[i])),
+                # Tendencia suave a la baja a lo largo de la historia
+                peso=round(float(base[quienes[i]] + dias[i] * 0.01 + ruido[i]), 2),
+                grasa_corporal=round(float(18 + dias[i] * 0.005 + ruido[i] / 2), 2),
+            )
+            for i in range(cantidad)
+        ]
+        with _sin_auto_now_add(ProgresoFisico, 'fecha'):
+            self._crear(ProgresoFisico, registros, devolver_ids=False)
+        return cantidad
+
+    def _favoritos(self, miembros, ejercicios):
+        cantidad = self.opciones['favoritos']
+        quienes = self.rng.choice(len(miembros), cantidad, p=_zipf(len(miembros), self.opciones['sesgo']))
+        cuales = self.rng.choice(len(ejercicios), cantidad, p=_zipf(len(ejercicios), self.opciones['sesgo']))
+        pares = sorted({(miembros[q], ejercicios[e]) for q, e in zip(quienes, cuales)})
+        self._crear(Favorito, [
+            Favorito(usuario_id=usuario_id, ejercicio_id=ejercicio_id) for usuario_id, ejercicio_id in pares
+        ], devolver_ids=False)
+        return len(pares)
+
+    # ---------- utilidades ----------
+
+    def _paso(self, nombre, funcion):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        filas = resultado if isinstance(resultado, int) else len(resultado)
+        segundos = time.perf_counter() - inicio
+        self.total_filas += filas
+        self.stdout.write(f'  {nombre}: {filas} en {segundos:.2f}s ({filas / segundos if segundos else 0:.0f}/s)')
+        return resultado
+
+    def _crear(self, modelo, objetos, devolver_ids=True):
+        """bulk_create por lotes; en MySQL los ids se leen después del INSERT"""
+        if not devolver_ids or connection.features.can_return_rows_from_bulk_insert:
+            return modelo.objects.bulk_create(objetos, batch_size=self.opciones['lote'])
+        # Sin escrituras concurrentes los ids nuevos son los mayores al último,
+        # en el mismo orden de inserción
+        ultimo = modelo.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        modelo.objects.bulk_create(objetos, batch_size=self.opciones['lote'])
+        ids = list(modelo.objects.filter(pk__gt=ultimo).order_by('pk').values_list('pk', flat=True))
+        if len(ids) != len(objetos):
+            raise CommandError(f'{modelo.__name__}: no se pudieron leer los ids (¿escrituras concurrentes?)')
+        for objeto, pk in zip(objetos, ids):
+            objeto.pk = pk
+        return objetos
+
+
+def _zipf(n, sesgo):
+    """Probabilidades Zipf: el elemento i tiene peso 1 / (i + 1) ** sesgo"""
+    pesos = 1.0 / np.arange(1, n + 1) ** sesgo
+    return pesos / pesos.sum()
+
+
+@contextmanager
+def _sin_auto_now_add(modelo, campo):
+    """Permite fechas históricas en un campo auto_now_add durante la carga"""
+    field = modelo._meta.get_field(campo)
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
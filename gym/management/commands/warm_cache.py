@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from gym import tarjetas_cache, views
+from gym.exercisedb_service import ExerciseDBService
+from gym.progreso_service import ProgresoService
+
+# Límites con que las vistas piden el catálogo (ejercicios_list, agregar_ejercicio, búsqueda)
+LIMITES_CATALOGO = (100, 150, 500)
+
+# Vista del dashboard de cada rol
+DASHBOARDS = {
+    'usuario': views.dashboard,
+    'entrenador': views.dashboard_entrenador,
+    'administrador': views.dashboard_admin,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Precarga la caché compartida al desplegar: catálogo de ejercicios, tarjetas, listas por zona, '
+        'dashboards y analítica de los usuarios más activos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=100,
+                            help='Usuarios con login más reciente cuyos dashboards se precargan')
+        parser.add_argument('--solo-catalogo', action='store_true', help='Solo catálogo y zonas')
+        parser.add_argument('--refrescar', action='store_true',
+                            help='Descarta el catálogo cacheado (en todos los workers) antes de cargarlo')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Caché: {caches['default'].__class__.__name__}")
+
+        inicio = time.perf_counter()
+        if options['refrescar']:
+            ExerciseDBService.invalidar_catalogo()
+        catalogo = []
+        for limite in LIMITES_CATALOGO:
+            ejercicios = ExerciseDBService.get_all_exercises(limit=limite)
+            if len(ejercicios) > len(catalogo):
+                catalogo = ejercicios
+        total = len(catalogo)
+        if not ExerciseDBService.USE_FALLBACK_ONLY:
+            # Detalle de cada ejercicio, pedido en paralelo a la API
+            asyncio.run(ExerciseDBService.aget_exercises_by_ids([e['id'] for e in catalogo]))
+        for zona in ExerciseDBService.ZONAS:
+            ExerciseDBService.get_exercises_by_zone(zona, limit=100)
+        for plantilla in (tarjetas_cache.TARJETA_EJERCICIO, tarjetas_cache.TARJETA_AGREGAR):
+            tarjetas_cache.renderizar(plantilla, catalogo)
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Catálogo: {total} ejercicios (con sus tarjetas) y {len(ExerciseDBService.ZONAS)} zonas '
+            f'({time.perf_counter() - inicio:.1f}s)'
+        ))
+        if options['solo_catalogo']:
+            return
+
+        inicio = time.perf_counter()
+        usuarios = list(
+            User.objects.filter(is_active=True, last_login__isnull=False)
+            .select_related('perfil').order_by('-last_login')[:options['usuarios']]
+        )
+        # El dashboard de administración es el mismo para todos los administradores
+        admin = User.objects.filter(is_active=True, perfil__tipo_usuario='administrador').select_related('perfil').first()
+        if admin and admin not in usuarios:
+            usuarios.append(admin)
+
+        dashboards = analiticas = 0
+        for usuario in usuarios:
+            tipo = usuario.perfil.tipo_usuario
+            if self._renderizar(DASHBOARDS[tipo], usuario, tipo):
+                dashboards += 1
+            if tipo == 'usuario':
+                ProgresoService.analitica(usuario.id)
+                analiticas += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {dashboards} dashboards y {analiticas} analíticas de progreso '
+            f'({time.perf_counter() - inicio:.1f}s)'
+        ))
+
+    def _renderizar(self, vista, usuario, tipo):
+        """Ejecuta la vista sin pasar por HTTP: los {% cache %} quedan guardados"""
+        request = RequestFactory().get('/')
+        request.user = usuario
+        request.tipo_usuario = tipo
+        request.session = SessionBase()
+        try:
+            return vista(request).status_code == 200
+        except Exception as e:
+            self.stderr.write(f'  ⚠️ Dashboard de {usuario.username}: {e}')
+            return False
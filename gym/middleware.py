@@ -0,0 +1,308 @@
+import json
+import logging
+import mimetypes
+import os
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from urllib.parse import unquote, urlparse
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe
+
+from .models import obtener_perfil
+
+logger = logging.getLogger('gym.queries')
+
+
+class PerfilUsuarioMiddleware:
+    """
+    Expone el rol del usuario como request.tipo_usuario (None si es anónimo).
+
+    Va después de AuthenticationMiddleware. Con PerfilModelBackend el perfil
+    ya viene en la misma consulta que el usuario, así que leer el rol no
+    cuesta consultas extra; si el perfil no existe se crea aquí, en un solo
+    lugar, en vez de en cada vista.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.user.is_authenticated:
+            perfil, _ = obtener_perfil(request.user)
+            request.tipo_usuario = perfil.tipo_usuario
+        else:
+            request.tipo_usuario = None
+        return self.get_response(request)
+
+
+class _RegistroConsultas:
+    """execute_wrapper que mide cada consulta SQL ejecutada"""
+
+    def __init__(self):
+        self.consultas = []  # (sql, segundos)
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas.append((sql, time.perf_counter() - inicio))
+
+
+class QueryInspectorMiddleware:
+    """
+    Mide las consultas SQL de cada request (opt-in con QUERY_INSPECTOR_ENABLED).
+
+    Agrega un header Server-Timing con el tiempo de BD y el total, y escribe
+    una línea JSON en el logger 'gym.queries' con el número de consultas, el
+    tiempo de BD, las más lentas y las repetidas (típico N+1). Solo se
+    inspecciona la fracción QUERY_INSPECTOR_SAMPLE_RATE de los requests.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_INSPECTOR_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'QUERY_INSPECTOR_SAMPLE_RATE', 1.0)
+        self.top_lentas = getattr(settings, 'QUERY_INSPECTOR_SLOWEST', 3)
+        self.umbral_consultas = getattr(settings, 'QUERY_INSPECTOR_WARN_QUERIES', 50)
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        registro = _RegistroConsultas()
+        inicio = time.perf_counter()
+        with ExitStack() as stack:
+            for conexion in connections.all():
+                stack.enter_context(conexion.execute_wrapper(registro))
+            response = self.get_response(request)
+        total = time.perf_counter() - inicio
+
+        self._reportar(request, response, registro.consultas, total)
+        return response
+
+    def _reportar(self, request, response, consultas, total):
+        tiempo_bd = sum(duracion for _, duracion in consultas)
+        repetidas = {
+            sql: veces for sql, veces in Counter(sql for sql, _ in consultas).items()
+            if veces > 1
+        }
+        lentas = sorted(consultas, key=lambda c: c[1], reverse=True)[:self.top_lentas]
+
+        timing = (
+            f'db;desc="{len(consultas)} consultas";dur={tiempo_bd * 1000:.1f}, '
+            f'total;dur={total * 1000:.1f}'
+        )
+        if response.has_header('Server-Timing'):
+            timing = f"{response['Server-Timing']}, {timing}"
+        response['Server-Timing'] = timing
+
+        match = getattr(request, 'resolver_match', None)
+        datos = {
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'consultas': len(consultas),
+            'bd_ms': round(tiempo_bd * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'repetidas': sum(veces - 1 for veces in repetidas.values()),
+            'top_repetidas': [
+                {'veces': veces, 'sql': sql[:300]}
+                for sql, veces in sorted(repetidas.items(), key=lambda r: r[1], reverse=True)[:self.top_lentas]
+            ],
+            'lentas': [
+                {'ms': round(duracion * 1000, 2), 'sql': sql[:300]}
+                for sql, duracion in lentas
+            ],
+        }
+        nivel = logging.WARNING if len(consultas) > self.umbral_consultas else logging.INFO
+        logger.log(nivel, json.dumps(datos, ensure_ascii=False))
+
+
+class _Tramo:
+    """Solo los `largo` bytes de un archivo desde su posición actual (respuestas 206)"""
+
+    def __init__(self, archivo, largo):
+        self.archivo = archivo
+        self.restante = largo
+
+    def read(self, n=-1):
+        if n < 0 or n > self.restante:
+            n = self.restante
+        datos = self.archivo.read(n)
+        self.restante -= len(datos)
+        return datos
+
+    def fileno(self):
+        # Con wsgi.file_wrapper (gunicorn, uWSGI) se envía con sendfile() desde
+        # la posición actual del archivo, sin pasar los bytes por Python
+        return self.archivo.fileno()
+
+    def close(self):
+        self.archivo.close()
+
+
+class ArchivosEstaticosMiddleware:
+    """
+    Sirve STATIC_ROOT (lo generado por collectstatic) sin pasar por las vistas.
+
+    - Los nombres con hash del manifiesto se entregan con caché de un año e
+      `immutable`: un cambio de contenido cambia el nombre. El resto, con
+      caché corta y revalidación por ETag/Last-Modified (304).
+    - Si el navegador acepta br/gzip se entrega la variante precomprimida
+      que dejó ManifestComprimidoStorage.
+    - Soporta `Range` (un rango por request) para los GIF grandes, y el
+      cuerpo sale por FileResponse: con wsgi.file_wrapper usa sendfile().
+
+    Va justo después de SecurityMiddleware. En desarrollo (DEBUG con
+    runserver) los estáticos los sirve runserver y esto no interviene.
+    """
+
+    CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+    CACHE_CORTA = 'public, max-age=300'
+    CODIFICACIONES = (('br', '.br'), ('gzip', '.gz'))
+    RANGO = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefijo = urlparse(settings.STATIC_URL or '').path
+        self.raiz = settings.STATIC_ROOT
+        if not self.prefijo.startswith('/') or not self.raiz:
+            # STATIC_URL en otro dominio (CDN) o sin collectstatic configurado
+            raise MiddlewareNotUsed
+        self._archivos = None
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path.startswith(self.prefijo):
+            archivo = self.archivos().get(unquote(request.path[len(self.prefijo):]))
+            if archivo is not None:
+                return self._servir(request, *archivo)
+        return self.get_response(request)
+
+    def archivos(self):
+        """nombre -> (ruta, inmutable, variantes), leído una vez de STATIC_ROOT"""
+        if self._archivos is None:
+            self._archivos = self._indexar()
+        return self._archivos
+
+    def _indexar(self):
+        # Solo se sirve lo que está en el índice: una URL no puede salir de STATIC_ROOT
+        try:
+            manifiesto = staticfiles_storage.hashed_files
+        except AttributeError:  # Storage sin manifiesto
+            manifiesto = {}
+        con_hash = set(manifiesto.values()) - set(manifiesto)
+
+        rutas = {}
+        for carpeta, _, nombres in os.walk(self.raiz):
+            for nombre in nombres:
+                ruta = os.path.join(carpeta, nombre)
+                rutas[os.path.relpath(ruta, self.raiz).replace(os.sep, '/')] = ruta
+
+        archivos = {}
+        for nombre, ruta in rutas.items():
+            if nombre.endswith(('.gz', '.br')) and nombre[:-3] in rutas:
+                continue
+            variantes = [
+                (codificacion, ruta + extension)
+                for codificacion, extension in self.CODIFICACIONES
+                if nombre + extension in rutas
+            ]
+            archivos[nombre] = (ruta, nombre in con_hash, variantes)
+        return archivos
+
+    def _servir(self, request, ruta, inmutable, variantes):
+        rango = request.META.get('HTTP_RANGE', '')
+        codificacion = None
+        if variantes and not rango:
+            aceptadas = request.META.get('HTTP_ACCEPT_ENCODING', '')
+            for nombre, ruta_variante in variantes:
+                if re.search(rf'\b{nombre}\b', aceptadas):
+                    codificacion, ruta = nombre, ruta_variante
+                    break
+
+        estado = os.stat(ruta)
+        etag = f'"{int(estado.st_mtime):x}-{estado.st_size:x}{"-" + codificacion if codificacion else ""}"'
+        encabezados = {
+            'Cache-Control': self.CACHE_INMUTABLE if inmutable else self.CACHE_CORTA,
+            'ETag': etag,
+            'Last-Modified': http_date(estado.st_mtime),
+            'Accept-Ranges': 'bytes',
+        }
+        if variantes:
+            encabezados['Vary'] = 'Accept-Encoding'
+
+        if self._no_modificado(request, etag, estado.st_mtime):
+            response = HttpResponseNotModified()
+            for clave, valor in encabezados.items():
+                response[clave] = valor
+            return response
+
+        tipo = mimetypes.guess_type(request.path)[0] or 'application/octet-stream'
+        tramo = self._rango(rango, request, etag, estado.st_mtime, estado.st_size)
+        if tramo == 'invalido':
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{estado.st_size}'
+            return response
+
+        if request.method == 'HEAD':
+            response = HttpResponse(content_type=tipo)
+            largo = estado.st_size
+        elif tramo:
+            inicio, fin = tramo
+            archivo = open(ruta, 'rb')
+            archivo.seek(inicio)
+            response = FileResponse(_Tramo(archivo, fin - inicio + 1), status=206, content_type=tipo)
+            response['Content-Range'] = f'bytes {inicio}-{fin}/{estado.st_size}'
+            largo = fin - inicio + 1
+        else:
+            response = FileResponse(open(ruta, 'rb'), content_type=tipo)
+            largo = estado.st_size
+
+        response['Content-Length'] = largo
+        # FileResponse lo pone con el nombre en disco (p. ej. style.css.gz)
+        response.headers.pop('Content-Disposition', None)
+        if codificacion:
+            response['Content-Encoding'] = codificacion
+        for clave, valor in encabezados.items():
+            response[clave] = valor
+        return response
+
+    def _no_modificado(self, request, etag, mtime):
+        si_no_coincide = request.META.get('HTTP_IF_NONE_MATCH')
+        if si_no_coincide:
+            return si_no_coincide.strip() == '*' or etag in [e.strip() for e in si_no_coincide.split(',')]
+        desde = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        return desde is not None and int(mtime) <= desde
+
+    def _rango(self, rango, request, etag, mtime, tamano):
+        """(inicio, fin) del rango pedido, None para el archivo completo o 'invalido' (416)"""
+        if not rango or request.method != 'GET':
+            return None
+        si_rango = request.META.get('HTTP_IF_RANGE')
+        if si_rango and si_rango != etag and parse_http_date_safe(si_rango) != int(mtime):
+            # El archivo cambió desde que se pidió la primera parte
+            return None
+
+        match = self.RANGO.match(rango.replace(' ', ''))
+        if not match or match.groups() == ('', ''):
+            # Varios rangos o sintaxis desconocida: se entrega completo
+            return None
+        inicio, fin = match.groups()
+        if not inicio:
+            # bytes=-N: los últimos N bytes
+            inicio, fin = max(tamano - int(fin), 0), tamano - 1
+        else:
+            inicio, fin = int(inicio), min(int(fin), tamano - 1) if fin else tamano - 1
+        if inicio >= tamano or inicio > fin:
+            return 'invalido'
+        return inicio, fin
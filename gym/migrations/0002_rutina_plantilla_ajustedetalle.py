@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rutina',
+            name='plantilla',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='asignaciones', to='gym.rutina'),
+        ),
+        migrations.CreateModel(
+            name='AjusteDetalle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('peso', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('notas', models.TextField(blank=True)),
+                ('detalle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ajustes', to='gym.detallerutina')),
+                ('rutina', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ajustes', to='gym.rutina')),
+            ],
+            options={
+                'verbose_name': 'Ajuste de Detalle',
+                'verbose_name_plural': 'Ajustes de Detalles',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ajustedetalle',
+            constraint=models.UniqueConstraint(fields=('rutina', 'detalle'), name='unique_ajuste_rutina_detalle'),
+        ),
+    ]
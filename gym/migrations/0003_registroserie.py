@@ -0,0 +1,70 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('gym', '0002_rutina_plantilla_ajustedetalle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroSerie',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.PositiveSmallIntegerField(default=1)),
+                ('repeticiones', models.PositiveIntegerField()),
+                ('peso', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('clave_cliente', models.CharField(max_length=64)),
+            ],
+            options={
+                'verbose_name': 'Registro de Serie',
+                'verbose_name_plural': 'Registros de Series',
+                'ordering': ['fecha', 'numero'],
+            },
+        ),
+        migrations.AddField(
+            model_name='registroentrenamiento',
+            name='clave_cliente',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='registroentrenamiento',
+            name='fecha',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddConstraint(
+            model_name='registroentrenamiento',
+            constraint=models.UniqueConstraint(fields=('usuario', 'clave_cliente'), name='unique_entrenamiento_clave_cliente'),
+        ),
+        migrations.AddField(
+            model_name='registroserie',
+            name='ejercicio',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gym.ejercicio'),
+        ),
+        migrations.AddField(
+            model_name='registroserie',
+            name='entrenamiento',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='series', to='gym.registroentrenamiento'),
+        ),
+        migrations.AddField(
+            model_name='registroserie',
+            name='usuario',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='series', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='registroserie',
+            index=models.Index(fields=['usuario', 'fecha'], name='gym_registr_usuario_252e1f_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='registroserie',
+            constraint=models.UniqueConstraint(fields=('usuario', 'clave_cliente'), name='unique_serie_clave_cliente'),
+        ),
+    ]
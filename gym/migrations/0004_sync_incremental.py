@@ -0,0 +1,76 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:14
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0003_registroserie'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Eliminacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('usuario_id', models.IntegerField()),
+                ('modelo', models.CharField(choices=[('rutina', 'Rutina'), ('detalle', 'Detalle de Rutina'), ('ajuste', 'Ajuste de Detalle'), ('entrenamiento', 'Registro de Entrenamiento'), ('progreso', 'Progreso Físico'), ('favorito', 'Favorito')], max_length=20)),
+                ('objeto_id', models.BigIntegerField()),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Eliminación',
+                'verbose_name_plural': 'Eliminaciones',
+            },
+        ),
+        migrations.AddField(
+            model_name='ajustedetalle',
+            name='fecha_modificacion',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='detallerutina',
+            name='fecha_modificacion',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='progresofisico',
+            name='fecha_modificacion',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='registroentrenamiento',
+            name='fecha_modificacion',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='ajustedetalle',
+            index=models.Index(fields=['rutina', 'fecha_modificacion'], name='gym_ajusted_rutina__99f97c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detallerutina',
+            index=models.Index(fields=['rutina', 'fecha_modificacion'], name='gym_detalle_rutina__7c163b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favorito',
+            index=models.Index(fields=['usuario', 'fecha'], name='gym_favorit_usuario_823688_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='progresofisico',
+            index=models.Index(fields=['usuario', 'fecha_modificacion'], name='gym_progres_usuario_a9a32e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroentrenamiento',
+            index=models.Index(fields=['usuario', 'fecha_modificacion'], name='gym_registr_usuario_54e5d3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rutina',
+            index=models.Index(fields=['usuario', 'fecha_modificacion'], name='gym_rutina_usuario_02d721_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eliminacion',
+            index=models.Index(fields=['usuario_id', 'fecha'], name='gym_elimina_usuario_50f544_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('gym', '0004_sync_incremental'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VolumenSemanal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semana', models.DateField(help_text='Lunes de la semana')),
+                ('grupo_muscular', models.CharField(max_length=100)),
+                ('series', models.PositiveIntegerField(default=0)),
+                ('tonelaje', models.DecimalField(decimal_places=2, default=0, help_text='kg (repeticiones × peso)', max_digits=12)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='volumen_semanal', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Volumen Semanal',
+                'verbose_name_plural': 'Volumen Semanal',
+                'ordering': ['-semana', 'grupo_muscular'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='volumensemanal',
+            constraint=models.UniqueConstraint(fields=('usuario', 'semana', 'grupo_muscular'), name='unique_volumen_usuario_semana_grupo'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:50
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def quitar_duplicados(apps, schema_editor):
+    """Deja el favorito más antiguo de cada (usuario, ejercicio) y registra la lápida de los demás"""
+    Favorito = apps.get_model('gym', 'Favorito')
+    Eliminacion = apps.get_model('gym', 'Eliminacion')
+    repetidos = (
+        Favorito.objects.filter(ejercicio__isnull=False)
+        .values('usuario_id', 'ejercicio_id')
+        .annotate(primero=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for grupo in repetidos:
+        sobrantes = Favorito.objects.filter(
+            usuario_id=grupo['usuario_id'], ejercicio_id=grupo['ejercicio_id'],
+        ).exclude(id=grupo['primero'])
+        Eliminacion.objects.bulk_create([
+            Eliminacion(usuario_id=grupo['usuario_id'], modelo='favorito', objeto_id=favorito_id)
+            for favorito_id in sobrantes.values_list('id', flat=True)
+        ])
+        sobrantes.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0006_tarea'),
+    ]
+
+    operations = [
+        migrations.RunPython(quitar_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='favorito',
+            constraint=models.UniqueConstraint(fields=('usuario', 'ejercicio'), name='unique_favorito_usuario_ejercicio'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:53
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, Min
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def crear_relaciones(apps, schema_editor):
+    """Una relación por cada (entrenador, cliente) que ya tenga rutinas asignadas"""
+    Rutina = apps.get_model('gym', 'Rutina')
+    ClienteEntrenador = apps.get_model('gym', 'ClienteEntrenador')
+    pares = (
+        Rutina.objects.filter(entrenador__isnull=False).exclude(usuario_id=models.F('entrenador_id'))
+        .order_by().values('entrenador_id', 'usuario_id')
+        .annotate(primera=Min('fecha_creacion'), ultima=Max('fecha_creacion'))
+    )
+    relaciones = [
+        ClienteEntrenador(
+            entrenador_id=par['entrenador_id'], cliente_id=par['usuario_id'],
+            fecha_inicio=par['primera'], ultima_asignacion=par['ultima'],
+        )
+        for par in pares.iterator()
+    ]
+    ClienteEntrenador.objects.bulk_create(relaciones, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('gym', '0007_favorito_unico'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClienteEntrenador',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_inicio', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultima_asignacion', models.DateTimeField(default=django.utils.timezone.now)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entrenadores_rel', to=settings.AUTH_USER_MODEL)),
+                ('entrenador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='clientes_rel', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Cliente de Entrenador',
+                'verbose_name_plural': 'Clientes de Entrenadores',
+                'indexes': [models.Index(fields=['entrenador', '-ultima_asignacion', '-id'], name='gym_cliente_entrena_b8a57b_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='clienteentrenador',
+            constraint=models.UniqueConstraint(fields=('entrenador', 'cliente'), name='unique_cliente_entrenador'),
+        ),
+        migrations.RunPython(crear_relaciones, migrations.RunPython.noop),
+    ]
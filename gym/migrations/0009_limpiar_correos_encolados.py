@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def limpiar_correos(apps, schema_editor):
+    """Los correos ya procesados guardaban el enlace de recuperación completo"""
+    Tarea = apps.get_model('gym', 'Tarea')
+    Tarea.objects.filter(tipo='enviar_correo', estado__in=('completada', 'fallida')).update(argumentos={})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0008_clienteentrenador'),
+    ]
+
+    operations = [
+        migrations.RunPython(limpiar_correos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 20:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0009_limpiar_correos_encolados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ajustedetalle',
+            name='sin_peso',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,8 +1,13 @@
-from django.db import models
+import copy
+
+from django.db import models, router, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.utils import timezone
 
 
 class PerfilUsuario(models.Model):
@@ -100,6 +105,95 @@ class Ejercicio(models.Model):
         return self.video_url
 
 
+class RutinaQuerySet(models.QuerySet):
+    def materializar(self):
+        """
+        Copia a cada rutina asignada del queryset los ejercicios de su
+        plantilla (con los ajustes del cliente) y la desliga de ella. Cuesta
+        lo mismo con 1 que con 500 asignaciones: un INSERT de detalles, uno
+        de lápidas, un DELETE de ajustes y un UPDATE de rutinas. Retorna
+        cuántas rutinas materializó.
+        """
+        with transaction.atomic():
+            asignaciones = list(
+                self.filter(plantilla__isnull=False).order_by().values_list('id', 'usuario_id', 'plantilla_id')
+            )
+            if not asignaciones:
+                return 0
+            ids = [rutina_id for rutina_id, _, _ in asignaciones]
+            plantillas = {plantilla_id for _, _, plantilla_id in asignaciones}
+
+            detalles = {}
+            for detalle in DetalleRutina.objects.filter(rutina_id__in=plantillas).order_by('orden', 'id'):
+                detalles.setdefault(detalle.rutina_id, []).append(detalle)
+            ajustes = {
+                (ajuste.rutina_id, ajuste.detalle_id): ajuste
+                for ajuste in AjusteDetalle.objects.filter(rutina_id__in=ids)
+            }
+            # Quien sigue viendo la plantilla por otra rutina no recibe lápidas de sus detalles
+            vistas = set(
+                Rutina.objects.filter(models.Q(id__in=plantillas) | models.Q(plantilla_id__in=plantillas))
+                .exclude(id__in=ids).order_by()
+                .values_list('usuario_id', Coalesce('plantilla_id', 'id'))
+            )
+
+            copias, lapidas = [], []
+            usuario_de = {}
+            for rutina_id, usuario_id, plantilla_id in asignaciones:
+                usuario_de[rutina_id] = usuario_id
+                for detalle in detalles.get(plantilla_id, []):
+                    copia = copy.copy(detalle)
+                    copia.pk = None
+                    copia.rutina_id = rutina_id
+                    ajuste = ajustes.get((rutina_id, detalle.id))
+                    if ajuste:
+                        ajuste.aplicar(copia)
+                    copias.append(copia)
+                    if (usuario_id, plantilla_id) not in vistas:
+                        # El cliente deja de ver los de la plantilla: sin lápida los
+                        # conservaría en su copia local junto a los nuevos
+                        lapidas.append(Eliminacion(usuario_id=usuario_id, modelo='detalle', objeto_id=detalle.id))
+                # Dos asignaciones de la misma plantilla: una sola lápida por detalle
+                vistas.add((usuario_id, plantilla_id))
+            lapidas.extend(
+                Eliminacion(usuario_id=usuario_de[rutina_id], modelo='ajuste', objeto_id=ajuste.id)
+                for (rutina_id, _), ajuste in ajustes.items()
+            )
+
+            DetalleRutina.objects.bulk_create(copias, batch_size=1000)
+            Eliminacion.objects.bulk_create(lapidas, batch_size=1000)
+            if ajustes:
+                # Las lápidas de los ajustes ya están creadas: sin el post_delete
+                # de cada fila (una consulta por ajuste en lapida_ajuste)
+                AjusteDetalle.objects.filter(rutina_id__in=ids)._raw_delete(router.db_for_write(AjusteDetalle))
+            Rutina.objects.filter(id__in=ids).update(plantilla=None, fecha_modificacion=timezone.now())
+        return len(ids)
+    
+    def con_num_ejercicios(self):
+        """Anota num_ejercicios contando los detalles propios o los de la plantilla"""
+        conteo = DetalleRutina.objects.filter(
+            rutina_id=Coalesce(OuterRef('plantilla_id'), OuterRef('id'))
+        ).order_by().values('rutina_id').annotate(total=Count('id')).values('total')
+        return self.annotate(num_ejercicios=Coalesce(Subquery(conteo), 0))
+    
+    def con_marca_detalles(self):
+        """
+        Anota la última modificación y el total de los detalles (propios o de
+        la plantilla) y de los ajustes: si cualquiera cambia, o se borra uno,
+        cambia la marca.
+        """
+        detalles = DetalleRutina.objects.filter(
+            rutina_id=Coalesce(OuterRef('plantilla_id'), OuterRef('id'))
+        ).order_by().values('rutina_id')
+        ajustes = AjusteDetalle.objects.filter(rutina_id=OuterRef('id')).order_by().values('rutina_id')
+        return self.annotate(
+            detalles_modificados=Subquery(detalles.annotate(m=Max('fecha_modificacion')).values('m')),
+            detalles_total=Subquery(detalles.annotate(n=Count('id')).values('n')),
+            ajustes_modificados=Subquery(ajustes.annotate(m=Max('fecha_modificacion')).values('m')),
+            ajustes_total=Subquery(ajustes.annotate(n=Count('id')).values('n')),
+        )
+
+
 class Rutina(models.Model):
     """Rutinas personalizadas"""
     DIFICULTAD = [
@@ -112,6 +206,9 @@ class Rutina(models.Model):
     descripcion = models.TextField(blank=True)
     usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='rutinas')
     entrenador = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='rutinas_asignadas')
+    # Rutina asignada que aún comparte los ejercicios de la rutina del entrenador
+    # (copy-on-write: se materializa al editarla, ver materializar())
+    plantilla = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='asignaciones')
     dificultad = models.CharField(max_length=20, choices=DIFICULTAD, default='intermedio')
     duracion_min = models.IntegerField(default=60, help_text='Minutos')
     objetivo = models.TextField(blank=True)
@@ -120,16 +217,48 @@ class Rutina(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_modificacion = models.DateTimeField(auto_now=True)
     
+    objects = RutinaQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Rutina'
         verbose_name_plural = 'Rutinas'
         ordering = ['-fecha_creacion']
+        indexes = [
+            # Sincronización incremental (api_sync)
+            models.Index(fields=['usuario', 'fecha_modificacion']),
+        ]
     
     def __str__(self):
         return f"{self.nombre} - {self.usuario.username}"
     
+    @property
+    def detalles_rutina_id(self):
+        """Id de la rutina dueña de los DetalleRutina que aplican a esta"""
+        return self.plantilla_id or self.id
+    
     def total_ejercicios(self):
-        return self.detalles.count()
+        return DetalleRutina.objects.filter(rutina_id=self.detalles_rutina_id).count()
+    
+    def detalles_efectivos(self):
+        """Ejercicios de la rutina con los ajustes del cliente aplicados"""
+        detalles = list(
+            DetalleRutina.objects.filter(rutina_id=self.detalles_rutina_id)
+            .select_related('ejercicio').order_by('orden')
+        )
+        if self.plantilla_id:
+            ajustes = {a.detalle_id: a for a in self.ajustes.all()}
+            for detalle in detalles:
+                ajuste = ajustes.get(detalle.id)
+                if ajuste:
+                    ajuste.aplicar(detalle)
+        return detalles
+    
+    def materializar(self):
+        """Copia los ejercicios de la plantilla (con ajustes) a esta rutina"""
+        if not self.plantilla_id:
+            return
+        Rutina.objects.filter(pk=self.pk).materializar()
+        self.refresh_from_db(fields=['plantilla', 'fecha_modificacion'])
 
 
 class DetalleRutina(models.Model):
@@ -142,36 +271,109 @@ class DetalleRutina(models.Model):
     peso = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
     descanso_seg = models.IntegerField(default=60)
     notas = models.TextField(blank=True)
+    fecha_modificacion = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = 'Detalle de Rutina'
         verbose_name_plural = 'Detalles de Rutinas'
         ordering = ['rutina', 'orden']
+        indexes = [
+            models.Index(fields=['rutina', 'fecha_modificacion']),
+        ]
     
     def __str__(self):
         return f"{self.rutina.nombre} - {self.ejercicio.nombre}"
 
 
+class AjusteDetalle(models.Model):
+    """Ajuste de un cliente sobre un ejercicio de la rutina plantilla"""
+    rutina = models.ForeignKey(Rutina, on_delete=models.CASCADE, related_name='ajustes')
+    detalle = models.ForeignKey(DetalleRutina, on_delete=models.CASCADE, related_name='ajustes')
+    peso = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    # peso NULL es "el de la plantilla"; esto quita el peso solo para este cliente
+    sin_peso = models.BooleanField(default=False)
+    notas = models.TextField(blank=True)
+    fecha_modificacion = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Ajuste de Detalle'
+        verbose_name_plural = 'Ajustes de Detalles'
+        constraints = [
+            models.UniqueConstraint(fields=['rutina', 'detalle'], name='unique_ajuste_rutina_detalle'),
+        ]
+        indexes = [
+            models.Index(fields=['rutina', 'fecha_modificacion']),
+        ]
+    
+    def __str__(self):
+        return f"{self.rutina.nombre} - {self.detalle.ejercicio.nombre}"
+    
+    def aplicar(self, detalle):
+        if self.sin_peso:
+            detalle.peso = None
+        elif self.peso is not None:
+            detalle.peso = self.peso
+        if self.notas:
+            detalle.notas = self.notas
+
+
 class RegistroEntrenamiento(models.Model):
     """Entrenamientos completados"""
     usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='entrenamientos')
     rutina = models.ForeignKey(Rutina, on_delete=models.CASCADE)
-    fecha = models.DateTimeField(auto_now_add=True)
+    # Los registros hechos sin conexión llegan con la fecha real del entrenamiento
+    fecha = models.DateTimeField(default=timezone.now)
     duracion_min = models.IntegerField(null=True, blank=True)
     calorias = models.IntegerField(null=True, blank=True)
     nivel_esfuerzo = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(10)], default=5)
     notas = models.TextField(blank=True)
     completado = models.BooleanField(default=True)
+    # Clave de idempotencia generada por el cliente (API de registro por lotes)
+    clave_cliente = models.CharField(max_length=64, null=True, blank=True)
+    fecha_modificacion = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = 'Registro de Entrenamiento'
         verbose_name_plural = 'Registros de Entrenamientos'
         ordering = ['-fecha']
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'clave_cliente'], name='unique_entrenamiento_clave_cliente'),
+        ]
+        indexes = [
+            models.Index(fields=['usuario', 'fecha_modificacion']),
+        ]
     
     def __str__(self):
         return f"{self.usuario.username} - {self.rutina.nombre} - {self.fecha.strftime('%d/%m/%Y')}"
 
 
+class RegistroSerie(models.Model):
+    """Serie realizada de un ejercicio (registro por serie)"""
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='series')
+    entrenamiento = models.ForeignKey(RegistroEntrenamiento, on_delete=models.CASCADE, null=True, blank=True, related_name='series')
+    ejercicio = models.ForeignKey(Ejercicio, on_delete=models.CASCADE)
+    numero = models.PositiveSmallIntegerField(default=1)
+    repeticiones = models.PositiveIntegerField()
+    peso = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    fecha = models.DateTimeField(default=timezone.now)
+    # Clave de idempotencia generada por el cliente: los reintentos no duplican
+    clave_cliente = models.CharField(max_length=64)
+    
+    class Meta:
+        verbose_name = 'Registro de Serie'
+        verbose_name_plural = 'Registros de Series'
+        ordering = ['fecha', 'numero']
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'clave_cliente'], name='unique_serie_clave_cliente'),
+        ]
+        indexes = [
+            models.Index(fields=['usuario', 'fecha']),
+        ]
+    
+    def __str__(self):
+        return f"{self.usuario.username} - {self.ejercicio.nombre} - {self.repeticiones}x{self.peso or 0}kg"
+
+
 class ProgresoFisico(models.Model):
     """Progreso físico del usuario"""
     usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='progreso')
@@ -185,11 +387,15 @@ class ProgresoFisico(models.Model):
     piernas = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     foto = models.URLField(blank=True)
     notas = models.TextField(blank=True)
+    fecha_modificacion = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = 'Progreso Físico'
         verbose_name_plural = 'Progreso Físico'
         ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['usuario', 'fecha_modificacion']),
+        ]
     
     def __str__(self):
         return f"{self.usuario.username} - {self.fecha} - {self.peso}kg"
@@ -205,6 +411,14 @@ class Favorito(models.Model):
     class Meta:
         verbose_name = 'Favorito'
         verbose_name_plural = 'Favoritos'
+        constraints = [
+            # Los favoritos de rutinas tienen ejercicio NULL y no chocan entre sí
+            models.UniqueConstraint(fields=['usuario', 'ejercicio'], name='unique_favorito_usuario_ejercicio'),
+        ]
+        indexes = [
+            # Los favoritos no se editan: `fecha` sirve de marca para api_sync
+            models.Index(fields=['usuario', 'fecha']),
+        ]
     
     def __str__(self):
         if self.ejercicio:
@@ -212,8 +426,143 @@ class Favorito(models.Model):
         return f"{self.usuario.username} - {self.rutina.nombre}"
 
 
+class ClienteEntrenadorQuerySet(models.QuerySet):
+    def con_resumen(self):
+        """Anota rutinas_activas (asignadas por este entrenador) y ultimo_entrenamiento del cliente"""
+        activas = Rutina.objects.filter(
+            usuario_id=OuterRef('cliente_id'), entrenador_id=OuterRef('entrenador_id'), activa=True
+        ).order_by().values('usuario_id').annotate(total=Count('id')).values('total')
+        ultimo = RegistroEntrenamiento.objects.filter(
+            usuario_id=OuterRef('cliente_id')
+        ).order_by().values('usuario_id').annotate(m=Max('fecha')).values('m')
+        return self.annotate(
+            rutinas_activas=Coalesce(Subquery(activas), 0),
+            ultimo_entrenamiento=Subquery(ultimo),
+        )
+
+
+class ClienteEntrenador(models.Model):
+    """Cliente de un entrenador: existe mientras el cliente tenga alguna rutina asignada por él"""
+    entrenador = models.ForeignKey(User, on_delete=models.CASCADE, related_name='clientes_rel')
+    cliente = models.ForeignKey(User, on_delete=models.CASCADE, related_name='entrenadores_rel')
+    fecha_inicio = models.DateTimeField(default=timezone.now)
+    ultima_asignacion = models.DateTimeField(default=timezone.now)
+    
+    objects = ClienteEntrenadorQuerySet.as_manager()
+    
+    class Meta:
+        verbose_name = 'Cliente de Entrenador'
+        verbose_name_plural = 'Clientes de Entrenadores'
+        constraints = [
+            models.UniqueConstraint(fields=['entrenador', 'cliente'], name='unique_cliente_entrenador'),
+        ]
+        indexes = [
+            # Roster paginado: los clientes con asignaciones recientes primero
+            models.Index(fields=['entrenador', '-ultima_asignacion', '-id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.cliente.username} (entrenador {self.entrenador.username})"
+
+
+class VolumenSemanal(models.Model):
+    """Volumen de entrenamiento precalculado por usuario, semana y grupo muscular"""
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='volumen_semanal')
+    semana = models.DateField(help_text='Lunes de la semana')
+    grupo_muscular = models.CharField(max_length=100)
+    series = models.PositiveIntegerField(default=0)
+    tonelaje = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text='kg (repeticiones × peso)')
+    
+    class Meta:
+        verbose_name = 'Volumen Semanal'
+        verbose_name_plural = 'Volumen Semanal'
+        ordering = ['-semana', 'grupo_muscular']
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'semana', 'grupo_muscular'], name='unique_volumen_usuario_semana_grupo'),
+        ]
+    
+    def __str__(self):
+        return f"{self.usuario.username} - {self.semana} - {self.grupo_muscular}"
+
+
+class Eliminacion(models.Model):
+    """Lápida de un registro borrado, para la sincronización incremental"""
+    MODELOS = [
+        ('rutina', 'Rutina'),
+        ('detalle', 'Detalle de Rutina'),
+        ('ajuste', 'Ajuste de Detalle'),
+        ('entrenamiento', 'Registro de Entrenamiento'),
+        ('progreso', 'Progreso Físico'),
+        ('favorito', 'Favorito'),
+    ]
+    
+    # Sin FK: las lápidas se crean mientras se borra en cascada el propio usuario
+    usuario_id = models.IntegerField()
+    modelo = models.CharField(max_length=20, choices=MODELOS)
+    objeto_id = models.BigIntegerField()
+    fecha = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = 'Eliminación'
+        verbose_name_plural = 'Eliminaciones'
+        indexes = [
+            models.Index(fields=['usuario_id', 'fecha']),
+        ]
+    
+    def __str__(self):
+        return f"{self.modelo} #{self.objeto_id} (usuario {self.usuario_id})"
+
+
+class Tarea(models.Model):
+    """Trabajo en segundo plano encolado en la base (ver cola_service y run_worker)"""
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('en_curso', 'En curso'),
+        ('completada', 'Completada'),
+        ('fallida', 'Fallida'),
+    ]
+    
+    tipo = models.CharField(max_length=50)
+    argumentos = models.JSONField(default=dict, blank=True)
+    # Evita encolar dos veces el mismo trabajo mientras está pendiente
+    clave = models.CharField(max_length=100, blank=True, db_index=True)
+    prioridad = models.SmallIntegerField(default=0, help_text='Mayor número = se ejecuta antes')
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    ejecutar_desde = models.DateTimeField(default=timezone.now)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=5)
+    # Si el worker muere con la tarea tomada, otro la retoma al vencer el plazo
+    bloqueada_hasta = models.DateTimeField(null=True, blank=True)
+    trabajador = models.CharField(max_length=100, blank=True)
+    ultimo_error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Tarea'
+        verbose_name_plural = 'Tareas'
+        ordering = ['-fecha_creacion']
+        indexes = [
+            # Consulta del worker: pendientes vencidas por prioridad
+            models.Index(fields=['estado', 'prioridad', 'ejecutar_desde']),
+        ]
+    
+    def __str__(self):
+        return f"{self.tipo} #{self.id} ({self.estado})"
+
+
 # Signal para crear perfil automáticamente
 @receiver(post_save, sender=User)
 def crear_perfil(sender, instance, created, **kwargs):
     if created:
         PerfilUsuario.objects.create(user=instance)
+
+
+def obtener_perfil(user):
+    """Perfil del usuario, creándolo si no existe. Retorna (perfil, creado)"""
+    try:
+        return user.perfil, False
+    except PerfilUsuario.DoesNotExist:
+        perfil = PerfilUsuario.objects.create(user=user, tipo_usuario='usuario')
+        user.perfil = perfil
+        return perfil, True
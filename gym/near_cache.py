@@ -0,0 +1,217 @@
+"""
+Caché de dos niveles para datos que se leen mucho y cambian poco.
+
+El primer nivel es un LRU en memoria del proceso (acotado en entradas y con
+TTL); el segundo es la caché compartida de Django (CACHES). Cada grupo de
+claves tiene una versión guardada en la caché compartida: invalidar cambia
+la versión y las copias viejas de todos los workers dejan de usarse en
+cuanto revisan la versión, lo que cada proceso hace cada
+INTERVALO_VERSION segundos como máximo.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+# Cada cuánto un proceso vuelve a leer la versión de un grupo
+INTERVALO_VERSION = 5  # segundos
+
+_instancias = {}
+
+
+def _nueva_version():
+    # Igual que en dashboard_cache: un valor único y no un contador
+    return time.time_ns()
+
+
+class NearCache:
+    """
+    LRU local delante de la caché compartida.
+
+    Los valores se comparten entre los hilos del proceso y deben tratarse
+    como de solo lectura; con copiar=True se guardan serializados y cada
+    lectura entrega una copia (para objetos que las vistas modifican).
+    """
+
+    def __init__(self, nombre, max_entradas=1000, ttl=60, timeout=3600, copiar=False):
+        self.nombre = nombre
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.timeout = timeout
+        self.copiar = copiar
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  # clave -> (valor, versión, expira)
+        self._versiones = {}  # grupo -> (versión, revisada)
+        self._contadores = dict.fromkeys(('local', 'compartida', 'fallos', 'desalojos'), 0)
+        _instancias[nombre] = self
+
+    # ---------- API ----------
+
+    def get(self, clave, grupo=''):
+        """Valor cacheado o None"""
+        version = self._version(grupo)
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get((grupo, clave))
+            if entrada and entrada[1] == version and entrada[2] > ahora:
+                self._entradas.move_to_end((grupo, clave))
+                self._contadores['local'] += 1
+                return self._leer(entrada[0])
+
+        valor = cache.get(self._clave(grupo, version, clave))
+        with self._lock:
+            self._contadores['fallos' if valor is None else 'compartida'] += 1
+        if valor is None:
+            return None
+        self._guardar_local(grupo, clave, valor, version)
+        return self._leer(valor)
+
+    def get_many(self, claves, grupo=''):
+        """{clave: valor} de las claves cacheadas; las que faltan en local, en una sola lectura"""
+        version = self._version(grupo)
+        ahora = time.monotonic()
+        encontrados = {}
+        with self._lock:
+            for clave in claves:
+                entrada = self._entradas.get((grupo, clave))
+                if entrada and entrada[1] == version and entrada[2] > ahora:
+                    self._entradas.move_to_end((grupo, clave))
+                    encontrados[clave] = entrada[0]
+            self._contadores['local'] += len(encontrados)
+
+        faltan = {self._clave(grupo, version, clave): clave for clave in claves if clave not in encontrados}
+        if faltan:
+            compartidos = cache.get_many(list(faltan))
+            with self._lock:
+                self._contadores['compartida'] += len(compartidos)
+                self._contadores['fallos'] += len(faltan) - len(compartidos)
+            for clave_compartida, valor in compartidos.items():
+                self._guardar_local(grupo, faltan[clave_compartida], valor, version)
+                encontrados[faltan[clave_compartida]] = valor
+        return {clave: self._leer(valor) for clave, valor in encontrados.items()}
+
+    def set_many(self, valores, timeout=None, grupo=''):
+        version = self._version(grupo)
+        if self.copiar:
+            valores = {clave: pickle.dumps(valor, pickle.HIGHEST_PROTOCOL) for clave, valor in valores.items()}
+        cache.set_many(
+            {self._clave(grupo, version, clave): valor for clave, valor in valores.items()},
+            timeout or self.timeout,
+        )
+        for clave, valor in valores.items():
+            self._guardar_local(grupo, clave, valor, version)
+
+    def set(self, clave, valor, timeout=None, grupo='', version=None):
+        """
+        Guarda `valor`. Con `version` (la leída antes de calcularlo) no se
+        guarda nada si el grupo se invalidó mientras tanto: el valor ya es viejo.
+        """
+        if version is None:
+            version = self._version(grupo)
+        elif self._version(grupo, revisar=True) != version:
+            return
+        if self.copiar:
+            valor = pickle.dumps(valor, pickle.HIGHEST_PROTOCOL)
+        cache.set(self._clave(grupo, version, clave), valor, timeout or self.timeout)
+        self._guardar_local(grupo, clave, valor, version)
+
+    def get_or_set(self, clave, calcular, grupo='', timeout=None):
+        """Valor cacheado o el resultado de `calcular()` (None no se cachea)"""
+        # La versión se toma antes de calcular: si cambia entre medio, set() descarta el valor
+        version = self._version(grupo)
+        valor = self.get(clave, grupo)
+        if valor is None:
+            valor = calcular()
+            if valor is not None:
+                self.set(clave, valor, timeout, grupo, version=version)
+        return valor
+
+    def version(self, grupo=''):
+        """Versión vigente del grupo (cambia con cada invalidar())"""
+        return self._version(grupo)
+
+    def invalidar(self, grupo=''):
+        """Nueva versión del grupo: este proceso la ve ya, los demás en INTERVALO_VERSION"""
+        version = _nueva_version()
+        cache.set(self._clave_version(grupo), version, None)
+        with self._lock:
+            self._versiones[grupo] = (version, time.monotonic())
+
+    def estadisticas(self):
+        with self._lock:
+            c = dict(self._contadores)
+            entradas = len(self._entradas)
+        lecturas = c['local'] + c['compartida'] + c['fallos']
+        return {
+            'entradas': entradas,
+            'max_entradas': self.max_entradas,
+            'lecturas': lecturas,
+            'aciertos_local': c['local'],
+            'aciertos_compartida': c['compartida'],
+            'fallos': c['fallos'],
+            'desalojos': c['desalojos'],
+            # La compartida solo se consulta cuando falla la local
+            'ratio_local': round(c['local'] / lecturas, 4) if lecturas else None,
+            'ratio_compartida': (
+                round(c['compartida'] / (lecturas - c['local']), 4) if lecturas - c['local'] else None
+            ),
+        }
+
+    def limpiar_local(self):
+        with self._lock:
+            self._entradas.clear()
+            self._versiones.clear()
+
+    # ---------- internos ----------
+
+    def _clave(self, grupo, version, clave):
+        return f'near:{self.nombre}:{grupo}:{version}:{clave}'
+
+    def _clave_version(self, grupo):
+        return f'near:{self.nombre}:version:{grupo}'
+
+    def _version(self, grupo, revisar=False):
+        """Versión del grupo; con revisar=True se relee de la caché compartida"""
+        ahora = time.monotonic()
+        with self._lock:
+            conocida = self._versiones.get(grupo)
+        if conocida and ahora - conocida[1] < INTERVALO_VERSION and not revisar:
+            return conocida[0]
+        version = cache.get_or_set(self._clave_version(grupo), _nueva_version, None)
+        with self._lock:
+            if len(self._versiones) >= 2 * self.max_entradas:
+                # Un grupo por usuario: se olvidan las versiones que habría que releer igual
+                self._versiones = {
+                    g: v for g, v in self._versiones.items() if ahora - v[1] < INTERVALO_VERSION
+                }
+            self._versiones[grupo] = (version, ahora)
+        return version
+
+    def _guardar_local(self, grupo, clave, valor, version):
+        with self._lock:
+            self._entradas[(grupo, clave)] = (valor, version, time.monotonic() + self.ttl)
+            self._entradas.move_to_end((grupo, clave))
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self._contadores['desalojos'] += 1
+
+    def _leer(self, valor):
+        return pickle.loads(valor) if self.copiar else valor
+
+
+def estadisticas():
+    """Aciertos por nivel de cada NearCache de este proceso"""
+    return {nombre: instancia.estadisticas() for nombre, instancia in _instancias.items()}
+
+
+# Catálogo de ExerciseDB y sus tarjetas renderizadas (ver tarjetas_cache):
+# un solo grupo, se invalida al refrescarlo
+catalogo = NearCache('catalogo', max_entradas=2048, ttl=300, timeout=86400)
+
+# Usuario + perfil de cada request (PerfilModelBackend); grupo = id del usuario
+usuarios = NearCache('usuarios', max_entradas=5000, ttl=60, timeout=300, copiar=True)
+
+# Ids de los ejercicios favoritos de cada usuario (FavoritoService); grupo = id del usuario
+favoritos = NearCache('favoritos', max_entradas=5000, ttl=60, timeout=86400)
@@ -0,0 +1,145 @@
+"""
+Analítica del progreso físico: agregados semanales y mensuales, medias
+móviles y tendencias lineales, calculados con NumPy sobre toda la serie
+del usuario y guardados en caché hasta que cambie su ProgresoFisico.
+"""
+import numpy as np
+from django.core.cache import cache
+
+from .models import ProgresoFisico
+
+
+class ProgresoService:
+    """Series de progreso listas para gráficos"""
+    METRICAS = ('peso', 'grasa_corporal', 'masa_muscular', 'cintura', 'pecho', 'brazos', 'piernas')
+    VENTANA_MEDIA_MOVIL = 4  # semanas
+    DIAS_TENDENCIA = 180  # la tendencia usa solo el último medio año
+    SEMANAS_PROYECCION = (4, 12)
+    CACHE_TIMEOUT = 60 * 60 * 24
+
+    @staticmethod
+    def analitica(user_id):
+        """
+        Retorna {'registros', 'desde', 'hasta', 'semanal', 'mensual',
+        'tendencias'} del usuario. Se calcula una vez y queda en caché hasta
+        que se guarda o borra un ProgresoFisico suyo (ver gym/signals.py).
+        """
+        return cache.get_or_set(
+            _cache_key(user_id),
+            lambda: ProgresoService._calcular(user_id),
+            ProgresoService.CACHE_TIMEOUT,
+        )
+
+    @staticmethod
+    def invalidar(user_id):
+        cache.delete(_cache_key(user_id))
+
+    @staticmethod
+    def proyectar_meta(tendencia, meta):
+        """Fecha estimada (ISO) en que la tendencia alcanza `meta`, o None"""
+        pendiente = tendencia['pendiente_diaria']
+        if not pendiente:
+            return None
+        dias = (meta - tendencia['actual']) / pendiente
+        if dias < 0 or dias > 365 * 5:
+            return None
+        return (np.datetime64(tendencia['hasta']) + int(round(dias))).item().isoformat()
+
+    @staticmethod
+    def _calcular(user_id):
+        filas = list(
+            ProgresoFisico.objects.filter(usuario_id=user_id)
+            .order_by('fecha').values_list('fecha', *ProgresoService.METRICAS)
+        )
+        if not filas:
+            return {'registros': 0, 'desde': None, 'hasta': None, 'semanal': None, 'mensual': None, 'tendencias': {}}
+
+        fechas = np.array([fila[0] for fila in filas], dtype='datetime64[D]')
+        # Una columna por métrica; los campos vacíos (None) quedan como NaN
+        valores = np.array([fila[1:] for fila in filas], dtype=float)
+        dias = fechas.astype(np.int64)
+
+        # El 1970-01-01 fue jueves: +3 hace que las semanas empiecen el lunes
+        semanas, medias_semana = _agrupar((dias + 3) // 7, valores)
+        medias_moviles = _media_movil(semanas, medias_semana, ProgresoService.VENTANA_MEDIA_MOVIL)
+        meses, medias_mes = _agrupar(fechas.astype('datetime64[M]'), valores)
+
+        con_datos = [i for i, _ in enumerate(ProgresoService.METRICAS) if not np.isnan(valores[:, i]).all()]
+        return {
+            'registros': len(filas),
+            'desde': str(fechas[0]),
+            'hasta': str(fechas[-1]),
+            'semanal': {
+                'fechas': [str(fecha) for fecha in (semanas * 7 - 3).astype('datetime64[D]')],
+                'series': {
+                    ProgresoService.METRICAS[i]: {
+                        'media': _lista(medias_semana[:, i]),
+                        'media_movil': _lista(medias_moviles[:, i]),
+                    }
+                    for i in con_datos
+                },
+            },
+            'mensual': {
+                'fechas': [str(mes) for mes in meses],
+                'series': {ProgresoService.METRICAS[i]: _lista(medias_mes[:, i]) for i in con_datos},
+            },
+            'tendencias': {
+                ProgresoService.METRICAS[i]: tendencia
+                for i in con_datos
+                if (tendencia := _tendencia(dias, valores[:, i])) is not None
+            },
+        }
+
+
+def _cache_key(user_id):
+    return f'progreso:analitica:{user_id}'
+
+
+def _agrupar(claves, valores):
+    """Media por clave (semana o mes) de cada columna, ignorando NaN"""
+    unicas, inversa = np.unique(claves, return_inverse=True)
+    inversa = inversa.reshape(-1)
+    validos = ~np.isnan(valores)
+    sumas = np.zeros((len(unicas), valores.shape[1]))
+    conteos = np.zeros_like(sumas)
+    np.add.at(sumas, inversa, np.where(validos, valores, 0.0))
+    np.add.at(conteos, inversa, validos)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return unicas, sumas / conteos
+
+
+def _media_movil(semanas, medias, ventana):
+    """Media de las semanas con datos dentro de las últimas `ventana` semanas de calendario"""
+    validos = ~np.isnan(medias)
+    sumas = np.vstack([np.zeros((1, medias.shape[1])), np.cumsum(np.where(validos, medias, 0.0), axis=0)])
+    conteos = np.vstack([np.zeros((1, medias.shape[1])), np.cumsum(validos, axis=0)])
+    inicio = np.searchsorted(semanas, semanas - ventana + 1)
+    fin = np.arange(1, len(semanas) + 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (sumas[fin] - sumas[inicio]) / (conteos[fin] - conteos[inicio])
+
+
+def _tendencia(dias, serie):
+    """Recta de mínimos cuadrados sobre los últimos DIAS_TENDENCIA días"""
+    validos = ~np.isnan(serie)
+    x, y = dias[validos], serie[validos]
+    recientes = x >= x[-1] - ProgresoService.DIAS_TENDENCIA
+    x, y = x[recientes] - x[-1], y[recientes]
+    if len(np.unique(x)) < 2:
+        return None
+    pendiente, actual = np.polyfit(x, y, 1)
+    hasta = np.datetime64(int(dias[validos][-1]), 'D')
+    return {
+        'hasta': str(hasta),
+        'actual': round(float(actual), 2),
+        'pendiente_diaria': float(pendiente),
+        'cambio_semanal': round(float(pendiente) * 7, 2),
+        'proyecciones': {
+            str(hasta + semanas * 7): round(float(actual + pendiente * semanas * 7), 2)
+            for semanas in ProgresoService.SEMANAS_PROYECCION
+        },
+    }
+
+
+def _lista(columna):
+    return [None if np.isnan(valor) else round(float(valor), 2) for valor in columna]
@@ -0,0 +1,247 @@
+"""
+Registro por lotes de entrenamientos y series (API para tablets/móviles).
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from django.utils import timezone
+
+from .dashboard_cache import bump_version, scope_usuario, SCOPE_ADMIN
+from .models import Ejercicio, Rutina, RegistroEntrenamiento, RegistroSerie
+from .volumen_service import VolumenService
+
+
+class LoteInvalido(Exception):
+    """El lote completo no se puede procesar (formato o tamaño)"""
+
+
+class RegistroService:
+    """
+    Ingesta de lotes de sesiones y series registradas (posiblemente sin conexión).
+
+    Cada elemento trae una `clave` generada por el cliente; los elementos
+    cuya clave ya existe para el usuario se ignoran, así un reintento del
+    mismo lote no duplica nada. Todo se escribe con bulk_create.
+    """
+    MAX_SESIONES = 500
+    MAX_SERIES = 10000
+    BATCH_SIZE = 1000
+    # Topes por elemento (las columnas son INT de 32 bits)
+    MAX_DURACION_MIN = 24 * 60
+    MAX_CALORIAS = 20000
+    MAX_REPETICIONES = 10000
+
+    @staticmethod
+    def registrar_lote(usuario, datos):
+        """
+        Registra `datos` = {'sesiones': [...], 'series': [...]} para `usuario`.
+
+        Sesión: clave, rutina_id, fecha?, duracion_min?, calorias?,
+        nivel_esfuerzo?, notas?. Serie: clave, ejercicio_id (de ExerciseDB),
+        repeticiones, numero?, peso?, fecha?, sesion? (clave de una sesión).
+        Retorna un resumen con lo creado, lo duplicado y los rechazos.
+        """
+        if not isinstance(datos, dict):
+            raise LoteInvalido('El cuerpo debe ser un objeto JSON')
+        sesiones = datos.get('sesiones') or []
+        series = datos.get('series') or []
+        if not isinstance(sesiones, list) or not isinstance(series, list):
+            raise LoteInvalido("'sesiones' y 'series' deben ser listas")
+        if len(sesiones) > RegistroService.MAX_SESIONES or len(series) > RegistroService.MAX_SERIES:
+            raise LoteInvalido(
+                f'Máximo {RegistroService.MAX_SESIONES} sesiones y '
+                f'{RegistroService.MAX_SERIES} series por lote'
+            )
+
+        rechazos = []
+        with transaction.atomic():
+            sesiones_creadas, sesiones_dup, ids_sesion = RegistroService._registrar_sesiones(
+                usuario, sesiones, rechazos
+            )
+            series_creadas, series_dup = RegistroService._registrar_series(
+                usuario, series, ids_sesion, rechazos
+            )
+            if sesiones_creadas:
+                # bulk_create no dispara post_save
+                transaction.on_commit(lambda: bump_version(SCOPE_ADMIN, scope_usuario(usuario.id)))
+
+        return {
+            'sesiones': {'creadas': sesiones_creadas, 'duplicadas': sesiones_dup},
+            'series': {'creadas': series_creadas, 'duplicadas': series_dup},
+            'rechazadas': rechazos,
+        }
+
+    @staticmethod
+    def _registrar_sesiones(usuario, sesiones, rechazos):
+        claves = _valores(sesiones, 'clave', str)
+        existentes = set(
+            RegistroEntrenamiento.objects.filter(usuario=usuario, clave_cliente__in=claves)
+            .values_list('clave_cliente', flat=True)
+        )
+        rutinas = set(
+            Rutina.objects.filter(
+                usuario=usuario,
+                id__in=_valores(sesiones, 'rutina_id', int),
+            ).values_list('id', flat=True)
+        )
+
+        nuevas = {}
+        for item in sesiones:
+            try:
+                clave = _clave(item)
+                if clave in existentes or clave in nuevas:
+                    continue
+                if item.get('rutina_id') not in rutinas:
+                    raise ValueError('Rutina no encontrada')
+                nuevas[clave] = RegistroEntrenamiento(
+                    usuario=usuario,
+                    rutina_id=item['rutina_id'],
+                    fecha=_fecha(item.get('fecha')),
+                    duracion_min=_entero(item.get('duracion_min'), RegistroService.MAX_DURACION_MIN, 'duracion_min'),
+                    calorias=_entero(item.get('calorias'), RegistroService.MAX_CALORIAS, 'calorias'),
+                    nivel_esfuerzo=_esfuerzo(item.get('nivel_esfuerzo', 5)),
+                    notas=str(item.get('notas', '')),
+                    clave_cliente=clave,
+                )
+            except (ValueError, TypeError, AttributeError) as e:
+                rechazos.append({'tipo': 'sesion', 'clave': _clave_segura(item), 'error': str(e) or 'Valor inválido'})
+
+        RegistroEntrenamiento.objects.bulk_create(
+            nuevas.values(), batch_size=RegistroService.BATCH_SIZE, ignore_conflicts=True
+        )
+
+        # Con ignore_conflicts no vuelven los ids: se leen por clave (incluye
+        # las sesiones de lotes anteriores a las que apuntan series nuevas)
+        ids_sesion = dict(
+            RegistroEntrenamiento.objects.filter(usuario=usuario, clave_cliente__in=claves)
+            .values_list('clave_cliente', 'id')
+        )
+        return len(nuevas), len(sesiones) - len(nuevas) - _rechazos_de(rechazos, 'sesion'), ids_sesion
+
+    @staticmethod
+    def _registrar_series(usuario, series, ids_sesion, rechazos):
+        claves = _valores(series, 'clave', str)
+        existentes = set(
+            RegistroSerie.objects.filter(usuario=usuario, clave_cliente__in=claves)
+            .values_list('clave_cliente', flat=True)
+        )
+        ejercicios = dict(
+            Ejercicio.objects.filter(
+                ejercicio_id__in=_valores(series, 'ejercicio_id', str)
+            ).values_list('ejercicio_id', 'id')
+        )
+        sesiones_faltantes = _valores(series, 'sesion', str) - ids_sesion.keys()
+        if sesiones_faltantes:
+            ids_sesion = {**ids_sesion, **dict(
+                RegistroEntrenamiento.objects.filter(usuario=usuario, clave_cliente__in=sesiones_faltantes)
+                .values_list('clave_cliente', 'id')
+            )}
+
+        nuevas = {}
+        for item in series:
+            try:
+                clave = _clave(item)
+                if clave in existentes or clave in nuevas:
+                    continue
+                ejercicio_id = ejercicios.get(item.get('ejercicio_id'))
+                if ejercicio_id is None:
+                    raise ValueError('Ejercicio no encontrado')
+                sesion = item.get('sesion')
+                if sesion and sesion not in ids_sesion:
+                    raise ValueError('Sesión no encontrada')
+                repeticiones = _entero(item.get('repeticiones'), RegistroService.MAX_REPETICIONES, 'repeticiones')
+                if repeticiones is None:
+                    raise ValueError('Repeticiones inválidas')
+                nuevas[clave] = RegistroSerie(
+                    usuario=usuario,
+                    entrenamiento_id=ids_sesion.get(sesion) if sesion else None,
+                    ejercicio_id=ejercicio_id,
+                    numero=_numero_serie(item.get('numero')),
+                    repeticiones=repeticiones,
+                    peso=peso_o_none(item.get('peso')),
+                    fecha=_fecha(item.get('fecha')),
+                    clave_cliente=clave,
+                )
+            except (ValueError, TypeError, AttributeError, InvalidOperation) as e:
+                rechazos.append({'tipo': 'serie', 'clave': _clave_segura(item), 'error': str(e) or 'Valor inválido'})
+
+        RegistroSerie.objects.bulk_create(
+            nuevas.values(), batch_size=RegistroService.BATCH_SIZE, ignore_conflicts=True
+        )
+        # bulk_create no dispara post_save: el volumen semanal se suma aquí
+        VolumenService.acumular(
+            series=RegistroSerie.objects.filter(usuario=usuario, clave_cliente__in=nuevas.keys())
+        )
+        return len(nuevas), len(series) - len(nuevas) - _rechazos_de(rechazos, 'serie')
+
+
+def _valores(items, campo, tipo):
+    """Valores de `campo` en los elementos válidos del lote (para filtrar con __in)"""
+    return {
+        item[campo] for item in items
+        if isinstance(item, dict) and isinstance(item.get(campo), tipo) and not isinstance(item.get(campo), bool)
+    }
+
+
+def _clave(item):
+    clave = item.get('clave')
+    if not isinstance(clave, str) or not 0 < len(clave) <= 64:
+        raise ValueError('Clave de idempotencia inválida')
+    return clave
+
+
+def _clave_segura(item):
+    return item.get('clave') if isinstance(item, dict) else None
+
+
+def _rechazos_de(rechazos, tipo):
+    return sum(1 for r in rechazos if r['tipo'] == tipo)
+
+
+def _entero(valor, maximo, nombre):
+    """Entero entre 0 y `maximo` (None si viene vacío): fuera de rango falla el ítem y no el lote"""
+    if valor in (None, ''):
+        return None
+    try:
+        numero = int(valor)
+    except OverflowError:
+        raise ValueError(f'{nombre} inválido') from None
+    if not 0 <= numero <= maximo:
+        raise ValueError(f'{nombre} fuera de rango (0 a {maximo})')
+    return numero
+
+
+def peso_o_none(valor):
+    """Peso en kg como Decimal (None si viene vacío); ValueError si no cabe en el modelo"""
+    if valor is None or str(valor).strip() == '':
+        return None
+    try:
+        numero = Decimal(str(valor).strip())
+    except InvalidOperation:
+        raise ValueError(f'Peso inválido: {valor!r}') from None
+    if not numero.is_finite() or not 0 <= numero < 10000:
+        raise ValueError('Peso fuera de rango')
+    return numero
+
+
+def _numero_serie(valor):
+    return _entero(valor, 1000, 'Número de serie') or 1
+
+
+def _esfuerzo(valor):
+    esfuerzo = int(valor)
+    if not 1 <= esfuerzo <= 10:
+        raise ValueError('nivel_esfuerzo debe estar entre 1 y 10')
+    return esfuerzo
+
+
+def _fecha(valor):
+    if not valor:
+        return timezone.now()
+    fecha = parse_datetime(valor)
+    if fecha is None:
+        raise ValueError('Fecha inválida (usar ISO 8601)')
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return fecha
@@ -0,0 +1,282 @@
+"""
+Signals que invalidan los fragmentos cacheados de los dashboards y los
+usuarios y favoritos de near_cache, que registran las lápidas (Eliminacion) para la
+sincronización incremental y mantienen al día los precálculos (analítica
+de progreso, volumen semanal) y la relación entrenador-cliente.
+"""
+import weakref
+
+from django.contrib.auth.models import User
+from django.db.models import Q, QuerySet
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import near_cache
+from .clientes_service import ClientesService
+from .dashboard_cache import bump_version, scope_usuario, SCOPE_ADMIN
+from .favorito_service import FavoritoService
+from .progreso_service import ProgresoService
+from .volumen_service import VolumenService, lunes
+from .models import (
+    PerfilUsuario, Ejercicio, Rutina, DetalleRutina, AjusteDetalle,
+    RegistroEntrenamiento, RegistroSerie, ProgresoFisico, Favorito, Eliminacion,
+    ClienteEntrenador,
+)
+
+
+def _scopes_entrenadores_de(*user_ids):
+    """Scopes de los entrenadores de los usuarios"""
+    entrenadores = ClienteEntrenador.objects.filter(
+        cliente_id__in=user_ids
+    ).order_by().values_list('entrenador_id', flat=True).distinct()
+    return [scope_usuario(entrenador_id) for entrenador_id in entrenadores]
+
+
+def _usuarios_borrados(origin):
+    """Ids (o subconsulta) de los usuarios cuyo borrado originó la cascada, o None"""
+    if isinstance(origin, User):
+        return [origin.pk]
+    if isinstance(origin, QuerySet) and origin.model is User:
+        return origin.values('pk')
+    return None
+
+
+def invalidar_dashboards_asignacion(entrenador_id, usuario_ids):
+    """Invalidación para rutinas creadas con bulk_create (sin post_save)"""
+    bump_version(
+        SCOPE_ADMIN,
+        scope_usuario(entrenador_id),
+        *[scope_usuario(user_id) for user_id in usuario_ids],
+        *_scopes_entrenadores_de(*usuario_ids),
+    )
+
+
+def _invalidar_rutina(rutina):
+    scopes = [SCOPE_ADMIN, scope_usuario(rutina.usuario_id)]
+    if rutina.entrenador_id:
+        scopes.append(scope_usuario(rutina.entrenador_id))
+    # El dashboard del entrenador muestra cuántas rutinas tiene cada cliente
+    scopes.extend(_scopes_entrenadores_de(rutina.usuario_id))
+    bump_version(*scopes)
+
+
+@receiver([post_save, post_delete], sender=Rutina)
+def invalidar_dashboards_rutina(sender, instance, **kwargs):
+    _invalidar_rutina(instance)
+
+
+@receiver(post_save, sender=Rutina)
+def vincular_cliente(sender, instance, created, **kwargs):
+    # AsignacionService usa bulk_create y vincula por su cuenta
+    if created and instance.entrenador_id:
+        ClientesService.vincular([(instance.entrenador_id, instance.usuario_id)])
+
+
+@receiver(post_delete, sender=Rutina)
+def desvincular_cliente(sender, instance, origin=None, **kwargs):
+    # Al borrar el usuario (cliente o entrenador) la relación se borra en cascada
+    if instance.entrenador_id and _usuarios_borrados(origin) is None:
+        ClientesService.desvincular_si_no_quedan(instance.entrenador_id, instance.usuario_id)
+
+
+# Origen del borrado de una plantilla -> ids de las rutinas que se materializaron
+_materializadas = weakref.WeakKeyDictionary()
+
+
+@receiver(pre_delete, sender=Rutina)
+def materializar_asignaciones(sender, instance, origin=None, **kwargs):
+    """Antes de borrar una plantilla, sus asignaciones pasan a tener ejercicios propios"""
+    asignaciones = Rutina.objects.filter(plantilla=instance)
+    # Las asignaciones que se borran en el mismo DELETE no se materializan:
+    # sus detalles nuevos quedarían apuntando a rutinas eliminadas
+    if isinstance(origin, QuerySet) and origin.model is Rutina:
+        asignaciones = asignaciones.exclude(id__in=origin.values('id'))
+    usuarios = _usuarios_borrados(origin)
+    if usuarios is not None:
+        asignaciones = asignaciones.exclude(usuario_id__in=usuarios)
+    materializadas = dict(asignaciones.values_list('id', 'usuario_id'))
+    if materializadas:
+        # En bloque (UPDATE sin post_save): se invalidan aquí sus dashboards
+        asignaciones.materializar()
+        bump_version(*[scope_usuario(user_id) for user_id in set(materializadas.values())])
+        if origin is not None:
+            # Sus ajustes ya se recolectaron para la cascada: lapida_ajuste no los repite
+            _materializadas.setdefault(origin, set()).update(materializadas)
+
+
+@receiver([post_save, post_delete], sender=DetalleRutina)
+def invalidar_dashboards_detalle(sender, instance, **kwargs):
+    try:
+        rutina = instance.rutina
+    except Rutina.DoesNotExist:
+        # Borrado en cascada junto con la rutina, que ya invalidó
+        return
+    scopes = [scope_usuario(rutina.usuario_id)]
+    if rutina.entrenador_id:
+        scopes.append(scope_usuario(rutina.entrenador_id))
+    # Las rutinas asignadas que usan esta como plantilla también cambian
+    asignados = Rutina.objects.filter(plantilla_id=rutina.id).values_list('usuario_id', flat=True)
+    scopes.extend(scope_usuario(user_id) for user_id in asignados)
+    bump_version(*scopes)
+
+
+@receiver([post_save, post_delete], sender=RegistroEntrenamiento)
+def invalidar_dashboards_entrenamiento(sender, instance, **kwargs):
+    bump_version(SCOPE_ADMIN, scope_usuario(instance.usuario_id))
+
+
+@receiver([post_save, post_delete], sender=ProgresoFisico)
+@receiver([post_save, post_delete], sender=Favorito)
+def invalidar_dashboard_usuario(sender, instance, **kwargs):
+    bump_version(scope_usuario(instance.usuario_id))
+
+
+@receiver([post_save, post_delete], sender=ProgresoFisico)
+def invalidar_analitica_progreso(sender, instance, **kwargs):
+    ProgresoService.invalidar(instance.usuario_id)
+
+
+@receiver([post_save, post_delete], sender=Favorito)
+def invalidar_favoritos(sender, instance, **kwargs):
+    FavoritoService.invalidar(instance.usuario_id)
+
+
+@receiver([post_save, post_delete], sender=Ejercicio)
+def invalidar_dashboard_admin(sender, instance, **kwargs):
+    bump_version(SCOPE_ADMIN)
+
+
+@receiver([post_save, post_delete], sender=PerfilUsuario)
+def invalidar_dashboards_perfil(sender, instance, **kwargs):
+    bump_version(SCOPE_ADMIN, scope_usuario(instance.user_id))
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidar_dashboards_user(sender, instance, update_fields=None, **kwargs):
+    # login() solo actualiza last_login, que no se muestra en los dashboards
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    bump_version(
+        SCOPE_ADMIN,
+        scope_usuario(instance.pk),
+        *_scopes_entrenadores_de(instance.pk),
+    )
+
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=PerfilUsuario)
+def invalidar_usuario_cacheado(sender, instance, **kwargs):
+    # Usuario + perfil que PerfilModelBackend guarda en near_cache
+    user_id = instance.pk if sender is User else instance.user_id
+    near_cache.usuarios.invalidar(grupo=str(user_id))
+
+
+# Columnas de cada registro que cambian su aporte al volumen semanal
+CAMPOS_VOLUMEN = {
+    RegistroEntrenamiento: ('usuario_id', 'fecha', 'rutina_id', 'clave_cliente'),
+    RegistroSerie: ('usuario_id', 'fecha', 'ejercicio_id', 'repeticiones', 'peso'),
+}
+
+# Registro editándose -> sus columnas de volumen antes del UPDATE (pre_save a post_save)
+_volumen_anterior = weakref.WeakKeyDictionary()
+
+# Origen de un borrado en cascada -> (usuario_id, semana) ya recalculados
+_semanas_recalculadas = weakref.WeakKeyDictionary()
+
+
+def _semana(fecha):
+    return lunes(timezone.localtime(fecha).date())
+
+
+def _toca_volumen(sender, update_fields):
+    if update_fields is None:
+        return True
+    campos = CAMPOS_VOLUMEN[sender]
+    return bool(set(update_fields) & {*campos, *(c.removesuffix('_id') for c in campos)})
+
+
+@receiver(pre_save, sender=RegistroEntrenamiento)
+@receiver(pre_save, sender=RegistroSerie)
+def recordar_volumen(sender, instance, update_fields=None, **kwargs):
+    if instance.pk is None or not _toca_volumen(sender, update_fields):
+        return
+    anterior = sender.objects.filter(pk=instance.pk).values_list(*CAMPOS_VOLUMEN[sender]).first()
+    if anterior is not None:
+        _volumen_anterior[instance] = anterior
+
+
+@receiver(post_save, sender=RegistroEntrenamiento)
+@receiver(post_save, sender=RegistroSerie)
+def acumular_volumen(sender, instance, created, **kwargs):
+    if created:
+        clave = 'series' if sender is RegistroSerie else 'sesiones'
+        VolumenService.acumular(**{clave: sender.objects.filter(pk=instance.pk)})
+        return
+
+    anterior = _volumen_anterior.pop(instance, None)
+    actual = tuple(getattr(instance, campo) for campo in CAMPOS_VOLUMEN[sender])
+    if anterior is None or anterior == actual:
+        # Nada que cambie el volumen (notas, duración, ...)
+        return
+    # Solo se rehacen la semana de antes y la de ahora (pueden ser la misma)
+    usuario_id, fecha = anterior[:2]
+    for usuario_id, semana in {(usuario_id, _semana(fecha)), (instance.usuario_id, _semana(instance.fecha))}:
+        VolumenService.recalcular([usuario_id], semana)
+
+
+@receiver(post_delete, sender=RegistroEntrenamiento)
+@receiver(post_delete, sender=RegistroSerie)
+def descontar_volumen(sender, instance, origin=None, **kwargs):
+    # Al borrar el usuario su VolumenSemanal se borra en cascada
+    if _usuarios_borrados(origin) is not None:
+        return
+    pendiente = (instance.usuario_id, _semana(instance.fecha))
+    if origin is None:
+        VolumenService.recalcular([pendiente[0]], pendiente[1])
+        return
+    # Un borrado en cascada (p. ej. una rutina) rehace cada semana una sola vez
+    recalculadas = _semanas_recalculadas.setdefault(origin, set())
+    if pendiente not in recalculadas:
+        recalculadas.add(pendiente)
+        VolumenService.recalcular([pendiente[0]], pendiente[1])
+
+
+@receiver(post_delete, sender=Rutina)
+def lapida_rutina(sender, instance, **kwargs):
+    Eliminacion.objects.create(usuario_id=instance.usuario_id, modelo='rutina', objeto_id=instance.pk)
+
+
+@receiver(post_delete, sender=DetalleRutina)
+def lapida_detalle(sender, instance, **kwargs):
+    # Los clientes con la rutina asignada (plantilla) también tienen el detalle
+    usuarios = set(
+        Rutina.objects.filter(Q(id=instance.rutina_id) | Q(plantilla_id=instance.rutina_id))
+        .values_list('usuario_id', flat=True)
+    )
+    Eliminacion.objects.bulk_create([
+        Eliminacion(usuario_id=user_id, modelo='detalle', objeto_id=instance.pk)
+        for user_id in usuarios
+    ])
+
+
+@receiver(post_delete, sender=AjusteDetalle)
+def lapida_ajuste(sender, instance, origin=None, **kwargs):
+    if origin is not None and instance.rutina_id in _materializadas.get(origin, ()):
+        # Rutina.materializar ya creó su lápida
+        return
+    usuario_id = Rutina.objects.filter(id=instance.rutina_id).values_list('usuario_id', flat=True).first()
+    if usuario_id is not None:
+        Eliminacion.objects.create(usuario_id=usuario_id, modelo='ajuste', objeto_id=instance.pk)
+
+
+@receiver(post_delete, sender=RegistroEntrenamiento)
+@receiver(post_delete, sender=ProgresoFisico)
+@receiver(post_delete, sender=Favorito)
+def lapida_usuario(sender, instance, **kwargs):
+    modelo = {
+        RegistroEntrenamiento: 'entrenamiento',
+        ProgresoFisico: 'progreso',
+        Favorito: 'favorito',
+    }[sender]
+    Eliminacion.objects.create(usuario_id=instance.usuario_id, modelo=modelo, objeto_id=instance.pk)
@@ -0,0 +1,58 @@
+"""
+Almacenamiento de estáticos para producción.
+
+collectstatic escribe cada archivo con un hash de su contenido en el nombre
+(style.3f2a9c.css) y el manifiesto staticfiles.json; {% static %} entrega
+siempre el nombre con hash, así los navegadores pueden guardarlos para
+siempre (ver ArchivosEstaticosMiddleware). Además deja junto a los archivos
+de texto sus versiones precomprimidas .gz y .br para no comprimir en cada
+request.
+"""
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # Opcional: sin él solo se generan los .gz
+    brotli = None
+
+# Los GIF, PNG y JPG ya vienen comprimidos
+EXTENSIONES_TEXTO = ('.css', '.js', '.json', '.svg', '.txt', '.html', '.xml', '.map', '.ico')
+
+# Si la versión comprimida no ahorra al menos esto no se guarda
+AHORRO_MINIMO = 0.05
+
+
+class ManifestComprimidoStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage que además guarda variantes .gz y .br"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        for nombre in paths:
+            if not nombre.lower().endswith(EXTENSIONES_TEXTO):
+                continue
+            # El original y su versión con hash (la que entrega {% static %})
+            for destino in {nombre, self.stored_name(nombre)}:
+                self._comprimir(destino)
+
+    def _comprimir(self, nombre):
+        ruta = self.path(nombre)
+        with open(ruta, 'rb') as f:
+            datos = f.read()
+        limite = len(datos) * (1 - AHORRO_MINIMO)
+
+        # mtime=0: el .gz no cambia si el archivo no cambió
+        variantes = {'.gz': gzip.compress(datos, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variantes['.br'] = brotli.compress(datos, quality=11)
+        for extension, comprimido in variantes.items():
+            if len(comprimido) < limite:
+                with open(ruta + extension, 'wb') as f:
+                    f.write(comprimido)
+            elif os.path.exists(ruta + extension):
+                os.remove(ruta + extension)
@@ -0,0 +1,135 @@
+"""
+Sincronización incremental para clientes sin conexión (API de sync).
+"""
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils import timezone
+
+from .models import (
+    Rutina, DetalleRutina, AjusteDetalle, RegistroEntrenamiento,
+    ProgresoFisico, Favorito, Eliminacion,
+)
+
+
+class SyncService:
+    """
+    Cambios de un usuario desde una marca de tiempo dada por el cliente.
+
+    Cada tabla se filtra por su columna indexada de modificación
+    (fecha_modificacion, o fecha en Favorito) y los borrados llegan como
+    lápidas (Eliminacion). El cliente guarda la `marca` de la respuesta y la
+    envía como `desde` en la siguiente llamada; sin `desde` recibe todo.
+    """
+    # La marca devuelta retrocede un poco para no perder filas de
+    # transacciones que confirmaron después de la lectura con una fecha
+    # anterior. Esas filas pueden llegar dos veces: el cliente aplica por id.
+    MARGEN = timedelta(seconds=5)
+
+    CAMPOS_RUTINA = (
+        'id', 'nombre', 'descripcion', 'entrenador_id', 'plantilla_id', 'dificultad',
+        'duracion_min', 'objetivo', 'es_publica', 'activa', 'fecha_modificacion',
+    )
+    CAMPOS_DETALLE = (
+        'id', 'rutina_id', 'ejercicio__ejercicio_id', 'orden', 'series',
+        'repeticiones', 'peso', 'descanso_seg', 'notas',
+    )
+    CAMPOS_AJUSTE = ('id', 'rutina_id', 'detalle_id', 'peso', 'sin_peso', 'notas')
+    CAMPOS_ENTRENAMIENTO = (
+        'id', 'rutina_id', 'fecha', 'duracion_min', 'calorias',
+        'nivel_esfuerzo', 'notas', 'completado', 'clave_cliente',
+    )
+    CAMPOS_PROGRESO = (
+        'id', 'fecha', 'peso', 'grasa_corporal', 'masa_muscular',
+        'cintura', 'pecho', 'brazos', 'piernas', 'notas',
+    )
+    CAMPOS_FAVORITO = ('id', 'ejercicio__ejercicio_id', 'rutina_id', 'fecha')
+
+    @staticmethod
+    def parse_marca(valor):
+        """Marca `desde` en ISO 8601 (None si no viene)"""
+        if not valor:
+            return None
+        marca = parse_datetime(valor)
+        if marca is None:
+            raise ValueError("'desde' inválido (usar ISO 8601)")
+        if timezone.is_naive(marca):
+            marca = timezone.make_aware(marca)
+        return marca
+
+    @staticmethod
+    def cambios(usuario, desde=None):
+        """
+        Retorna {'marca', 'completo', 'rutinas', 'detalles', 'ajustes',
+        'entrenamientos', 'progreso', 'favoritos', 'eliminados'} con las
+        filas creadas o modificadas después de `desde`.
+        """
+        # La marca se toma antes de leer: lo que cambie durante la lectura
+        # vuelve a llegar en la próxima sincronización
+        marca = timezone.now() - SyncService.MARGEN
+
+        def cambiados(queryset, campo='fecha_modificacion'):
+            if desde is not None:
+                queryset = queryset.filter(**{f'{campo}__gt': desde})
+            return queryset
+
+        rutinas_usuario = Rutina.objects.filter(usuario=usuario)
+        rutinas = _filas(cambiados(rutinas_usuario), SyncService.CAMPOS_RUTINA)
+
+        # Las rutinas asignadas sin materializar usan los detalles de la
+        # plantilla, así que los cambios del entrenador también se envían
+        ids_rutina = set()
+        for rutina_id, plantilla_id in rutinas_usuario.values_list('id', 'plantilla_id'):
+            ids_rutina.add(rutina_id)
+            if plantilla_id:
+                ids_rutina.add(plantilla_id)
+        detalles = Q(rutina_id__in=ids_rutina)
+        if desde is not None:
+            detalles &= Q(fecha_modificacion__gt=desde)
+            # Una plantilla recién asignada llega completa aunque no haya cambiado
+            indice = SyncService.CAMPOS_RUTINA.index('plantilla_id')
+            plantillas_nuevas = {fila[indice] for fila in rutinas['filas'] if fila[indice]}
+            if plantillas_nuevas:
+                detalles |= Q(rutina_id__in=plantillas_nuevas)
+
+        resultado = {
+            'marca': marca.isoformat(),
+            'completo': desde is None,
+            'rutinas': rutinas,
+            'detalles': _filas(DetalleRutina.objects.filter(detalles), SyncService.CAMPOS_DETALLE),
+            'ajustes': _filas(
+                cambiados(AjusteDetalle.objects.filter(rutina__usuario=usuario)),
+                SyncService.CAMPOS_AJUSTE,
+            ),
+            'entrenamientos': _filas(
+                cambiados(RegistroEntrenamiento.objects.filter(usuario=usuario)),
+                SyncService.CAMPOS_ENTRENAMIENTO,
+            ),
+            'progreso': _filas(
+                cambiados(ProgresoFisico.objects.filter(usuario=usuario)),
+                SyncService.CAMPOS_PROGRESO,
+            ),
+            'favoritos': _filas(
+                cambiados(Favorito.objects.filter(usuario=usuario), 'fecha'),
+                SyncService.CAMPOS_FAVORITO,
+            ),
+            'eliminados': {},
+        }
+
+        if desde is not None:
+            eliminados = Eliminacion.objects.filter(
+                usuario_id=usuario.id, fecha__gt=desde
+            ).values_list('modelo', 'objeto_id')
+            for modelo, objeto_id in eliminados:
+                resultado['eliminados'].setdefault(modelo, []).append(objeto_id)
+
+        return resultado
+
+
+def _filas(queryset, campos):
+    """Payload compacto: nombres de columna una vez y filas como listas"""
+    return {
+        'campos': [campo.replace('ejercicio__', '') for campo in campos],
+        'filas': list(queryset.order_by().values_list(*campos)),
+    }
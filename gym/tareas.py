@@ -0,0 +1,57 @@
+"""
+Tipos de tarea que ejecuta run_worker (se registran al importar el módulo,
+ver GymConfig.ready).
+"""
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import EmailMultiAlternatives
+from django.template import loader
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from . import near_cache
+from .cola_service import ColaService
+from .exercisedb_service import ExerciseDBService
+
+
+@ColaService.tarea('enviar_correo')
+def enviar_correo(asunto, cuerpo, destinatarios, remitente=None, html=None):
+    """Envía un correo (p. ej. el de recuperación de contraseña)"""
+    correo = EmailMultiAlternatives(asunto, cuerpo, remitente, destinatarios)
+    if html:
+        correo.attach_alternative(html, 'text/html')
+    correo.send()
+
+
+@ColaService.tarea('correo_recuperacion')
+def correo_recuperacion(user_id, email, dominio, sitio, protocolo, plantillas, remitente=None):
+    """
+    Correo de recuperación de contraseña (ver RecuperarPasswordForm). El
+    token se genera aquí, al enviarlo, para no guardarlo en Tarea.argumentos.
+    """
+    user = User.objects.filter(pk=user_id, is_active=True).first()
+    if user is None or not user.has_usable_password():
+        return
+    plantilla_asunto, plantilla_cuerpo, plantilla_html = plantillas
+    context = {
+        'email': email,
+        'domain': dominio,
+        'site_name': sitio,
+        'uid': urlsafe_base64_encode(force_bytes(user.pk)),
+        'user': user,
+        'token': default_token_generator.make_token(user),
+        'protocol': protocolo,
+    }
+    # Mismo armado que PasswordResetForm.send_mail
+    asunto = ''.join(loader.render_to_string(plantilla_asunto, context).splitlines())
+    html = loader.render_to_string(plantilla_html, context) if plantilla_html else None
+    enviar_correo(asunto, loader.render_to_string(plantilla_cuerpo, context), [email], remitente, html)
+
+
+@ColaService.tarea('refrescar_catalogo')
+def refrescar_catalogo(limit):
+    """Descarga el catálogo de ExerciseDB y lo deja en la caché compartida"""
+    ExerciseDBService.get_all_exercises(limit=limit)
+    if not near_cache.catalogo.get(f'exercisedb_all_{limit}'):
+        # La API falló y se devolvió el respaldo: la cola reintenta más tarde
+        raise RuntimeError(f'ExerciseDB no devolvió el catálogo (limit={limit})')
@@ -0,0 +1,34 @@
+"""
+Tarjetas de ejercicio pre-renderizadas.
+
+Las listas de ejercicios (ejercicios.html, agregar_ejercicio.html) muestran
+hasta cientos de tarjetas que solo cambian cuando cambia el catálogo. Cada
+tarjeta se renderiza una vez y se guarda en near_cache.catalogo, así
+ExerciseDBService.invalidar_catalogo() también descarta las tarjetas. Lo
+que depende del usuario o del request (favorito, enlace a la rutina) no va
+en la tarjeta: lo agrega la plantilla de la lista alrededor del fragmento.
+"""
+from django.template import loader
+from django.utils.safestring import mark_safe
+
+from . import near_cache
+
+TARJETA_EJERCICIO = 'gym/tarjeta_ejercicio.html'
+TARJETA_AGREGAR = 'gym/tarjeta_agregar_ejercicio.html'
+
+
+def renderizar(plantilla, ejercicios):
+    """[(ejercicio, html)] en el orden de `ejercicios`; solo se renderizan las que faltan"""
+    claves = [f'tarjeta:{plantilla}:{ej["id"]}' for ej in ejercicios]
+    tarjetas = near_cache.catalogo.get_many(claves)
+
+    faltan = {}
+    if len(tarjetas) < len(claves):
+        template = loader.get_template(plantilla)
+        for clave, ej in zip(claves, ejercicios):
+            if clave not in tarjetas and clave not in faltan:
+                faltan[clave] = template.render({'ej': ej})
+        near_cache.catalogo.set_many(faltan)
+        tarjetas.update(faltan)
+
+    return [(ej, mark_safe(tarjetas[clave])) for clave, ej in zip(claves, ejercicios)]
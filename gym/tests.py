@@ -1,3 +1,865 @@
-from django.test import TestCase
+import json
+import os
+import pickle
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, OperationalError, connection, connections
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import db_router, near_cache
+from .asignacion_service import AsignacionService
+from .backends import PerfilModelBackend
+from .clientes_service import ClientesService
+from .cola_service import ColaService
+from .db_router import usa_replica
+from .exercisedb_service import ExerciseDBService
+from .favorito_service import FavoritoService
+from .middleware import ArchivosEstaticosMiddleware
+from .models import (
+    AjusteDetalle, ClienteEntrenador, DetalleRutina, Ejercicio, Eliminacion, Favorito, PerfilUsuario, RegistroEntrenamiento,
+    RegistroSerie, Rutina, Tarea, VolumenSemanal,
+)
+from .registro_service import LoteInvalido, RegistroService
+from .sync_service import SyncService
+from .volumen_service import VolumenService, lunes
+
+# Caché en memoria: los tests no tocan la caché en archivos del proyecto
+CACHE_PRUEBAS = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# Las páginas se renderizan sin haber corrido collectstatic (sin manifest)
+ESTATICOS_PRUEBAS = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+def crear_usuario(username, tipo='usuario'):
+    user = User.objects.create_user(username, password='gymflow123')
+    PerfilUsuario.objects.filter(user=user).update(tipo_usuario=tipo)
+    return user
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class GymTestCase(TestCase):
+    """TestCase con la caché compartida y los near_cache vacíos en cada test"""
+
+    def setUp(self):
+        cache.clear()
+        for instancia in near_cache._instancias.values():
+            instancia.limpiar_local()
+
+
+class RutinaAsignadaTests(GymTestCase):
+    """Rutinas asignadas copy-on-write (plantilla + ajustes)"""
+
+    def setUp(self):
+        super().setUp()
+        self.entrenador = crear_usuario('entrenador', 'entrenador')
+        self.cliente = crear_usuario('cliente')
+        self.plantilla = Rutina.objects.create(nombre='Fuerza', usuario=self.entrenador)
+        self.detalles = [
+            DetalleRutina.objects.create(
+                rutina=self.plantilla,
+                ejercicio=Ejercicio.objects.create(ejercicio_id=f'e{i}', nombre=f'Ejercicio {i}'),
+                orden=i, peso=Decimal('20'),
+            )
+            for i in range(3)
+        ]
+        AsignacionService.asignar_rutina(self.plantilla, self.entrenador, [self.cliente])
+        self.asignada = Rutina.objects.get(usuario=self.cliente)
+
+    def test_asignar_no_copia_los_ejercicios(self):
+        self.assertEqual(self.asignada.plantilla_id, self.plantilla.id)
+        self.assertEqual(self.asignada.entrenador_id, self.entrenador.id)
+        self.assertFalse(self.asignada.detalles.exists())
+        self.assertEqual(self.asignada.total_ejercicios(), 3)
+        self.assertEqual(Rutina.objects.con_num_ejercicios().get(id=self.asignada.id).num_ejercicios, 3)
+
+    def test_ajustes_y_cambios_de_la_plantilla(self):
+        AjusteDetalle.objects.create(rutina=self.asignada, detalle=self.detalles[0], peso=Decimal('35'))
+        DetalleRutina.objects.create(
+            rutina=self.plantilla, ejercicio=Ejercicio.objects.create(ejercicio_id='e9', nombre='Nuevo'), orden=9,
+        )
+        efectivos = {d.id: d for d in self.asignada.detalles_efectivos()}
+        self.assertEqual(len(efectivos), 4)
+        self.assertEqual(efectivos[self.detalles[0].id].peso, Decimal('35'))
+        self.assertEqual(efectivos[self.detalles[1].id].peso, Decimal('20'))
+        # El ajuste es del cliente: la plantilla no cambia
+        self.detalles[0].refresh_from_db()
+        self.assertEqual(self.detalles[0].peso, Decimal('20'))
+
+    def test_borrar_la_plantilla_materializa_con_ajustes(self):
+        AjusteDetalle.objects.create(rutina=self.asignada, detalle=self.detalles[0], peso=Decimal('35'))
+        self.plantilla.delete()
+
+        self.asignada.refresh_from_db()
+        self.assertIsNone(self.asignada.plantilla_id)
+        propios = list(self.asignada.detalles.order_by('orden'))
+        self.assertEqual(len(propios), 3)
+        self.assertEqual(propios[0].peso, Decimal('35'))
+        self.assertFalse(AjusteDetalle.objects.exists())
+
+    def test_borrar_una_plantilla_muy_asignada_cuesta_lo_mismo(self):
+        clientes = [crear_usuario(f'cliente{i}') for i in range(30)]
+        AsignacionService.asignar_rutina(self.plantilla, self.entrenador, clientes)
+        asignadas = list(Rutina.objects.filter(usuario__in=clientes))
+        AjusteDetalle.objects.bulk_create([
+            AjusteDetalle(rutina=rutina, detalle=self.detalles[1], peso=Decimal('40')) for rutina in asignadas
+        ])
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.plantilla.delete()
+        # Las consultas no dependen de cuántos clientes tenga asignada la plantilla
+        self.assertLess(len(consultas), 40)
+        self.assertEqual(DetalleRutina.objects.filter(rutina__in=asignadas).count(), 3 * len(asignadas))
+        self.assertEqual(
+            DetalleRutina.objects.filter(rutina__in=asignadas, peso=Decimal('40')).count(), len(asignadas),
+        )
+        self.assertFalse(Rutina.objects.filter(plantilla__isnull=False).exists())
+        self.assertEqual(
+            Eliminacion.objects.filter(modelo='ajuste', usuario_id__in=[c.id for c in clientes]).count(),
+            len(asignadas),
+        )
+
+    def ajustar(self, **pesos):
+        datos = {f'peso_{detalle.id}': '20' for detalle in self.detalles}
+        datos.update({f'peso_{self.detalles[int(i[1:])].id}': peso for i, peso in pesos.items()})
+        self.client.force_login(self.entrenador)
+        return self.client.post(f'/rutinas/{self.asignada.id}/ajustes/', datos)
+
+    def test_ajustar_peso_invalido_no_guarda(self):
+        for peso in ('abc', 'NaN', 'Infinity', '-5', '1e9'):
+            response = self.ajustar(d0=peso)
+            self.assertRedirects(response, f'/rutinas/{self.asignada.id}/ajustes/', fetch_redirect_response=False)
+        self.assertFalse(AjusteDetalle.objects.exists())
+
+    def test_ajustar_puede_quitar_el_peso_de_la_plantilla(self):
+        self.ajustar(d0='', d1='30')
+        efectivos = self.asignada.detalles_efectivos()
+        self.assertEqual([d.peso for d in efectivos], [None, Decimal('30'), Decimal('20')])
+        self.assertEqual(AjusteDetalle.objects.count(), 2)
+
+        # Al materializar se conserva el peso quitado
+        self.plantilla.delete()
+        self.assertEqual(
+            list(self.asignada.detalles.order_by('orden').values_list('peso', flat=True)),
+            [None, Decimal('30'), Decimal('20')],
+        )
+
+    def test_borrar_junto_con_la_plantilla_no_materializa(self):
+        Rutina.objects.filter(id__in=[self.plantilla.id, self.asignada.id]).delete()
+        self.assertFalse(DetalleRutina.objects.exists())
+
+
+class RegistroLoteTests(GymTestCase):
+    """Registro por lotes idempotente (api/entrenamientos/lote/)"""
+
+    def setUp(self):
+        super().setUp()
+        self.usuario = crear_usuario('miembro')
+        self.rutina = Rutina.objects.create(nombre='Pierna', usuario=self.usuario)
+        Ejercicio.objects.create(ejercicio_id='sentadilla', nombre='Sentadilla', partes_cuerpo='Piernas')
+        self.lote = {
+            'sesiones': [{'clave': 's1', 'rutina_id': self.rutina.id, 'fecha': '2026-03-02T10:00:00'}],
+            'series': [
+                {'clave': f'r{i}', 'sesion': 's1', 'ejercicio_id': 'sentadilla', 'repeticiones': 10,
+                 'peso': 50, 'numero': i, 'fecha': '2026-03-02T10:05:00'}
+                for i in range(1, 4)
+            ],
+        }
+
+    def test_reintento_no_duplica(self):
+        primero = RegistroService.registrar_lote(self.usuario, self.lote)
+        segundo = RegistroService.registrar_lote(self.usuario, self.lote)
+
+        self.assertEqual(primero['sesiones'], {'creadas': 1, 'duplicadas': 0})
+        self.assertEqual(primero['series'], {'creadas': 3, 'duplicadas': 0})
+        self.assertEqual(segundo['sesiones'], {'creadas': 0, 'duplicadas': 1})
+        self.assertEqual(segundo['series'], {'creadas': 0, 'duplicadas': 3})
+        self.assertEqual(RegistroEntrenamiento.objects.count(), 1)
+        sesion = RegistroEntrenamiento.objects.get()
+        self.assertEqual(RegistroSerie.objects.filter(entrenamiento=sesion).count(), 3)
+
+    def test_el_volumen_se_suma_una_vez(self):
+        RegistroService.registrar_lote(self.usuario, self.lote)
+        RegistroService.registrar_lote(self.usuario, self.lote)
+        volumen = VolumenSemanal.objects.get(usuario=self.usuario)
+        self.assertEqual(volumen.series, 3)
+        self.assertEqual(volumen.tonelaje, Decimal('1500'))
+
+    def test_rechaza_elementos_invalidos_sin_perder_el_resto(self):
+        self.lote['series'].append({'clave': 'x1', 'ejercicio_id': 'no-existe', 'repeticiones': 5})
+        self.lote['series'].append({'clave': 'x2', 'ejercicio_id': 'sentadilla', 'repeticiones': -1})
+        self.lote['sesiones'].append({'clave': 's2', 'rutina_id': 999999})
+
+        resultado = RegistroService.registrar_lote(self.usuario, self.lote)
+
+        self.assertEqual(resultado['series']['creadas'], 3)
+        self.assertEqual(sorted(r['clave'] for r in resultado['rechazadas']), ['s2', 'x1', 'x2'])
+
+    def test_enteros_fuera_de_rango_se_rechazan_por_elemento(self):
+        base = {'rutina_id': self.rutina.id, 'fecha': '2026-03-02T10:00:00'}
+        self.lote['sesiones'] += [
+            {**base, 'clave': 's2', 'calorias': 10 ** 20},
+            {**base, 'clave': 's3', 'duracion_min': -30},
+            {**base, 'clave': 's4', 'calorias': float('inf')},
+        ]
+        self.lote['series'].append({'clave': 'x1', 'ejercicio_id': 'sentadilla', 'repeticiones': 2 ** 40})
+
+        resultado = RegistroService.registrar_lote(self.usuario, self.lote)
+
+        self.assertEqual(resultado['sesiones']['creadas'], 1)
+        self.assertEqual(resultado['series']['creadas'], 3)
+        self.assertEqual(sorted(r['clave'] for r in resultado['rechazadas']), ['s2', 's3', 's4', 'x1'])
+
+    def test_lote_invalido(self):
+        with self.assertRaises(LoteInvalido):
+            RegistroService.registrar_lote(self.usuario, {'series': 'no es lista'})
+        with self.assertRaises(LoteInvalido):
+            RegistroService.registrar_lote(
+                self.usuario, {'series': [{}] * (RegistroService.MAX_SERIES + 1)}
+            )
+
+    def test_api(self):
+        self.client.force_login(self.usuario)
+        respuesta = self.client.post('/api/entrenamientos/lote/', json.dumps(self.lote), content_type='application/json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['series']['creadas'], 3)
+        respuesta = self.client.post('/api/entrenamientos/lote/', '{', content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class SyncTests(GymTestCase):
+    """Sincronización incremental: marca de agua y lápidas"""
+
+    def setUp(self):
+        super().setUp()
+        self.usuario = crear_usuario('miembro')
+        self.rutina = Rutina.objects.create(nombre='Torso', usuario=self.usuario)
+        self.ejercicio = Ejercicio.objects.create(ejercicio_id='press', nombre='Press')
+
+    def ids(self, tabla):
+        campos = tabla['campos']
+        return {dict(zip(campos, fila))['id'] for fila in tabla['filas']}
+
+    def test_sin_desde_llega_todo(self):
+        cambios = SyncService.cambios(self.usuario)
+        self.assertTrue(cambios['completo'])
+        self.assertEqual(self.ids(cambios['rutinas']), {self.rutina.id})
+        self.assertLess(SyncService.parse_marca(cambios['marca']), timezone.now() - SyncService.MARGEN / 2)
+
+    def test_desde_solo_trae_lo_modificado(self):
+        desde = timezone.now()
+        otra = Rutina.objects.create(nombre='Pierna', usuario=self.usuario)
+        cambios = SyncService.cambios(self.usuario, desde)
+        self.assertFalse(cambios['completo'])
+        self.assertEqual(self.ids(cambios['rutinas']), {otra.id})
+
+    def test_borrados_llegan_como_lapidas(self):
+        entrenamiento = RegistroEntrenamiento.objects.create(usuario=self.usuario, rutina=self.rutina)
+        favorito = Favorito.objects.create(usuario=self.usuario, ejercicio=self.ejercicio)
+        ids = {'favorito': [favorito.id], 'entrenamiento': [entrenamiento.id], 'rutina': [self.rutina.id]}
+        desde = timezone.now()
+        favorito.delete()
+        self.rutina.delete()  # Borra el entrenamiento en cascada
+
+        self.assertEqual(SyncService.cambios(self.usuario, desde)['eliminados'], ids)
+
+    def test_detalles_de_la_plantilla_asignada(self):
+        entrenador = crear_usuario('entrenador', 'entrenador')
+        plantilla = Rutina.objects.create(nombre='Base', usuario=entrenador)
+        detalle = DetalleRutina.objects.create(rutina=plantilla, ejercicio=self.ejercicio)
+        desde = timezone.now()
+        AsignacionService.asignar_rutina(plantilla, entrenador, [self.usuario])
+
+        # Recién asignada llega completa aunque la plantilla no haya cambiado
+        cambios = SyncService.cambios(self.usuario, desde)
+        self.assertEqual(self.ids(cambios['detalles']), {detalle.id})
+
+        # Un detalle que el entrenador borra llega como lápida al cliente
+        detalle_id = detalle.id
+        desde = timezone.now()
+        detalle.delete()
+        self.assertEqual(SyncService.cambios(self.usuario, desde)['eliminados'], {'detalle': [detalle_id]})
+
+    def test_borrar_la_plantilla_reemplaza_sus_detalles(self):
+        entrenador = crear_usuario('entrenador', 'entrenador')
+        plantilla = Rutina.objects.create(nombre='Base', usuario=entrenador)
+        detalles = {
+            DetalleRutina.objects.create(rutina=plantilla, ejercicio=self.ejercicio, orden=orden).id
+            for orden in (1, 2)
+        }
+        (asignada,), _ = AsignacionService.asignar_rutina(plantilla, entrenador, [self.usuario])
+        desde = timezone.now()
+        plantilla.delete()
+
+        cambios = SyncService.cambios(self.usuario, desde)
+        self.assertEqual(set(cambios['eliminados']['detalle']), detalles)
+        copias = DetalleRutina.objects.filter(rutina=asignada).values_list('id', flat=True)
+        self.assertEqual(len(copias), 2)
+        self.assertEqual(self.ids(cambios['detalles']), set(copias))
+        self.assertIn(asignada.id, self.ids(cambios['rutinas']))
+
+
+class VolumenSemanalTests(GymTestCase):
+    """El precálculo sigue a las ediciones y borrados de series y sesiones"""
+
+    def setUp(self):
+        super().setUp()
+        self.usuario = crear_usuario('miembro')
+        self.rutina = Rutina.objects.create(nombre='Pierna', usuario=self.usuario)
+        self.ejercicio = Ejercicio.objects.create(ejercicio_id='sentadilla', nombre='Sentadilla', partes_cuerpo='Piernas')
+        self.lunes = timezone.make_aware(datetime(2026, 3, 2, 10))
+        self.serie = RegistroSerie.objects.create(
+            usuario=self.usuario, ejercicio=self.ejercicio, repeticiones=10, peso=Decimal('50'),
+            fecha=self.lunes, clave_cliente='a',
+        )
+
+    def volumen(self):
+        return dict(VolumenSemanal.objects.filter(usuario=self.usuario).values_list('semana', 'tonelaje'))
+
+    def test_editar_sin_cambiar_volumen_no_recalcula(self):
+        with mock.patch.object(VolumenService, 'recalcular') as recalcular:
+            self.serie.numero = 2
+            self.serie.save()
+            self.serie.save(update_fields=['numero'])
+        recalcular.assert_not_called()
+
+    def test_cambiar_de_semana_rehace_solo_ambas_semanas(self):
+        self.serie.fecha = self.lunes + timedelta(weeks=1)
+        with mock.patch.object(VolumenService, 'recalcular', wraps=VolumenService.recalcular) as recalcular:
+            self.serie.save()
+        self.assertEqual(recalcular.call_count, 2)
+        self.assertTrue(all(llamada.args[1] is not None for llamada in recalcular.call_args_list))
+        self.assertEqual(self.volumen(), {self.serie.fecha.date(): Decimal('500')})
+
+    def test_cambiar_el_peso(self):
+        self.serie.peso = Decimal('60')
+        self.serie.save(update_fields=['peso'])
+        self.assertEqual(self.volumen(), {self.lunes.date(): Decimal('600')})
+
+    def test_borrado_en_cascada_rehace_cada_semana_una_vez(self):
+        DetalleRutina.objects.create(rutina=self.rutina, ejercicio=self.ejercicio, series=3, repeticiones=10, peso=Decimal('20'))
+        for dia in range(3):
+            RegistroEntrenamiento.objects.create(
+                usuario=self.usuario, rutina=self.rutina, fecha=self.lunes + timedelta(days=dia),
+            )
+        self.assertEqual(self.volumen(), {self.lunes.date(): Decimal('2300')})
+
+        with mock.patch.object(VolumenService, 'recalcular', wraps=VolumenService.recalcular) as recalcular:
+            self.rutina.delete()
+        recalcular.assert_called_once()
+        self.assertEqual(self.volumen(), {self.lunes.date(): Decimal('500')})
+
+
+@mock.patch.object(ExerciseDBService, 'USE_FALLBACK_ONLY', False)
+class CatalogoZonaTests(GymTestCase):
+    """La lista de una zona solo se cachea si el catálogo vino de la API"""
+
+    def test_respaldo_tras_error_no_se_cachea(self):
+        with mock.patch('gym.exercisedb_service.requests.get', side_effect=OSError('sin red')):
+            ejercicios = ExerciseDBService.get_exercises_by_zone('pecho', limit=100)
+        self.assertTrue(ejercicios)
+        self.assertIsNone(near_cache.catalogo.get('exercisedb_zona_pecho_100'))
+
+    def test_catalogo_de_la_api_se_cachea(self):
+        catalogo = ExerciseDBService.get_fallback_exercises()[:100]
+        near_cache.catalogo.set('exercisedb_all_100', catalogo, 60)
+        ejercicios = ExerciseDBService.get_exercises_by_zone('pecho', limit=100)
+        self.assertEqual(ejercicios, ExerciseDBService.filtrar_por_zona(catalogo, 'pecho'))
+        self.assertEqual(near_cache.catalogo.get('exercisedb_zona_pecho_100'), ejercicios)
+
+    def test_async_respaldo_tras_error_no_se_cachea(self):
+        with mock.patch('gym.exercisedb_service._cliente_async', side_effect=OSError('sin red')):
+            ejercicios = async_to_sync(ExerciseDBService.aget_exercises_by_zone)('pecho', limit=100)
+        self.assertTrue(ejercicios)
+        self.assertIsNone(near_cache.catalogo.get('exercisedb_zona_pecho_100'))
+
+    def test_async_sin_esperar_no_cachea_el_respaldo(self):
+        with mock.patch.object(ExerciseDBService, 'encolar_refresco') as encolar:
+            async_to_sync(ExerciseDBService.aget_exercises_by_zone)('pecho', limit=100, esperar=False)
+        encolar.assert_called_once_with(100)
+        self.assertIsNone(near_cache.catalogo.get('exercisedb_zona_pecho_100'))
+
+    def test_async_catalogo_de_la_api_se_cachea(self):
+        catalogo = ExerciseDBService.get_fallback_exercises()[:100]
+        near_cache.catalogo.set('exercisedb_all_100', catalogo, 60)
+        ejercicios = async_to_sync(ExerciseDBService.aget_exercises_by_zone)('pecho', limit=100, esperar=False)
+        self.assertEqual(near_cache.catalogo.get('exercisedb_zona_pecho_100'), ejercicios)
+
+
+class NearCacheTests(GymTestCase):
+    """Invalidaciones del near cache y usuario cacheado sin contraseña"""
+
+    def test_invalidar_durante_el_calculo_descarta_el_valor(self):
+        def calcular():
+            near_cache.favoritos.invalidar(grupo='1')
+            return 'viejo'
+
+        self.assertEqual(near_cache.favoritos.get_or_set('ids', calcular, grupo='1'), 'viejo')
+        self.assertIsNone(near_cache.favoritos.get('ids', grupo='1'))
+        self.assertEqual(near_cache.favoritos.get_or_set('ids', lambda: 'nuevo', grupo='1'), 'nuevo')
+        self.assertEqual(near_cache.favoritos.get('ids', grupo='1'), 'nuevo')
+
+    def test_invalidar_llega_a_otro_proceso(self):
+        near_cache.catalogo.set('clave', 'valor')
+        near_cache.catalogo.invalidar()
+        # Otro worker: sin copia local, relee la versión de la caché compartida
+        near_cache.catalogo.limpiar_local()
+        self.assertIsNone(near_cache.catalogo.get('clave'))
+
+    def test_usuario_cacheado_sin_contrasena(self):
+        user = crear_usuario('entrenador1', tipo='entrenador')
+        self.client.force_login(user)
+        self.client.get('/')
+        datos = near_cache.usuarios.get(str(user.pk), grupo=str(user.pk))
+        self.assertNotIn('password', datos['usuario'])
+        self.assertNotIn(user.password, pickle.dumps(datos).decode('latin-1'))
+
+        backend = PerfilModelBackend()
+        with self.assertNumQueries(0):
+            cacheado = backend.get_user(user.pk)
+            self.assertEqual(cacheado.perfil.tipo_usuario, 'entrenador')
+            self.assertEqual(cacheado.get_session_auth_hash(), user.get_session_auth_hash())
+        self.assertEqual(cacheado.password, user.password)
+
+    def test_editar_el_perfil_invalida_el_usuario(self):
+        user = crear_usuario('miembro')
+        backend = PerfilModelBackend()
+        self.assertEqual(backend.get_user(user.pk).perfil.tipo_usuario, 'usuario')
+        user.perfil.tipo_usuario = 'administrador'
+        user.perfil.save()
+        self.assertEqual(backend.get_user(user.pk).perfil.tipo_usuario, 'administrador')
+
+
+REPLICA = 'replica_pruebas'
+
+
+@override_settings(CACHES=CACHE_PRUEBAS, DATABASE_REPLICAS=[REPLICA])
+class ReplicaRouterTests(TransactionTestCase):
+    """
+    Enrutado con una réplica SQLite aparte. TransactionTestCase: dentro de
+    una transacción (TestCase) el router lee siempre del primario. La réplica
+    se agrega después de preparar la clase, así el runner no la migra.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.archivo = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False).name
+        connections.settings[REPLICA] = connections.configure_settings({
+            DEFAULT_DB_ALIAS: dict(connections.settings[DEFAULT_DB_ALIAS]),
+            REPLICA: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': cls.archivo},
+        })[REPLICA]
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        os.remove(cls.archivo)
+        super().tearDownClass()
+
+    def setUp(self):
+        db_router._revisiones.clear()
+        with connections[REPLICA].schema_editor() as editor:
+            editor.create_model(Ejercicio)
+        Ejercicio.objects.using(REPLICA).create(ejercicio_id='replica', nombre='Solo en la réplica')
+        self.addCleanup(self.borrar_tabla_replica)
+        self.factory = RequestFactory()
+
+    def borrar_tabla_replica(self):
+        with connections[REPLICA].schema_editor() as editor:
+            editor.delete_model(Ejercicio)
+
+    def leidos(self):
+        return list(Ejercicio.objects.values_list('ejercicio_id', flat=True))
+
+    def vista(self, request):
+        return usa_replica(lambda request: HttpResponse(','.join(self.leidos())))(request)
+
+    def test_lecturas_en_la_replica_solo_con_usa_replica(self):
+        self.assertEqual(self.vista(self.factory.get('/')).content, b'replica')
+        self.assertEqual(self.leidos(), [])
+        self.assertEqual(db_router.ReplicaRouter().db_for_read(Ejercicio), DEFAULT_DB_ALIAS)
+
+    def test_escrituras_al_primario_y_lo_escrito_se_lee_del_primario(self):
+        with db_router.en_replica():
+            Ejercicio.objects.create(ejercicio_id='nuevo', nombre='Nuevo')
+            self.assertEqual(self.leidos(), ['nuevo'])
+        self.assertEqual(list(Ejercicio.objects.using(REPLICA).values_list('ejercicio_id', flat=True)), ['replica'])
+
+    def test_escribir_deja_la_cookie_del_primario(self):
+        def escribe(request):
+            Ejercicio.objects.create(ejercicio_id='nuevo', nombre='Nuevo')
+            return HttpResponse()
+
+        response = db_router.ReplicaMiddleware(escribe)(self.factory.get('/'))
+        self.assertIn(db_router.COOKIE_PRIMARIO, response.cookies)
+        response = db_router.ReplicaMiddleware(lambda request: HttpResponse())(self.factory.get('/'))
+        self.assertNotIn(db_router.COOKIE_PRIMARIO, response.cookies)
+
+    def test_con_la_cookie_se_lee_del_primario(self):
+        request = self.factory.get('/')
+        request.COOKIES[db_router.COOKIE_PRIMARIO] = '1'
+        self.assertEqual(self.vista(request).content, b'')
+
+    def test_replica_atrasada_o_caida_usa_el_primario(self):
+        for retraso in ({'return_value': 60}, {'side_effect': OSError('sin conexión')}):
+            db_router._revisiones.clear()
+            with mock.patch.object(db_router, '_retraso', **retraso), self.assertLogs('gym.db', 'WARNING'):
+                self.assertEqual(self.vista(self.factory.get('/')).content, b'')
+
+
+@mock.patch.dict(ColaService.TIPOS, {'prueba': lambda **argumentos: None})
+class ColaTests(GymTestCase):
+    """Cada tarea la toma y la cierra un solo worker"""
+
+    def crear(self, **campos):
+        return Tarea.objects.create(tipo='prueba', ejecutar_desde=timezone.now() - timedelta(seconds=1), **campos)
+
+    def test_tomar_reserva_para_un_solo_worker(self):
+        tareas = [self.crear() for _ in range(3)]
+        tomadas = ColaService.tomar('w1', lote=2)
+        self.assertEqual([t.trabajador for t in tomadas], ['w1', 'w1'])
+        self.assertEqual([t.id for t in ColaService.tomar('w2', lote=5)], [tareas[2].id])
+        self.assertEqual(ColaService.tomar('w3', lote=5), [])
+
+    def test_no_devuelve_las_que_otro_worker_tomo_entre_medio(self):
+        tarea = self.crear()
+        values_list = QuerySet.values_list
+
+        def otro_worker_la_toma(queryset, *args, **kwargs):
+            ids = list(values_list(queryset, *args, **kwargs))
+            Tarea.objects.filter(id=tarea.id).update(
+                estado='en_curso', trabajador='w2', bloqueada_hasta=timezone.now() + ColaService.PLAZO,
+            )
+            return ids
+
+        with mock.patch.object(QuerySet, 'values_list', autospec=True, side_effect=otro_worker_la_toma):
+            self.assertEqual(ColaService.tomar('w1'), [])
+        self.assertEqual(Tarea.objects.get(id=tarea.id).trabajador, 'w2')
+
+    def test_retomar_una_vencida_gasta_un_intento(self):
+        vencida = timezone.now() - timedelta(seconds=1)
+        tarea = self.crear(estado='en_curso', trabajador='caido', bloqueada_hasta=vencida, max_intentos=3)
+        ultima = self.crear(estado='en_curso', trabajador='caido', bloqueada_hasta=vencida, max_intentos=3, intentos=2)
+
+        with self.assertLogs('gym.cola', 'ERROR'):
+            tomadas = ColaService.tomar('w1', lote=5)
+        self.assertEqual([(t.id, t.intentos) for t in tomadas], [(tarea.id, 1)])
+        ultima.refresh_from_db()
+        self.assertEqual((ultima.estado, ultima.intentos), ('fallida', 3))
+
+    def test_no_completa_una_tarea_que_retomo_otro_worker(self):
+        self.crear()
+        tarea, = ColaService.tomar('w1')
+        # Venció el plazo de w1 y w2 la retomó
+        Tarea.objects.filter(id=tarea.id).update(bloqueada_hasta=timezone.now() - timedelta(seconds=1))
+        retomada, = ColaService.tomar('w2')
+
+        ColaService.ejecutar(tarea)
+        retomada.refresh_from_db()
+        self.assertEqual((retomada.estado, retomada.trabajador), ('en_curso', 'w2'))
+        self.assertTrue(ColaService.ejecutar(retomada))
+        self.assertEqual(Tarea.objects.get(id=tarea.id).estado, 'completada')
+
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class RunWorkerTests(TransactionTestCase):
+    """
+    El worker sobrevive a una caída de la base. TransactionTestCase: el
+    worker cierra conexiones, algo que no se puede dentro de un TestCase.
+    """
+
+    def test_caida_al_registrar_no_repite_la_tarea(self):
+        ejecutadas = []
+        tarea = Tarea.objects.create(tipo='prueba', ejecutar_desde=timezone.now() - timedelta(seconds=1))
+        registrar = ColaService.registrar
+        caidas = [OperationalError('server has gone away')]
+
+        def registrar_con_caida(tarea, error=None):
+            if caidas:
+                raise caidas.pop()
+            registrar(tarea, error)
+
+        with mock.patch.dict(ColaService.TIPOS, {'prueba': lambda: ejecutadas.append(1)}), \
+                mock.patch.object(ColaService, 'registrar', side_effect=registrar_con_caida), \
+                mock.patch('gym.management.commands.run_worker.time.sleep') as sleep, \
+                self.assertLogs('gym.cola', 'ERROR'):
+            call_command('run_worker', una_vez=True, espera=0, stdout=StringIO(), stderr=StringIO())
+
+        sleep.assert_called_once()
+        self.assertEqual(ejecutadas, [1])
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.intentos), ('completada', 1))
+
+@override_settings(STORAGES=ESTATICOS_PRUEBAS)
+class RespuestaCondicionalTests(GymTestCase):
+    """ETag de los detalles: 304 mientras no cambie lo que muestra la página"""
+
+    def setUp(self):
+        super().setUp()
+        self.usuario = crear_usuario('miembro')
+        self.client.force_login(self.usuario)
+        self.rutina = Rutina.objects.create(nombre='Empuje', usuario=self.usuario)
+        self.ejercicio = Ejercicio.objects.create(ejercicio_id='press', nombre='Press', partes_cuerpo='Pecho')
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        return response['ETag']
+
+    def test_rutina_sin_cambios_responde_304(self):
+        url = f'/rutinas/{self.rutina.id}/'
+        self.client.get(url)  # Deja la cookie CSRF, que entra en el ETag
+        etag = self.etag(url)
+        with self.assertNumQueries(2):  # sesión y marca de la rutina (el usuario sale del near cache)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.post(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_agregar_o_quitar_ejercicios_cambia_el_etag(self):
+        url = f'/rutinas/{self.rutina.id}/'
+        self.client.get(url)
+        etag = self.etag(url)
+        detalle = DetalleRutina.objects.create(rutina=self.rutina, ejercicio=self.ejercicio, series=3, repeticiones=10)
+        con_detalle = self.etag(url)
+        self.assertNotEqual(con_detalle, etag)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        detalle.delete()
+        # Vuelve a mostrar lo mismo que al principio
+        self.assertEqual(self.etag(url), etag)
+
+    def test_rutina_ajena_no_se_revela(self):
+        otra = Rutina.objects.create(nombre='Ajena', usuario=crear_usuario('otro'))
+        self.assertEqual(self.client.get(f'/rutinas/{otra.id}/', HTTP_IF_NONE_MATCH='*').status_code, 404)
+
+    def test_marcar_favorito_cambia_el_etag_del_ejercicio(self):
+        ejercicio_id = ExerciseDBService.get_fallback_exercises()[0]['id']
+        url = f'/ejercicios/{ejercicio_id}/'
+        self.client.get(url)
+        etag = self.etag(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            FavoritoService.alternar(self.usuario, ejercicio_id)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class FavoritoTests(GymTestCase):
+    """Alternar un favorito: un DELETE decide, los ids cacheados cambian al confirmar"""
+
+    def setUp(self):
+        super().setUp()
+        self.usuario = crear_usuario('miembro')
+        self.ejercicio_id = ExerciseDBService.get_fallback_exercises()[0]['id']
+
+    def alternar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return FavoritoService.alternar(self.usuario, self.ejercicio_id)
+
+    def test_alternar_agrega_y_quita(self):
+        self.assertEqual(FavoritoService.ids(self.usuario.id), frozenset())
+        self.assertIs(self.alternar(), True)
+        self.assertEqual(FavoritoService.ids(self.usuario.id), {self.ejercicio_id})
+        self.assertIs(self.alternar(), False)
+        self.assertEqual(FavoritoService.ids(self.usuario.id), frozenset())
+        self.assertFalse(Favorito.objects.filter(usuario=self.usuario).exists())
+        self.assertTrue(Eliminacion.objects.filter(usuario_id=self.usuario.id, modelo='favorito').exists())
+
+    def test_quitar_es_un_solo_delete(self):
+        self.alternar()
+        with CaptureQueriesContext(connection) as consultas:
+            self.alternar()
+        borrados = [q['sql'] for q in consultas if q['sql'].startswith('DELETE') and 'gym_favorito' in q['sql']]
+        self.assertEqual(len(borrados), 1)
+
+    def test_los_ids_no_cambian_hasta_el_commit(self):
+        FavoritoService.ids(self.usuario.id)
+        with self.captureOnCommitCallbacks() as callbacks:
+            FavoritoService.alternar(self.usuario, self.ejercicio_id)
+            # Otro request antes del COMMIT: sigue viendo (y cacheando) lo confirmado
+            self.assertEqual(FavoritoService.ids(self.usuario.id), frozenset())
+        self.assertTrue(callbacks)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(FavoritoService.ids(self.usuario.id), {self.ejercicio_id})
+
+    def test_agregado_a_la_vez_por_otro_request(self):
+        with mock.patch.object(Favorito.objects, 'create', side_effect=IntegrityError):
+            self.assertIs(FavoritoService.alternar(self.usuario, self.ejercicio_id), True)
+
+    def test_ejercicio_inexistente(self):
+        self.assertIsNone(FavoritoService.alternar(self.usuario, 'no-existe'))
+
+
+@override_settings(STORAGES=ESTATICOS_PRUEBAS)
+class RecuperarPasswordTests(GymTestCase):
+    """El correo de recuperación se arma en el worker: la cola no guarda el token"""
+
+    def test_la_tarea_no_guarda_el_enlace(self):
+        user = crear_usuario('miembro')
+        user.email = 'miembro@gymflow.cl'
+        user.save()
+        self.client.post('/password-reset/', {'email': user.email})
+
+        tarea = Tarea.objects.get(tipo='correo_recuperacion')
+        self.assertEqual(tarea.argumentos['user_id'], user.pk)
+        self.assertNotIn('password-reset-confirm', json.dumps(tarea.argumentos))
+        self.assertEqual(mail.outbox, [])
+
+        tarea, = ColaService.tomar('w1')
+        self.assertTrue(ColaService.ejecutar(tarea))
+        correo, = mail.outbox
+        self.assertEqual(correo.to, [user.email])
+        enlace = next(linea for linea in correo.body.splitlines() if 'password-reset-confirm' in linea)
+        response = self.client.get(enlace.split('testserver')[1], follow=True)
+        self.assertTrue(response.context['validlink'])
+
+
+class ClientesTests(GymTestCase):
+    """Rachas del roster y relación entrenador-cliente"""
+
+    def setUp(self):
+        super().setUp()
+        self.entrenador = crear_usuario('coach', 'entrenador')
+        self.actual = lunes(timezone.localdate())
+
+    def entreno(self, usuario, *semanas_atras):
+        VolumenSemanal.objects.bulk_create([
+            VolumenSemanal(usuario=usuario, semana=self.actual - timedelta(weeks=atras), grupo_muscular='Piernas', series=3)
+            for atras in semanas_atras
+        ])
+
+    def test_semana_en_curso_suma_pero_no_corta(self):
+        con_actual, sin_actual = crear_usuario('con_actual'), crear_usuario('sin_actual')
+        self.entreno(con_actual, 0, 1, 2)
+        self.entreno(sin_actual, 1, 2)
+        rachas = ClientesService.rachas([con_actual.pk, sin_actual.pk])
+        self.assertEqual(rachas, {con_actual.pk: 3, sin_actual.pk: 2})
+
+    def test_un_hueco_corta_la_racha(self):
+        cliente, inactivo = crear_usuario('cliente'), crear_usuario('inactivo')
+        self.entreno(cliente, 0, 2, 3)
+        self.entreno(inactivo, 2, 3)
+        rachas = ClientesService.rachas([cliente.pk, inactivo.pk])
+        self.assertEqual(rachas, {cliente.pk: 1, inactivo.pk: 0})
+        # Sin semanas en la ventana no aparece: el roster lo muestra en 0
+        self.assertEqual(ClientesService.rachas([crear_usuario('nuevo').pk]), {})
+
+    def test_racha_limitada_a_la_ventana(self):
+        cliente = crear_usuario('cliente')
+        self.entreno(cliente, *range(ClientesService.RACHA_MAXIMA + 10))
+        # Se miran RACHA_MAXIMA semanas hacia atrás más la semana en curso
+        self.assertEqual(ClientesService.rachas([cliente.pk]), {cliente.pk: ClientesService.RACHA_MAXIMA + 1})
+
+    def test_roster_ordenado_por_ultima_asignacion(self):
+        ahora = timezone.now()
+        clientes = [crear_usuario(f'cliente{i}') for i in range(ClientesService.POR_PAGINA + 2)]
+        for i, cliente in enumerate(clientes):
+            ClientesService.vincular([(self.entrenador.pk, cliente.pk)], ahora - timedelta(hours=i))
+        self.entreno(clientes[0], 0, 1)
+
+        pagina = ClientesService.roster(self.entrenador, 1)
+        self.assertEqual(pagina.paginator.count, len(clientes))
+        self.assertEqual([r.cliente_id for r in pagina], [c.pk for c in clientes[:ClientesService.POR_PAGINA]])
+        self.assertEqual([r.racha for r in pagina][:2], [2, 0])
+        siguiente = ClientesService.roster(self.entrenador, 2)
+        self.assertEqual([r.cliente_id for r in siguiente], [c.pk for c in clientes[ClientesService.POR_PAGINA:]])
+
+    def test_revincular_renueva_la_ultima_asignacion(self):
+        antiguo, reciente = crear_usuario('antiguo'), crear_usuario('reciente')
+        inicio = timezone.now() - timedelta(days=30)
+        ClientesService.vincular([(self.entrenador.pk, antiguo.pk)], inicio)
+        ClientesService.vincular([(self.entrenador.pk, reciente.pk)], inicio + timedelta(days=1))
+
+        ahora = timezone.now()
+        ClientesService.vincular([(self.entrenador.pk, antiguo.pk), (self.entrenador.pk, antiguo.pk)], ahora)
+        relacion = ClienteEntrenador.objects.get(entrenador=self.entrenador, cliente=antiguo)
+        self.assertEqual(relacion.fecha_inicio, inicio)
+        self.assertEqual(relacion.ultima_asignacion, ahora)
+        self.assertEqual(ClienteEntrenador.objects.filter(entrenador=self.entrenador).count(), 2)
+        self.assertEqual([r.cliente_id for r in ClientesService.roster(self.entrenador, 1)], [antiguo.pk, reciente.pk])
+
+
+class ArchivosEstaticosTests(TestCase):
+    """Rangos, revalidación y variantes comprimidas de los estáticos"""
+
+    CONTENIDO = bytes(range(256)) * 4
+
+    def setUp(self):
+        raiz = tempfile.TemporaryDirectory()
+        self.addCleanup(raiz.cleanup)
+        with open(os.path.join(raiz.name, 'ejercicio.gif'), 'wb') as archivo:
+            archivo.write(self.CONTENIDO)
+        with open(os.path.join(raiz.name, 'app.css'), 'wb') as archivo:
+            archivo.write(b'body{}')
+        with open(os.path.join(raiz.name, 'app.css.gz'), 'wb') as archivo:
+            archivo.write(b'gz')
+        configuracion = override_settings(STATIC_URL='/static/', STATIC_ROOT=raiz.name, STORAGES=ESTATICOS_PRUEBAS)
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+        self.middleware = ArchivosEstaticosMiddleware(lambda request: HttpResponse(status=404))
+        self.factory = RequestFactory()
+
+    def get(self, ruta, **encabezados):
+        return self.middleware(self.factory.get(ruta, **encabezados))
+
+    def test_un_rango(self):
+        response = self.get('/static/ejercicio.gif', HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.CONTENIDO)}')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENIDO[10:20])
+
+        response = self.get('/static/ejercicio.gif', HTTP_RANGE='bytes=-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENIDO[-5:])
+
+    def test_rango_fuera_del_archivo(self):
+        response = self.get('/static/ejercicio.gif', HTTP_RANGE=f'bytes={len(self.CONTENIDO)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.CONTENIDO)}')
+
+    def test_varios_rangos_entrega_el_archivo_completo(self):
+        response = self.get('/static/ejercicio.gif', HTTP_RANGE='bytes=0-9,20-29')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENIDO)
+
+    def test_if_none_match(self):
+        completo = self.get('/static/ejercicio.gif')
+        completo.close()
+        response = self.get('/static/ejercicio.gif', HTTP_IF_NONE_MATCH=completo['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], completo['ETag'])
+
+        response = self.get('/static/ejercicio.gif', HTTP_IF_NONE_MATCH='"otro"')
+        response.close()
+        self.assertEqual(response.status_code, 200)
+
+    def test_variante_comprimida(self):
+        response = self.get('/static/app.css', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(b''.join(response.streaming_content), b'gz')
+
+        response = self.get('/static/app.css')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(b''.join(response.streaming_content), b'body{}')
+        self.assertEqual(self.get('/static/app.css.gz').status_code, 404)
@@ -1,6 +1,7 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
 from . import views
+from .forms import RecuperarPasswordForm
 
 urlpatterns = [
     # Auth
@@ -12,6 +13,7 @@ urlpatterns = [
     # Recuperación de contraseña
     path('password-reset/', auth_views.PasswordResetView.as_view(
         template_name='gym/password_reset.html',
+        form_class=RecuperarPasswordForm,
         email_template_name='gym/password_reset_email.html',
         subject_template_name='gym/password_reset_subject.txt',
         success_url='/password-reset/done/'
@@ -31,6 +33,7 @@ urlpatterns = [
     path('dashboard/', views.dashboard, name='dashboard'),
     path('dashboard/entrenador/', views.dashboard_entrenador, name='dashboard_entrenador'),
     path('dashboard/admin/', views.dashboard_admin, name='dashboard_admin'),
+    path('dashboard/admin/cache/', views.api_cache_estadisticas, name='api_cache_estadisticas'),
     
     # Ejercicios
     path('ejercicios/', views.ejercicios_list, name='ejercicios_list'),
@@ -46,13 +49,21 @@ urlpatterns = [
     path('rutinas/<int:rutina_id>/agregar/<str:ejercicio_id>/', views.agregar_ejercicio_detalle, name='agregar_ejercicio_detalle'),
     path('rutinas/<int:rutina_id>/registrar/', views.registrar_entrenamiento, name='registrar_entrenamiento'),
     
+    # API (clientes móviles / tablets)
+    path('api/entrenamientos/lote/', views.api_registrar_lote, name='api_registrar_lote'),
+    path('api/sync/', views.api_sync, name='api_sync'),
+    
     # Progreso
     path('progreso/', views.progreso_view, name='progreso'),
     path('progreso/registrar/', views.registrar_progreso, name='registrar_progreso'),
+    path('progreso/analitica/', views.api_progreso_analitica, name='api_progreso_analitica'),
+    path('progreso/volumen/', views.volumen_view, name='volumen'),
+    path('progreso/exportar/', views.exportar_historial, name='exportar_historial'),
     
     # Favoritos
     path('favoritos/', views.favoritos_list, name='favoritos'),
     path('favoritos/toggle/<str:ejercicio_id>/', views.toggle_favorito, name='toggle_favorito'),
+    path('api/favoritos/<str:ejercicio_id>/', views.api_favorito, name='api_favorito'),
     
     # Entrenadores
     path('entrenadores/', views.entrenadores_list, name='entrenadores_list'),
@@ -63,5 +74,7 @@ urlpatterns = [
     
     # Entrenadores: Asignar rutinas
     path('rutinas/<int:rutina_id>/asignar/', views.asignar_rutina, name='asignar_rutina'),
+    path('rutinas/<int:rutina_id>/ajustes/', views.ajustar_rutina, name='ajustar_rutina'),
     path('mis-clientes/', views.mis_clientes, name='mis_clientes'),
+    path('mis-clientes/<int:cliente_id>/', views.cliente_detalle, name='cliente_detalle'),
 ]
@@ -1,12 +1,38 @@
+import json
+import os
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib import messages
+from django.db import transaction
 from django.db.models import Count, Q
 from django.contrib.auth.models import User
-from .models import Ejercicio, Rutina, DetalleRutina, RegistroEntrenamiento, ProgresoFisico, Favorito, PerfilUsuario
+from django.core.paginator import Paginator
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.gzip import gzip_page
+from .models import (
+    Ejercicio, Rutina, DetalleRutina, AjusteDetalle, RegistroEntrenamiento, ProgresoFisico, Favorito,
+    PerfilUsuario, obtener_perfil,
+)
+from . import near_cache, tarjetas_cache
 from .exercisedb_service import ExerciseDBService
+from .favorito_service import FavoritoService
+from .asignacion_service import AsignacionService
+from .clientes_service import ClientesService
+from .registro_service import RegistroService, LoteInvalido, peso_o_none
+from .sync_service import SyncService
+from .progreso_service import ProgresoService
+from .volumen_service import VolumenService
+from .export_service import ExportService
+from .decorators import login_requerido, respuesta_condicional, rol_requerido
+from .db_router import usa_replica
+from .dashboard_cache import DASHBOARD_CACHE_TIMEOUT, version_usuario, version_admin
 from .forms import RegistroForm, RutinaForm, DetalleRutinaForm, ProgresoForm, PerfilForm
 
 
@@ -16,7 +42,7 @@ def login_view(request):
     """Login con redirección según tipo de usuario"""
     if request.user.is_authenticated:
         # Redirigir según tipo de usuario
-        return _redirect_por_tipo_usuario(request.user)
+        return _redirect_por_tipo_usuario(request.tipo_usuario)
     
     if request.method == 'POST':
         form = AuthenticationForm(request, data=request.POST)
@@ -25,14 +51,8 @@ def login_view(request):
             login(request, user)
             
             # IMPORTANTE: Verificar y crear perfil si no existe
-            try:
-                perfil = user.perfil
-            except PerfilUsuario.DoesNotExist:
-                # Crear perfil si no existe
-                perfil = PerfilUsuario.objects.create(
-                    user=user,
-                    tipo_usuario='usuario'
-                )
+            perfil, creado = obtener_perfil(user)
+            if creado:
                 messages.info(request, 'Se ha creado tu perfil automáticamente.')
             
             # Mensaje personalizado según tipo de usuario
@@ -41,7 +61,7 @@ def login_view(request):
             messages.success(request, f'¡Bienvenido {emoji} {user.username}! ({tipo})')
             
             # Redirigir según tipo de usuario
-            return _redirect_por_tipo_usuario(user)
+            return _redirect_por_tipo_usuario(perfil.tipo_usuario)
         else:
             # Mostrar errores del formulario
             messages.error(request, 'Usuario o contraseña incorrectos')
@@ -51,15 +71,8 @@ def login_view(request):
     return render(request, 'gym/login.html', {'form': form})
 
 
-def _redirect_por_tipo_usuario(user):
+def _redirect_por_tipo_usuario(tipo):
     """Redirige según el tipo de usuario"""
-    try:
-        tipo = user.perfil.tipo_usuario
-    except PerfilUsuario.DoesNotExist:
-        # Si no tiene perfil, crearlo y redirigir a dashboard normal
-        PerfilUsuario.objects.create(user=user, tipo_usuario='usuario')
-        return redirect('dashboard')
-    
     if tipo == 'administrador':
         return redirect('dashboard_admin')
     elif tipo == 'entrenador':
@@ -118,17 +131,22 @@ def logout_view(request):
 def dashboard(request):
     """Dashboard principal - USUARIOS normales"""
     # Si no es usuario normal, redirigir a su dashboard
-    if request.user.perfil.tipo_usuario != 'usuario':
-        return _redirect_por_tipo_usuario(request.user)
-    
-    total_rutinas = Rutina.objects.filter(usuario=request.user).count()
-    total_entrenamientos = RegistroEntrenamiento.objects.filter(usuario=request.user).count()
-    rutinas_recientes = Rutina.objects.filter(usuario=request.user, activa=True)[:5]
-    entrenamientos_recientes = RegistroEntrenamiento.objects.filter(usuario=request.user)[:5]
-    favoritos_count = Favorito.objects.filter(usuario=request.user).count()
+    if request.tipo_usuario != 'usuario':
+        return _redirect_por_tipo_usuario(request.tipo_usuario)
+    
+    # Los valores son perezosos: solo se consultan si el fragmento no está en caché
+    total_rutinas = Rutina.objects.filter(usuario=request.user).count
+    total_entrenamientos = RegistroEntrenamiento.objects.filter(usuario=request.user).count
+    rutinas_recientes = Rutina.objects.filter(
+        usuario=request.user, activa=True
+    ).con_num_ejercicios()[:5]
+    entrenamientos_recientes = RegistroEntrenamiento.objects.filter(
+        usuario=request.user
+    ).select_related('rutina')[:5]
+    favoritos_count = Favorito.objects.filter(usuario=request.user).count
     
     # Progreso más reciente
-    ultimo_progreso = ProgresoFisico.objects.filter(usuario=request.user).first()
+    ultimo_progreso = SimpleLazyObject(ProgresoFisico.objects.filter(usuario=request.user).first)
     
     context = {
         'total_rutinas': total_rutinas,
@@ -137,73 +155,70 @@ def dashboard(request):
         'rutinas_recientes': rutinas_recientes,
         'entrenamientos_recientes': entrenamientos_recientes,
         'ultimo_progreso': ultimo_progreso,
+        'cache_version': version_usuario(request.user.id),
+        'cache_timeout': DASHBOARD_CACHE_TIMEOUT,
     }
     
     return render(request, 'gym/dashboard.html', context)
 
 
 @login_required
+@rol_requerido('entrenador', mensaje='Acceso denegado: Solo para entrenadores')
 def dashboard_entrenador(request):
     """Dashboard para ENTRENADORES"""
-    # Verificar que sea entrenador
-    if not request.user.perfil.es_entrenador():
-        messages.error(request, 'Acceso denegado: Solo para entrenadores')
-        return redirect('dashboard')
-    
     # Estadísticas del entrenador
     mis_rutinas = Rutina.objects.filter(usuario=request.user)
     rutinas_asignadas = Rutina.objects.filter(entrenador=request.user)
     
-    # Clientes únicos
-    clientes = User.objects.filter(
-        rutinas__entrenador=request.user
-    ).distinct()
+    # Clientes (con el total de rutinas de cada uno), los más recientes primero
+    clientes = ClientesService.clientes_de(request.user).annotate(
+        num_rutinas=Count('rutinas')
+    ).order_by('-entrenadores_rel__ultima_asignacion')
     
     # Rutinas recientes creadas
-    rutinas_recientes = mis_rutinas.order_by('-fecha_creacion')[:5]
+    rutinas_recientes = mis_rutinas.con_num_ejercicios().order_by('-fecha_creacion')[:5]
     
     # Últimas asignaciones
-    ultimas_asignaciones = rutinas_asignadas.order_by('-fecha_creacion')[:5]
+    ultimas_asignaciones = rutinas_asignadas.select_related('usuario').order_by('-fecha_creacion')[:5]
     
     context = {
-        'total_rutinas_creadas': mis_rutinas.count(),
-        'total_rutinas_asignadas': rutinas_asignadas.count(),
-        'total_clientes': clientes.count(),
+        'total_rutinas_creadas': mis_rutinas.count,
+        'total_rutinas_asignadas': rutinas_asignadas.count,
+        'total_clientes': clientes.count,
         'rutinas_recientes': rutinas_recientes,
         'ultimas_asignaciones': ultimas_asignaciones,
         'clientes': clientes[:5],  # Primeros 5 clientes
+        'cache_version': version_usuario(request.user.id),
+        'cache_timeout': DASHBOARD_CACHE_TIMEOUT,
     }
     
     return render(request, 'gym/dashboard_entrenador.html', context)
 
 
 @login_required
+@rol_requerido('administrador', mensaje='Acceso denegado: Solo para administradores')
+@usa_replica(versiones=lambda request: [version_admin()])
 def dashboard_admin(request):
     """Dashboard para ADMINISTRADORES"""
-    # Verificar que sea admin
-    if not request.user.perfil.es_admin():
-        messages.error(request, 'Acceso denegado: Solo para administradores')
-        return redirect('dashboard')
-    
-    # Estadísticas generales del sistema
-    total_usuarios = User.objects.filter(perfil__tipo_usuario='usuario').count()
-    total_entrenadores = User.objects.filter(perfil__tipo_usuario='entrenador').count()
-    total_rutinas = Rutina.objects.all().count()
-    total_ejercicios = Ejercicio.objects.all().count()
-    total_entrenamientos = RegistroEntrenamiento.objects.all().count()
+    # Estadísticas generales del sistema (perezosas, ver dashboard)
+    total_usuarios = User.objects.filter(perfil__tipo_usuario='usuario').count
+    total_entrenadores = User.objects.filter(perfil__tipo_usuario='entrenador').count
+    total_rutinas = Rutina.objects.all().count
+    total_ejercicios = Ejercicio.objects.all().count
+    total_entrenamientos = RegistroEntrenamiento.objects.all().count
     
     # Usuarios recientes
-    usuarios_recientes = User.objects.order_by('-date_joined')[:5]
+    usuarios_recientes = User.objects.select_related('perfil').order_by('-date_joined')[:5]
     
     # Rutinas más populares (más entrenamientos registrados)
-    rutinas_populares = Rutina.objects.annotate(
+    rutinas_populares = Rutina.objects.select_related('usuario').annotate(
         num_entrenamientos=Count('registroentrenamiento')
     ).order_by('-num_entrenamientos')[:5]
     
     # Entrenadores más activos
     entrenadores_activos = User.objects.filter(
         perfil__tipo_usuario='entrenador'
-    ).annotate(
+    ).select_related('perfil').annotate(
         num_rutinas_asignadas=Count('rutinas_asignadas')
     ).order_by('-num_rutinas_asignadas')[:5]
     
@@ -216,53 +231,45 @@ def dashboard_admin(request):
         'usuarios_recientes': usuarios_recientes,
         'rutinas_populares': rutinas_populares,
         'entrenadores_activos': entrenadores_activos,
+        'cache_version': version_admin(),
+        'cache_timeout': DASHBOARD_CACHE_TIMEOUT,
     }
     
     return render(request, 'gym/dashboard_admin.html', context)
 
 
+@login_required
+@rol_requerido('administrador', mensaje='Acceso denegado: Solo para administradores')
+def api_cache_estadisticas(request):
+    """API JSON: aciertos por nivel de las cachés de dos niveles de este worker"""
+    return JsonResponse({'pid': os.getpid(), 'caches': near_cache.estadisticas()})
+
+
 # ============ EJERCICIOS (ExerciseDB API) ============
 
-@login_required
-def ejercicios_list(request):
-    """Lista de ejercicios desde ExerciseDB API con filtros por zona"""
+@login_requerido
+@usa_replica
+async def ejercicios_list(request):
+    """Lista de ejercicios desde ExerciseDB API con filtros por zona (async)"""
     query = request.GET.get('q', '')
     zona = request.GET.get('zona', '')  # Filtro por zona muscular
     
     # Obtener todos los ejercicios
     if query:
-        ejercicios = ExerciseDBService.search_exercises(query)
+        ejercicios = await ExerciseDBService.asearch_exercises(query, esperar=False)
+        
+        # Filtrar por zona si está seleccionada
+        if zona:
+            ejercicios = ExerciseDBService.filtrar_por_zona(ejercicios, zona)
+    elif zona:
+        # Lista de la zona ya filtrada (cacheada, ver warm_cache)
+        ejercicios = await ExerciseDBService.aget_exercises_by_zone(zona, limit=100, esperar=False)
     else:
         # Solicitar 100 ejercicios comunes de gym (optimizado)
-        ejercicios = ExerciseDBService.get_all_exercises(limit=100)
-    
-    # Filtrar por zona si está seleccionada
-    if zona:
-        # Mapeo de zonas español -> inglés para filtrado
-        zona_map = {
-            'pecho': ['chest', 'pecho'],
-            'piernas': ['legs', 'upper legs', 'lower legs', 'piernas'],
-            'espalda': ['back', 'espalda'],
-            'hombros': ['shoulders', 'hombros'],
-            'brazos': ['arms', 'upper arms', 'lower arms', 'brazos'],
-            'core': ['waist', 'core', 'abs']
-        }
-        
-        # Obtener términos de búsqueda para la zona seleccionada
-        zona_lower = zona.lower()
-        terminos_busqueda = zona_map.get(zona_lower, [zona_lower])
-        
-        # Filtrar ejercicios que contengan alguno de los términos
-        ejercicios = [
-            e for e in ejercicios 
-            if any(termino in e.get('bodyParts', '').lower() for termino in terminos_busqueda)
-        ]
-    
-    # Favoritos del usuario
-    favoritos_ids = Favorito.objects.filter(
-        usuario=request.user, 
-        ejercicio__isnull=False
-    ).values_list('ejercicio__ejercicio_id', flat=True)
+        ejercicios = await ExerciseDBService.aget_all_exercises(limit=100, esperar=False)
+    
+    # Favoritos del usuario (se marcan sobre las tarjetas cacheadas)
+    favoritos_ids = await sync_to_async(FavoritoService.ids)(request.user.id)
     
     # Zonas disponibles para filtrar
     zonas = ['Pecho', 'Piernas', 'Espalda', 'Hombros', 'Brazos', 'Core']
@@ -272,25 +279,33 @@ def ejercicios_list(request):
         'query': query,
         'zona': zona,
         'zonas': zonas,
-        'favoritos_ids': list(favoritos_ids),
+        'favoritos_ids': favoritos_ids,
         'total_ejercicios': len(ejercicios),
+        'tarjetas': await sync_to_async(tarjetas_cache.renderizar)(tarjetas_cache.TARJETA_EJERCICIO, ejercicios),
     }
     
-    return render(request, 'gym/ejercicios.html', context)
+    return await sync_to_async(render)(request, 'gym/ejercicios.html', context)
 
 
-@login_required
-def ejercicio_detail(request, ejercicio_id):
-    """Detalle de ejercicio"""
+def _marca_ejercicio(request, ejercicio_id):
+    """Lo que cambia la página de detalle de un ejercicio (ETag)"""
+    es_favorito = FavoritoService.es_favorito(request.user.id, ejercicio_id)
+    return ExerciseDBService.version_catalogo(), ejercicio_id, es_favorito
+
+
+@login_requerido
+@respuesta_condicional(_marca_ejercicio)
+async def ejercicio_detail(request, ejercicio_id):
+    """Detalle de ejercicio (async)"""
     # Obtener de ExerciseDB API
-    ejercicio_data = ExerciseDBService.get_exercise_by_id(ejercicio_id)
+    ejercicio_data = await ExerciseDBService.aget_exercise_by_id(ejercicio_id)
     
     if not ejercicio_data:
         messages.error(request, 'Ejercicio no encontrado')
         return redirect('ejercicios_list')
     
     # Guardar en BD si no existe
-    ejercicio, created = Ejercicio.objects.get_or_create(
+    ejercicio, created = await Ejercicio.objects.aget_or_create(
         ejercicio_id=ejercicio_id,
         defaults={
             'nombre': ejercicio_data['name'],
@@ -306,7 +321,7 @@ def ejercicio_detail(request, ejercicio_id):
     )
     
     # Verificar si es favorito
-    es_favorito = Favorito.objects.filter(usuario=request.user, ejercicio=ejercicio).exists()
+    es_favorito = await sync_to_async(FavoritoService.es_favorito)(request.user.id, ejercicio_id)
     
     context = {
         'ejercicio': ejercicio,
@@ -314,7 +329,7 @@ def ejercicio_detail(request, ejercicio_id):
         'es_favorito': es_favorito,
     }
     
-    return render(request, 'gym/ejercicio_detail.html', context)
+    return await sync_to_async(render)(request, 'gym/ejercicio_detail.html', context)
 
 
 # ============ RUTINAS ============
@@ -322,7 +337,7 @@ def ejercicio_detail(request, ejercicio_id):
 @login_required
 def rutinas_list(request):
     """Lista de rutinas del usuario"""
-    rutinas = Rutina.objects.filter(usuario=request.user).annotate(num_ejercicios=Count('detalles'))
+    rutinas = Rutina.objects.filter(usuario=request.user).con_num_ejercicios()
     
     filtro = request.GET.get('filtro', 'todas')
     if filtro == 'activas':
@@ -338,11 +353,22 @@ def rutinas_list(request):
     return render(request, 'gym/rutinas.html', context)
 
 
+def _marca_rutina(request, rutina_id):
+    """Lo que cambia la página de detalle de una rutina (ETag), en una consulta"""
+    marca = Rutina.objects.filter(id=rutina_id, usuario=request.user).con_marca_detalles().values_list(
+        'fecha_modificacion', 'entrenador_id',
+        'detalles_modificados', 'detalles_total', 'ajustes_modificados', 'ajustes_total',
+    ).first()
+    # Sin rutina la vista responde 404
+    return marca
+
+
 @login_required
+@respuesta_condicional(_marca_rutina)
 def rutina_detail(request, rutina_id):
     """Detalle de rutina"""
-    rutina = get_object_or_404(Rutina, id=rutina_id, usuario=request.user)
-    detalles = DetalleRutina.objects.filter(rutina=rutina).select_related('ejercicio').order_by('orden')
+    rutina = get_object_or_404(Rutina.objects.select_related('entrenador'), id=rutina_id, usuario=request.user)
+    detalles = rutina.detalles_efectivos()
     
     context = {
         'rutina': rutina,
@@ -353,13 +379,11 @@ def rutina_detail(request, rutina_id):
 
 
 @login_required
+@rol_requerido('entrenador', 'administrador',
+               mensaje='⛔ Solo los entrenadores y administradores pueden crear rutinas.',
+               redirect_to='rutinas_list')
 def rutina_create(request):
     """Crear rutina - SOLO para entrenadores y admins"""
-    # Verificar que sea entrenador o admin
-    if not (request.user.perfil.es_entrenador() or request.user.perfil.es_admin()):
-        messages.error(request, '⛔ Solo los entrenadores y administradores pueden crear rutinas.')
-        return redirect('rutinas_list')
-    
     if request.method == 'POST':
         form = RutinaForm(request.POST)
         if form.is_valid():
@@ -375,15 +399,13 @@ def rutina_create(request):
 
 
 @login_required
+@rol_requerido('entrenador', 'administrador',
+               mensaje='⛔ Solo los entrenadores y administradores pueden editar rutinas.',
+               redirect_to='rutina_detail', redirect_kwargs=('rutina_id',))
 def rutina_edit(request, rutina_id):
     """Editar rutina - SOLO para entrenadores y admins"""
     rutina = get_object_or_404(Rutina, id=rutina_id, usuario=request.user)
     
-    # Verificar que sea entrenador o admin
-    if not (request.user.perfil.es_entrenador() or request.user.perfil.es_admin()):
-        messages.error(request, '⛔ Solo los entrenadores y administradores pueden editar rutinas.')
-        return redirect('rutina_detail', rutina_id=rutina.id)
-    
     if request.method == 'POST':
         form = RutinaForm(request.POST, instance=rutina)
         if form.is_valid():
@@ -397,15 +419,13 @@ def rutina_edit(request, rutina_id):
 
 
 @login_required
+@rol_requerido('entrenador', 'administrador',
+               mensaje='⛔ Solo los entrenadores y administradores pueden eliminar rutinas.',
+               redirect_to='rutina_detail', redirect_kwargs=('rutina_id',))
 def rutina_delete(request, rutina_id):
     """Eliminar rutina - SOLO para entrenadores y admins"""
     rutina = get_object_or_404(Rutina, id=rutina_id, usuario=request.user)
     
-    # Verificar que sea entrenador o admin
-    if not (request.user.perfil.es_entrenador() or request.user.perfil.es_admin()):
-        messages.error(request, '⛔ Solo los entrenadores y administradores pueden eliminar rutinas.')
-        return redirect('rutina_detail', rutina_id=rutina.id)
-    
     if request.method == 'POST':
         rutina.delete()
         messages.success(request, '✅ Rutina eliminada')
@@ -414,32 +434,32 @@ def rutina_delete(request, rutina_id):
     return render(request, 'gym/rutina_confirm_delete.html', {'rutina': rutina})
 
 
-@login_required
-def agregar_ejercicio(request, rutina_id):
-    """Buscar ejercicios de la API para agregar a rutina"""
-    rutina = get_object_or_404(Rutina, id=rutina_id, usuario=request.user)
-    
-    # Verificar que sea entrenador o admin
-    if not (request.user.perfil.es_entrenador() or request.user.perfil.es_admin()):
-        messages.error(request, '⛔ Solo los entrenadores y administradores pueden modificar rutinas.')
-        return redirect('rutina_detail', rutina_id=rutina.id)
+@login_requerido
+@rol_requerido('entrenador', 'administrador',
+               mensaje='⛔ Solo los entrenadores y administradores pueden modificar rutinas.',
+               redirect_to='rutina_detail', redirect_kwargs=('rutina_id',))
+async def agregar_ejercicio(request, rutina_id):
+    """Buscar ejercicios de la API para agregar a rutina (async)"""
+    try:
+        rutina = await Rutina.objects.aget(id=rutina_id, usuario=request.user)
+    except Rutina.DoesNotExist:
+        raise Http404('Rutina no encontrada')
     
     # Búsqueda de ejercicios
     query = request.GET.get('q', '')
     zona = request.GET.get('zona', '')
     
-    if query or zona:
-        # Obtener ejercicios de la API
-        if query:
-            ejercicios = ExerciseDBService.search_exercises(query)
-        else:
-            ejercicios = ExerciseDBService.get_all_exercises(limit=150)
+    if query:
+        ejercicios = await ExerciseDBService.asearch_exercises(query, esperar=False)
         
         # Filtrar por zona si está seleccionada
         if zona:
-            ejercicios = [e for e in ejercicios if zona.lower() in e.get('bodyParts', '').lower()]
+            ejercicios = ExerciseDBService.filtrar_por_zona(ejercicios, zona)
+    elif zona:
+        # Lista de la zona ya filtrada (cacheada, ver warm_cache)
+        ejercicios = await ExerciseDBService.aget_exercises_by_zone(zona, limit=100, esperar=False)
     else:
-        ejercicios = ExerciseDBService.get_all_exercises(limit=100)
+        ejercicios = await ExerciseDBService.aget_all_exercises(limit=100, esperar=False)
     
     # Zonas disponibles
     zonas = ['Pecho', 'Piernas', 'Espalda', 'Hombros', 'Brazos', 'Core']
@@ -451,21 +471,20 @@ def agregar_ejercicio(request, rutina_id):
         'zona': zona,
         'zonas': zonas,
         'total_ejercicios': len(ejercicios),
+        'tarjetas': await sync_to_async(tarjetas_cache.renderizar)(tarjetas_cache.TARJETA_AGREGAR, ejercicios),
     }
     
-    return render(request, 'gym/agregar_ejercicio.html', context)
+    return await sync_to_async(render)(request, 'gym/agregar_ejercicio.html', context)
 
 
 @login_required
+@rol_requerido('entrenador', 'administrador',
+               mensaje='⛔ Solo los entrenadores y administradores pueden modificar rutinas.',
+               redirect_to='rutina_detail', redirect_kwargs=('rutina_id',))
 def agregar_ejercicio_detalle(request, rutina_id, ejercicio_id):
     """Agregar ejercicio a rutina con detalles (series, reps, etc.)"""
     rutina = get_object_or_404(Rutina, id=rutina_id, usuario=request.user)
     
-    # Verificar que sea entrenador o admin
-    if not (request.user.perfil.es_entrenador() or request.user.perfil.es_admin()):
-        messages.error(request, '⛔ Solo los entrenadores y administradores pueden modificar rutinas.')
-        return redirect('rutina_detail', rutina_id=rutina.id)
-    
     # Obtener ejercicio de la API
     ejercicio_data = ExerciseDBService.get_exercise_by_id(ejercicio_id)
     
@@ -490,6 +509,9 @@ def agregar_ejercicio_detalle(request, rutina_id, ejercicio_id):
     )
     
     if request.method == 'POST':
+        # Una rutina asignada deja de compartir la plantilla al editarla
+        rutina.materializar()
+        
         # Obtener datos del formulario
         orden = request.POST.get('orden', 1)
         series = request.POST.get('series', 3)
@@ -514,7 +536,7 @@ def agregar_ejercicio_detalle(request, rutina_id, ejercicio_id):
         return redirect('rutina_detail', rutina_id=rutina.id)
     
     # Calcular siguiente orden
-    ultimo_orden = DetalleRutina.objects.filter(rutina=rutina).count() + 1
+    ultimo_orden = rutina.total_ejercicios() + 1
     
     context = {
         'rutina': rutina,
@@ -552,20 +574,73 @@ def registrar_entrenamiento(request, rutina_id):
     return render(request, 'gym/registrar_entrenamiento.html', {'rutina': rutina})
 
 
+@login_required
+@require_POST
+def api_registrar_lote(request):
+    """API JSON: registra un lote de sesiones y series (idempotente por clave)"""
+    try:
+        datos = json.loads(request.body)
+        resultado = RegistroService.registrar_lote(request.user, datos)
+    except (ValueError, LoteInvalido) as e:
+        # json.JSONDecodeError es subclase de ValueError
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse(resultado)
+
+
+@login_required
+@gzip_page
+def api_sync(request):
+    """API JSON: cambios del usuario desde la marca `desde` (sincronización offline)"""
+    try:
+        desde = SyncService.parse_marca(request.GET.get('desde'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse(SyncService.cambios(request.user, desde))
+
+
 # ============ PROGRESO ============
 
 @login_required
+@usa_replica
 def progreso_view(request):
     """Ver progreso físico"""
     registros = ProgresoFisico.objects.filter(usuario=request.user).order_by('-fecha')[:10]
     
     context = {
         'registros': registros,
+        'tendencias': ProgresoService.analitica(request.user.id)['tendencias'],
+        'exportables': [
+            ('entrenamientos', 'Entrenamientos'),
+            ('series', 'Series'),
+            ('progreso', 'Progreso'),
+            ('rutinas', 'Rutinas'),
+        ],
     }
     
     return render(request, 'gym/progreso.html', context)
 
 
+@login_required
+@usa_replica
+def api_progreso_analitica(request):
+    """API JSON: series semanales/mensuales, medias móviles y tendencias para gráficos"""
+    analitica = ProgresoService.analitica(request.user.id)
+    
+    # ?meta_peso=75 estima cuándo se alcanza la meta según la tendencia
+    metas = {}
+    for metrica, tendencia in analitica['tendencias'].items():
+        meta = request.GET.get(f'meta_{metrica}')
+        if meta:
+            try:
+                metas[metrica] = ProgresoService.proyectar_meta(tendencia, float(meta))
+            except ValueError:
+                return JsonResponse({'error': f'meta_{metrica} inválida'}, status=400)
+    
+    return JsonResponse({**analitica, 'metas': metas})
+
+
 @login_required
 def registrar_progreso(request):
     """Registrar progreso físico"""
@@ -583,32 +658,93 @@ def registrar_progreso(request):
     return render(request, 'gym/registrar_progreso.html', {'form': form})
 
 
+@login_required
+@usa_replica
+def volumen_view(request):
+    """Volumen semanal por grupo muscular (propio, o de los clientes del entrenador)"""
+    clientes = None
+    cliente = None
+    usuarios = [request.user.id]
+    
+    if request.tipo_usuario == 'entrenador':
+        clientes = ClientesService.clientes_de(request.user).order_by('username')
+        cliente_id = request.GET.get('cliente', '')
+        if cliente_id.isdigit():
+            cliente = get_object_or_404(clientes, id=cliente_id)
+            usuarios = [cliente.id]
+        else:
+            # Todo el roster, sumado en una sola consulta
+            usuarios = clientes.values('id')
+    
+    reporte = VolumenService.reporte(usuarios)
+    
+    context = {
+        'semanas': reporte['semanas'],
+        'grupos': [
+            (grupo, list(zip(datos['series'], datos['tonelaje'])))
+            for grupo, datos in reporte['grupos'].items()
+        ],
+        'clientes': clientes,
+        'cliente': cliente,
+    }
+    
+    return render(request, 'gym/volumen.html', context)
+
+
+@login_required
+@usa_replica
+def exportar_historial(request):
+    """Descarga en streaming del historial completo (CSV o NDJSON, opcionalmente gzip)"""
+    tabla = request.GET.get('datos', 'entrenamientos')
+    formato = request.GET.get('formato', 'csv')
+    if tabla not in ExportService.TABLAS or formato not in ExportService.FORMATOS:
+        return JsonResponse({'error': 'Parámetros inválidos'}, status=400)
+    
+    usuario = request.user
+    cliente_id = request.GET.get('cliente', '')
+    if cliente_id and request.tipo_usuario == 'entrenador':
+        if not cliente_id.isdigit():
+            return JsonResponse({'error': 'Cliente inválido'}, status=400)
+        usuario = get_object_or_404(ClientesService.clientes_de(request.user), id=cliente_id)
+    
+    contenido = ExportService.lineas(usuario, tabla, formato)
+    nombre = f"gymflow_{tabla}_{usuario.username}_{timezone.localdate():%Y%m%d}.{formato}"
+    if request.GET.get('gzip') == '1':
+        response = StreamingHttpResponse(ExportService.comprimir(contenido), content_type='application/gzip')
+        nombre += '.gz'
+    else:
+        tipo = 'text/csv' if formato == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(contenido, content_type=f'{tipo}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    return response
+
+
 # ============ FAVORITOS ============
 
 @login_required
 def toggle_favorito(request, ejercicio_id):
-    """Agregar/quitar favorito"""
-    # Obtener o crear ejercicio en BD
-    ejercicio_data = ExerciseDBService.get_exercise_by_id(ejercicio_id)
+    """Agregar/quitar favorito (enlace sin JavaScript; la página usa api_favorito)"""
+    favorito = FavoritoService.alternar(request.user, ejercicio_id)
     
-    if ejercicio_data:
-        ejercicio, _ = Ejercicio.objects.get_or_create(
-            ejercicio_id=ejercicio_id,
-            defaults={'nombre': ejercicio_data['name']}
-        )
-        
-        favorito = Favorito.objects.filter(usuario=request.user, ejercicio=ejercicio).first()
-        
-        if favorito:
-            favorito.delete()
-            messages.info(request, 'Eliminado de favoritos')
-        else:
-            Favorito.objects.create(usuario=request.user, ejercicio=ejercicio)
-            messages.success(request, '¡Agregado a favoritos!')
+    if favorito is True:
+        messages.success(request, '¡Agregado a favoritos!')
+    elif favorito is False:
+        messages.info(request, 'Eliminado de favoritos')
     
     return redirect('ejercicio_detail', ejercicio_id=ejercicio_id)
 
 
+@login_required
+@require_POST
+def api_favorito(request, ejercicio_id):
+    """API JSON: alterna el favorito sin recargar la página"""
+    favorito = FavoritoService.alternar(request.user, ejercicio_id)
+    if favorito is None:
+        return JsonResponse({'error': 'Ejercicio no encontrado'}, status=404)
+    
+    return JsonResponse({'ejercicio_id': ejercicio_id, 'favorito': favorito})
+
+
 @login_required
 def favoritos_list(request):
     """Lista de favoritos"""
@@ -620,6 +756,7 @@ def favoritos_list(request):
 # ============ ENTRENADORES ============
 
 @login_required
+@usa_replica
 def entrenadores_list(request):
     """Lista de entrenadores disponibles"""
     entrenadores = PerfilUsuario.objects.filter(
@@ -660,94 +797,148 @@ def mi_perfil(request):
 # ============ ENTRENADOR: ASIGNAR RUTINAS ============
 
 @login_required
+@rol_requerido('entrenador', mensaje='Solo los entrenadores pueden asignar rutinas')
 def asignar_rutina(request, rutina_id):
     """Asignar rutina a un usuario (solo entrenadores)"""
-    rutina = get_object_or_404(Rutina, id=rutina_id)
-    
-    # Verificar que el usuario sea entrenador
-    if not request.user.perfil.es_entrenador():
-        messages.error(request, 'Solo los entrenadores pueden asignar rutinas')
-        return redirect('dashboard')
+    rutina = get_object_or_404(Rutina.objects.con_num_ejercicios(), id=rutina_id)
     
     # Verificar que la rutina sea del entrenador
-    if rutina.usuario != request.user:
+    if rutina.usuario_id != request.user.id:
         messages.error(request, 'Solo puedes asignar tus propias rutinas')
         return redirect('rutinas_list')
     
-    if request.method == 'POST':
-        usuario_id = request.POST.get('usuario_id')
-        try:
-            usuario_destino = User.objects.get(id=usuario_id)
-            
-            # Crear copia de la rutina para el usuario
-            nueva_rutina = Rutina.objects.create(
-                nombre=f"{rutina.nombre} (de {request.user.username})",
-                descripcion=rutina.descripcion,
-                usuario=usuario_destino,
-                entrenador=request.user,
-                dificultad=rutina.dificultad,
-                duracion_min=rutina.duracion_min,
-                objetivo=rutina.objetivo,
-                es_publica=False,
-                activa=True
-            )
-            
-            # Copiar todos los ejercicios
-            for detalle in rutina.detalles.all():
-                DetalleRutina.objects.create(
-                    rutina=nueva_rutina,
-                    ejercicio=detalle.ejercicio,
-                    orden=detalle.orden,
-                    series=detalle.series,
-                    repeticiones=detalle.repeticiones,
-                    peso=detalle.peso,
-                    descanso_seg=detalle.descanso_seg,
-                    notas=detalle.notas
-                )
-            
-            messages.success(request, f'Rutina asignada a {usuario_destino.username} exitosamente!')
-            return redirect('rutinas_list')
-            
-        except User.DoesNotExist:
-            messages.error(request, 'Usuario no encontrado')
-    
-    # Obtener lista de usuarios (clientes)
-    usuarios = User.objects.filter(
+    # Clientes a los que se puede asignar
+    candidatos = User.objects.filter(
         perfil__tipo_usuario='usuario',
         perfil__activo=True
     ).exclude(id=request.user.id)
     
+    # Buscar y cambiar de página reenvían el formulario (POST) con los
+    # usuario_ids marcados, así la selección se conserva entre páginas
+    navegando = 'buscar' in request.POST or 'page' in request.POST
+    
+    if request.method == 'POST' and not navegando:
+        usuario_ids = request.POST.getlist('usuario_ids')
+        usuarios_destino = list(candidatos.filter(id__in=usuario_ids))
+        
+        if usuarios_destino:
+            copias, segundos = AsignacionService.asignar_rutina(rutina, request.user, usuarios_destino)
+            messages.success(
+                request,
+                f'Rutina asignada a {len(copias)} cliente(s) exitosamente! ({segundos * 1000:.0f} ms)'
+            )
+            return redirect('rutinas_list')
+        
+        messages.error(request, 'Usuario no encontrado')
+    
+    # Selector con búsqueda y paginación (no un <select> con todos los usuarios)
+    datos = request.POST if request.method == 'POST' else request.GET
+    seleccionados = {int(i) for i in datos.getlist('usuario_ids') if i.isdigit()}
+    query = datos.get('q', '')
+    if query:
+        candidatos = candidatos.filter(
+            Q(username__icontains=query) |
+            Q(first_name__icontains=query) |
+            Q(last_name__icontains=query) |
+            Q(email__icontains=query)
+        )
+    usuarios = Paginator(candidatos.order_by('username'), 50).get_page(datos.get('page'))
+    en_pagina = {usuario.id for usuario in usuarios}
+    
     context = {
         'rutina': rutina,
         'usuarios': usuarios,
+        'query': query,
+        'seleccionados': seleccionados,
+        # Los marcados en otras páginas viajan como campos ocultos
+        'seleccionados_fuera': sorted(seleccionados - en_pagina),
     }
     
     return render(request, 'gym/asignar_rutina.html', context)
 
 
 @login_required
-def mis_clientes(request):
-    """Ver clientes del entrenador (rutinas asignadas)"""
-    if not request.user.perfil.es_entrenador():
-        messages.error(request, 'Solo los entrenadores pueden ver esta página')
-        return redirect('dashboard')
+@rol_requerido('entrenador', mensaje='Solo los entrenadores pueden ajustar rutinas')
+def ajustar_rutina(request, rutina_id):
+    """Ajustar peso y notas de una rutina asignada a un cliente"""
+    rutina = get_object_or_404(Rutina.objects.select_related('usuario'), id=rutina_id, entrenador=request.user)
+    detalles = rutina.detalles_efectivos()
+    
+    if request.method == 'POST':
+        try:
+            valores = {
+                detalle.id: (
+                    peso_o_none(request.POST.get(f'peso_{detalle.id}', '')),
+                    request.POST.get(f'notas_{detalle.id}', '').strip(),
+                )
+                for detalle in detalles
+            }
+        except ValueError:
+            messages.error(request, 'Peso inválido (entre 0 y 9999.99 kg)')
+            return redirect('ajustar_rutina', rutina_id=rutina.id)
+        
+        with transaction.atomic():
+            if rutina.plantilla_id:
+                # Rutina compartida: solo se guardan las diferencias con la plantilla
+                plantilla = DetalleRutina.objects.in_bulk(valores.keys())
+                ajustes = []
+                for detalle_id, (peso, notas) in valores.items():
+                    original = plantilla[detalle_id]
+                    # Peso vacío sobre uno de la plantilla: se quita solo para este cliente
+                    sin_peso = peso is None and original.peso is not None
+                    peso = peso if peso != original.peso else None
+                    notas = notas if notas != original.notas else ''
+                    if peso is not None or sin_peso or notas:
+                        ajustes.append(AjusteDetalle(
+                            rutina=rutina, detalle_id=detalle_id, peso=peso, sin_peso=sin_peso, notas=notas,
+                        ))
+                rutina.ajustes.all().delete()
+                AjusteDetalle.objects.bulk_create(ajustes)
+                rutina.save(update_fields=['fecha_modificacion'])
+            else:
+                # bulk_update no aplica auto_now: la marca la necesita api_sync
+                ahora = timezone.now()
+                for detalle in detalles:
+                    detalle.peso, detalle.notas = valores[detalle.id]
+                    detalle.fecha_modificacion = ahora
+                DetalleRutina.objects.bulk_update(detalles, ['peso', 'notas', 'fecha_modificacion'])
+        
+        messages.success(request, f'✅ Rutina de {rutina.usuario.username} ajustada')
+        return redirect('cliente_detalle', cliente_id=rutina.usuario_id)
+    
+    context = {
+        'rutina': rutina,
+        'detalles': detalles,
+    }
     
-    # Obtener usuarios que tienen rutinas asignadas por este entrenador
-    rutinas_asignadas = Rutina.objects.filter(
-        entrenador=request.user
-    ).select_related('usuario').order_by('-fecha_creacion')
+    return render(request, 'gym/ajustar_rutina.html', context)
+
+
+@login_required
+@rol_requerido('entrenador', mensaje='Solo los entrenadores pueden ver esta página')
+@usa_replica
+def mis_clientes(request):
+    """Roster paginado de los clientes del entrenador"""
+    context = {
+        'clientes': ClientesService.roster(request.user, request.GET.get('page')),
+    }
     
-    # Agrupar por usuario
-    clientes_dict = {}
-    for rutina in rutinas_asignadas:
-        if rutina.usuario not in clientes_dict:
-            clientes_dict[rutina.usuario] = []
-        clientes_dict[rutina.usuario].append(rutina)
+    return render(request, 'gym/mis_clientes.html', context)
+
+
+@login_required
+@rol_requerido('entrenador', mensaje='Solo los entrenadores pueden ver esta página')
+@usa_replica
+def cliente_detalle(request, cliente_id):
+    """Rutinas que el entrenador le ha asignado a uno de sus clientes"""
+    cliente = get_object_or_404(ClientesService.clientes_de(request.user), id=cliente_id)
+    rutinas = Rutina.objects.filter(
+        entrenador=request.user, usuario=cliente
+    ).con_num_ejercicios().order_by('-fecha_creacion')
     
     context = {
-        'clientes': clientes_dict,
-        'total_clientes': len(clientes_dict),
-        'total_rutinas': rutinas_asignadas.count(),
+        'cliente': cliente,
+        'rutinas': rutinas,
     }
     
-    return render(request, 'gym/mis_clientes.html', context)
\ No newline at end of file
+    return render(request, 'gym/cliente_detalle.html', context)
\ No newline at end of file
@@ -0,0 +1,209 @@
+"""
+Volumen de entrenamiento (series y tonelaje) por grupo muscular y semana.
+
+El volumen sale de dos fuentes:
+- RegistroSerie: cada serie registrada suma 1 serie y repeticiones × peso.
+- RegistroEntrenamiento sin series propias (registrado desde la web, sin
+  clave_cliente): suma lo planificado en la rutina (series × repeticiones ×
+  peso de cada ejercicio, con los ajustes del cliente).
+
+VolumenSemanal guarda el resultado ya agregado y se actualiza al registrar
+(acumular), así los reportes no recorren el historial completo.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .models import (
+    Rutina, DetalleRutina, AjusteDetalle, RegistroEntrenamiento, RegistroSerie, VolumenSemanal,
+)
+
+
+class VolumenService:
+    """Precálculo y reportes de volumen por grupo muscular"""
+    SEMANAS_REPORTE = 12
+    BATCH_SIZE = 1000
+
+    @staticmethod
+    def acumular(series=None, sesiones=None):
+        """Suma al precálculo el volumen de series/sesiones recién registradas (querysets)"""
+        deltas = _volumen(series, sesiones)
+        if not deltas:
+            return
+        with transaction.atomic():
+            VolumenSemanal.objects.bulk_create(
+                [
+                    VolumenSemanal(usuario_id=usuario_id, semana=semana, grupo_muscular=grupo)
+                    for usuario_id, semana, grupo in deltas
+                ],
+                ignore_conflicts=True,
+            )
+            # Un UPDATE por (usuario, semana, grupo) tocado: pocos por sesión
+            for (usuario_id, semana, grupo), (num_series, tonelaje) in deltas.items():
+                VolumenSemanal.objects.filter(
+                    usuario_id=usuario_id, semana=semana, grupo_muscular=grupo
+                ).update(series=F('series') + num_series, tonelaje=F('tonelaje') + tonelaje)
+
+    @staticmethod
+    def recalcular(usuario_ids, semana=None):
+        """Reconstruye el precálculo de los usuarios (todo o solo una semana)"""
+        series = RegistroSerie.objects.filter(usuario_id__in=usuario_ids)
+        sesiones = RegistroEntrenamiento.objects.filter(usuario_id__in=usuario_ids)
+        existentes = VolumenSemanal.objects.filter(usuario_id__in=usuario_ids)
+        if semana is not None:
+            inicio, fin = _rango_semana(semana)
+            series = series.filter(fecha__gte=inicio, fecha__lt=fin)
+            sesiones = sesiones.filter(fecha__gte=inicio, fecha__lt=fin)
+            existentes = existentes.filter(semana=semana)
+
+        volumen = _volumen(series, sesiones)
+        with transaction.atomic():
+            existentes.delete()
+            VolumenSemanal.objects.bulk_create(
+                [
+                    VolumenSemanal(
+                        usuario_id=usuario_id, semana=semana, grupo_muscular=grupo,
+                        series=num_series, tonelaje=tonelaje,
+                    )
+                    for (usuario_id, semana, grupo), (num_series, tonelaje) in volumen.items()
+                ],
+                batch_size=VolumenService.BATCH_SIZE,
+            )
+        return len(volumen)
+
+    @staticmethod
+    def reporte(usuario_ids, semanas=SEMANAS_REPORTE):
+        """
+        Volumen de las últimas `semanas` sumando a todos los usuarios dados.
+        Retorna {'semanas': [lunes, ...], 'grupos': {grupo: {'series': [...],
+        'tonelaje': [...]}}} con una posición por semana.
+        """
+        ultima = lunes(timezone.localdate())
+        fechas = [ultima - timedelta(weeks=i) for i in range(semanas - 1, -1, -1)]
+        posicion = {fecha: i for i, fecha in enumerate(fechas)}
+
+        filas = VolumenSemanal.objects.filter(
+            usuario_id__in=usuario_ids, semana__gte=fechas[0]
+        ).values('semana', 'grupo_muscular').annotate(
+            total_series=Sum('series'), total_tonelaje=Sum('tonelaje')
+        ).order_by('grupo_muscular')
+
+        grupos = {}
+        for fila in filas:
+            grupo = grupos.setdefault(fila['grupo_muscular'], {
+                'series': [0] * semanas,
+                'tonelaje': [Decimal('0')] * semanas,
+            })
+            i = posicion[fila['semana']]
+            grupo['series'][i] = fila['total_series']
+            grupo['tonelaje'][i] = fila['total_tonelaje']
+        return {'semanas': fechas, 'grupos': grupos}
+
+
+def lunes(fecha):
+    return fecha - timedelta(days=fecha.weekday())
+
+
+def grupo_muscular(partes_cuerpo):
+    """Primer grupo de `partes_cuerpo` ("Pecho", "chest, upper arms" o "['chest']")"""
+    primero = (partes_cuerpo or '').strip("[] ").split(',')[0].strip(" '\"")
+    return primero.capitalize() if primero else 'Otro'
+
+
+def _rango_semana(semana):
+    inicio = timezone.make_aware(datetime.combine(semana, time.min))
+    return inicio, inicio + timedelta(weeks=1)
+
+
+def _volumen(series=None, sesiones=None):
+    """
+    Agrega series y sesiones en {(usuario_id, lunes, grupo): (series, tonelaje)}.
+    Las columnas se pasan a arreglos de NumPy y la suma por clave es vectorizada.
+    """
+    usuarios, fechas, grupos, num_series, tonelajes = [], [], [], [], []
+
+    if series is not None:
+        filas = list(series.order_by().values_list(
+            'usuario_id', 'fecha', 'ejercicio__partes_cuerpo', 'repeticiones', 'peso'
+        ))
+        if filas:
+            columnas = list(zip(*filas))
+            usuarios.append(np.array(columnas[0], dtype=np.int64))
+            fechas.extend(columnas[1])
+            grupos.extend(grupo_muscular(partes) for partes in columnas[2])
+            num_series.append(np.ones(len(filas)))
+            # Peso vacío (peso corporal) cuenta como 0 kg de tonelaje
+            pesos = np.nan_to_num(np.array(columnas[4], dtype=float))
+            tonelajes.append(np.array(columnas[3], dtype=float) * pesos)
+
+    if sesiones is not None:
+        filas = list(sesiones.filter(clave_cliente__isnull=True).order_by().values_list(
+            'usuario_id', 'fecha', 'rutina_id'
+        ))
+        perfiles = _perfiles_rutinas({rutina_id for _, _, rutina_id in filas})
+        planificado = [
+            (usuario_id, fecha, grupo, series_plan, tonelaje)
+            for usuario_id, fecha, rutina_id in filas
+            for grupo, series_plan, tonelaje in perfiles.get(rutina_id, ())
+        ]
+        if planificado:
+            columnas = list(zip(*planificado))
+            usuarios.append(np.array(columnas[0], dtype=np.int64))
+            fechas.extend(columnas[1])
+            grupos.extend(columnas[2])
+            num_series.append(np.array(columnas[3], dtype=float))
+            tonelajes.append(np.array(columnas[4], dtype=float))
+
+    if not fechas:
+        return {}
+
+    # Semana local (lunes) de cada registro, como días desde 1970-01-01
+    dias = np.array([timezone.localtime(fecha).date() for fecha in fechas], dtype='datetime64[D]').astype(np.int64)
+    semanas = dias - (dias + 3) % 7  # el 1970-01-01 fue jueves
+    nombres, codigos = np.unique(np.array(grupos), return_inverse=True)
+
+    claves = np.column_stack([np.concatenate(usuarios), semanas, codigos.reshape(-1)])
+    unicas, inversa = np.unique(claves, axis=0, return_inverse=True)
+    inversa = inversa.reshape(-1)
+    total_series = np.bincount(inversa, weights=np.concatenate(num_series), minlength=len(unicas))
+    total_tonelaje = np.bincount(inversa, weights=np.concatenate(tonelajes), minlength=len(unicas))
+
+    return {
+        (int(usuario_id), np.datetime64(int(semana), 'D').item(), str(nombres[codigo])): (
+            int(total_series[i]), Decimal(f'{total_tonelaje[i]:.2f}'),
+        )
+        for i, (usuario_id, semana, codigo) in enumerate(unicas)
+    }
+
+
+def _perfiles_rutinas(rutina_ids):
+    """Volumen planificado por rutina: {rutina_id: [(grupo, series, tonelaje), ...]}"""
+    if not rutina_ids:
+        return {}
+    plantillas = dict(Rutina.objects.filter(id__in=rutina_ids).values_list('id', 'plantilla_id'))
+    ajustes = dict(
+        ((rutina_id, detalle_id), peso)
+        for rutina_id, detalle_id, peso in AjusteDetalle.objects.filter(
+            Q(peso__isnull=False) | Q(sin_peso=True),
+            rutina_id__in=[rutina_id for rutina_id, plantilla_id in plantillas.items() if plantilla_id],
+        ).values_list('rutina_id', 'detalle_id', 'peso')
+    )
+    detalles = defaultdict(list)
+    for detalle in DetalleRutina.objects.filter(
+        rutina_id__in={plantilla_id or rutina_id for rutina_id, plantilla_id in plantillas.items()}
+    ).values_list('id', 'rutina_id', 'ejercicio__partes_cuerpo', 'series', 'repeticiones', 'peso'):
+        detalles[detalle[1]].append(detalle)
+
+    perfiles = {}
+    for rutina_id, plantilla_id in plantillas.items():
+        perfil = []
+        for detalle_id, _, partes, series, repeticiones, peso in detalles[plantilla_id or rutina_id]:
+            peso = ajustes.get((rutina_id, detalle_id), peso) or 0
+            perfil.append((grupo_muscular(partes), series, float(series * repeticiones * peso)))
+        perfiles[rutina_id] = perfil
+    return perfiles